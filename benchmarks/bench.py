@@ -0,0 +1,317 @@
+"""Micro-benchmarks for the Momentum VM.
+
+Usage: python benchmarks/bench.py [--tier] [--engine=py|reg] [benchmark_name ...]
+
+Each benchmark is compiled once and then executed on a fresh VM a few times;
+the best wall-clock time of the execution phase is reported together with
+the number of dispatched instructions and the resulting throughput, so
+regressions in the dispatch loop are visible. Tiered execution is off unless
+--tier is given: it would move the hot functions to machine code during the
+first run and leave nothing of them for the VM to be measured on.
+
+With --engine=py every benchmark is also transpiled to Python (the engine
+selected by `--engine=py` on the command line) and timed the same way, as
+the baseline the VM is measured against. With --engine=reg it is compiled for
+the register VM instead, and its time and instruction count are reported next
+to the stack VM's.
+"""
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import intp
+
+# Unrelated top-level code placed in front of a kernel so that costs which grow with chunk size show up
+FILLER = "".join(f"let pad_{i % 50} = {i % 60} * 2 + {i % 7}\n" for i in range(400))
+
+BENCHMARKS = {
+    # Tight arithmetic FOR loop at the end of a large script
+    'for_arith': FILLER + """
+let total = 0
+for i = 1 to 100000
+    total = total + i * 2 - 1
+next i
+""",
+    # Mixed int/float arithmetic and comparisons in a WHILE loop, plus array indexing
+    'while_numeric': """
+dim samples(1000)
+let k = 0
+let j = 0
+let acc = 0.0
+while k < 100000
+    acc = acc + samples[j] * 0.5 + k * 1.5
+    if acc > 1000000.0 then
+        acc = acc - 1000000.0
+    end if
+    j = j + 1
+    if j == 1000 then
+        j = 0
+    end if
+    k = k + 1
+wend
+""",
+    # Only cheap opcodes (variable loads/stores, constants, jumps): measures raw dispatch overhead
+    'dispatch': """
+let n = 100000
+let a = 0
+let b = 1
+while n > 0
+    a = b
+    b = a
+    n = n - 1
+wend
+""",
+    # Call-heavy recursion
+    'fib': """
+function fib(n)
+    if n < 2 then
+        return n
+    end if
+    return fib(n - 1) + fib(n - 2)
+end function
+let result = fib(20)
+""",
+    # Small helper functions and builtins called from a loop
+    'helper_calls': """
+function clamp(v, lo, hi)
+    if v < lo then
+        return lo
+    end if
+    if v > hi then
+        return hi
+    end if
+    return v
+end function
+function sq(v)
+    return v * v
+end function
+let acc = 0
+for i = 1 to 30000
+    acc = acc + clamp(sq(i) - 500, 0, 1000) + abs(0 - i) + max(i, 3)
+next i
+""",
+    # Tail-recursive accumulator, deeper than the frame stack would allow without frame reuse
+    'tail_recursion': """
+function total(n, acc)
+    if n == 0 then
+        return acc
+    end if
+    return total(n - 1, acc + n)
+end function
+let result = total(100000, 0)
+""",
+    'ackermann': """
+function ack(m, n)
+    if m == 0 then
+        return n + 1
+    end if
+    if n == 0 then
+        return ack(m - 1, 1)
+    end if
+    return ack(m - 1, ack(m, n - 1))
+end function
+let result = ack(2, 300)
+""",
+    # Nested FOR loops writing every element of a 2-D array
+    'matrix_fill': """
+dim grid(200, 200)
+for i = 0 to 199
+    for j = 0 to 199
+        grid[i, j] = i * j + 1
+    next j
+next i
+""",
+    # Sieve of Eratosthenes: WHILE outer loop, FOR with a computed start and STEP inside
+    'prime_sieve': """
+let limit = 60000
+dim composite(limit + 1)
+let count = 0
+let p = 2
+while p <= limit
+    if composite[p] == 0 then
+        count = count + 1
+        for m = p * p to limit step p
+            composite[m] = 1
+        next m
+    end if
+    p = p + 1
+wend
+""",
+    # FOR EACH over the rows of a matrix and over every element of a row
+    'foreach_array': """
+dim table(1000, 100)
+let total = 0
+for each row in table
+    for each cell in row
+        total = total + cell
+    next cell
+next row
+""",
+    # Message routing: a 40-case SWITCH on a string inside a loop
+    'switch_dispatch': """
+let commands = ["cmd3", "cmd17", "cmd39", "cmd25", "unknown"]
+let handled = 0
+for i = 1 to 20000
+    for each command in commands
+        switch command
+            case "cmd0":
+                handled = handled + 0
+            case "cmd1":
+                handled = handled + 1
+            case "cmd2":
+                handled = handled + 2
+            case "cmd3":
+                handled = handled + 3
+            case "cmd4":
+                handled = handled + 4
+            case "cmd5":
+                handled = handled + 5
+            case "cmd6":
+                handled = handled + 6
+            case "cmd7":
+                handled = handled + 7
+            case "cmd8":
+                handled = handled + 8
+            case "cmd9":
+                handled = handled + 9
+            case "cmd10":
+                handled = handled + 10
+            case "cmd11":
+                handled = handled + 11
+            case "cmd12":
+                handled = handled + 12
+            case "cmd13":
+                handled = handled + 13
+            case "cmd14":
+                handled = handled + 14
+            case "cmd15":
+                handled = handled + 15
+            case "cmd16":
+                handled = handled + 16
+            case "cmd17":
+                handled = handled + 17
+            case "cmd18":
+                handled = handled + 18
+            case "cmd19":
+                handled = handled + 19
+            case "cmd20":
+                handled = handled + 20
+            case "cmd21":
+                handled = handled + 21
+            case "cmd22":
+                handled = handled + 22
+            case "cmd23":
+                handled = handled + 23
+            case "cmd24":
+                handled = handled + 24
+            case "cmd25":
+                handled = handled + 25
+            case "cmd26":
+                handled = handled + 26
+            case "cmd27":
+                handled = handled + 27
+            case "cmd28":
+                handled = handled + 28
+            case "cmd29":
+                handled = handled + 29
+            case "cmd30":
+                handled = handled + 30
+            case "cmd31":
+                handled = handled + 31
+            case "cmd32":
+                handled = handled + 32
+            case "cmd33":
+                handled = handled + 33
+            case "cmd34":
+                handled = handled + 34
+            case "cmd35":
+                handled = handled + 35
+            case "cmd36":
+                handled = handled + 36
+            case "cmd37":
+                handled = handled + 37
+            case "cmd38":
+                handled = handled + 38
+            case "cmd39":
+                handled = handled + 39
+            default:
+                handled = handled - 1
+        endswitch
+    next command
+next i
+""",
+    # Per-record TRY in a loop: mostly the no-throw path, every tenth record fails a lookup and is handled
+    'try_records': """
+let record = {"id": 1}
+let parsed = 0
+let rejected = 0
+for i = 1 to 50000
+    try
+        if i / 10 == int(i / 10) then
+            parsed = parsed + record["missing"]
+        end if
+        parsed = parsed + record["id"]
+    catch err
+        rejected = rejected + 1
+    end try
+next i
+""",
+}
+
+def count_instructions(function, vm_class=intp.VM):
+    """Runs the program once with every handler wrapped in a counter and returns the number of dispatched instructions."""
+    vm, executed = vm_class({}, function.chunk.data_pool, {}, Path.cwd()), [0]
+    def counted(handler):
+        def wrapper(*args): executed[0] += 1; return handler(*args)
+        return wrapper
+    vm.dispatch_table = [counted(h) if h else h for h in vm.dispatch_table]
+    vm.async_dispatch_table = {op: counted(h) for op, h in vm.async_dispatch_table.items()}
+    asyncio.run(vm.run(function)); return executed[0]
+
+def run_benchmark(name, source, repeat=3):
+    function, _ = intp.compile_source(source, f"{name}.mn", Path.cwd(), {})
+    instructions = count_instructions(function)
+    best = float('inf')
+    for _ in range(repeat):
+        vm = intp.VM({}, function.chunk.data_pool, {}, Path.cwd())
+        start = time.perf_counter(); asyncio.run(vm.run(function)); best = min(best, time.perf_counter() - start)
+    return best, instructions
+
+def run_python_benchmark(name, source, repeat=3):
+    compiled = intp.compile_python_source(source, f"{name}.mn", Path.cwd(), {})
+    best = float('inf')
+    for _ in range(repeat):
+        module = intp.PyModule(compiled, Path.cwd())
+        start = time.perf_counter(); asyncio.run(module.run()); best = min(best, time.perf_counter() - start)
+    return best
+
+def run_register_benchmark(name, source, repeat=3):
+    function = intp.compile_register_source(source, f"{name}.mn", Path.cwd(), {})
+    instructions = count_instructions(function, intp.RegisterVM)
+    best = float('inf')
+    for _ in range(repeat):
+        vm = intp.RegisterVM({}, function.chunk.data_pool, {}, Path.cwd())
+        start = time.perf_counter(); asyncio.run(vm.run(function)); best = min(best, time.perf_counter() - start)
+    return best, instructions
+
+def main(names, engine=None):
+    header = f"{'benchmark':<24} {'time':>10} {'instructions':>14} {'Minstr/s':>10}"
+    if engine == 'py': header += f" {'py time':>10} {'VM / py':>8}"
+    if engine == 'reg': header += f" {'reg time':>10} {'reg instr':>12} {'instr':>6} {'VM / reg':>8}"
+    print(header)
+    for name in names or BENCHMARKS:
+        elapsed, instructions = run_benchmark(name, BENCHMARKS[name])
+        row = f"{name:<24} {elapsed:8.3f} s {instructions:>14,} {instructions / elapsed / 1e6:>10.2f}"
+        if engine == 'py': python_elapsed = run_python_benchmark(name, BENCHMARKS[name]); row += f" {python_elapsed:8.3f} s {elapsed / python_elapsed:>7.1f}x"
+        if engine == 'reg':
+            register_elapsed, register_instructions = run_register_benchmark(name, BENCHMARKS[name])
+            row += f" {register_elapsed:8.3f} s {register_instructions:>12,} {register_instructions / instructions:>5.0%} {elapsed / register_elapsed:>7.2f}x"
+        print(row)
+
+if __name__ == "__main__":
+    options = {arg for arg in sys.argv[1:] if arg.startswith('--')}
+    intp.TIER_ENABLED = intp.TIER_ENABLED and '--tier' in options
+    engine = next((arg.partition('=')[2] for arg in options if arg.startswith('--engine=')), None)
+    main([arg for arg in sys.argv[1:] if arg not in options], engine)
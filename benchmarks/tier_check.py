@@ -0,0 +1,97 @@
+"""Checks that tiered execution gives the same output as the VM.
+
+Usage: python benchmarks/tier_check.py [program_name ...]
+
+Each program warms its functions up until they are compiled to machine code,
+then prints results that machine code would get wrong (integers that overflow
+64 bits, mixed int/float values) or crash on (recursion too deep for the C
+stack). It is run once as `intp.py` and once as `intp.py --no-tier`; any
+difference in the output is reported and makes the script exit with status 1.
+"""
+import os
+import sys
+import tempfile
+import subprocess
+from pathlib import Path
+
+INTP = Path(__file__).resolve().parent.parent / "intp.py"
+
+# Calls made before the checks: enough for TIER_UP to fire and the compile thread to finish
+WARMUP = 300000
+
+PROGRAMS = {
+    # Products that leave 64 bits inside a loop and in a single expression
+    'overflow_mul': f"""
+function fact(n, r)
+    for i = 1 to n
+        r = r * i
+    next i
+    return r
+end function
+function cube(x)
+    return x * x * x
+end function
+let s = 0
+for k = 1 to {WARMUP}
+    s = fact(5, 1) + cube(k)
+next k
+print fact(20, 1)
+print fact(25, 1)
+print cube(3300000)
+print cube(-3300000)
+print cube(2.5)
+""",
+    # Sums, differences and negation at the edges of the 64-bit range
+    'overflow_add': f"""
+function grow(a, b)
+    return a + b - 1
+end function
+function shrink(a, b)
+    return -(a - b)
+end function
+let s = 0
+for k = 1 to {WARMUP}
+    s = grow(k, 1) + shrink(k, 2)
+next k
+print grow(9223372036854775807, 2)
+print grow(-9223372036854775807, -5)
+print shrink(-9223372036854775807, 1)
+print shrink(9223372036854775807, -1)
+print grow(0.5, 0.25)
+""",
+    # Recursion far deeper than the C stack holds in machine code
+    'deep_recursion': f"""
+function depth(n)
+    if n == 0 then
+        return 0
+    end if
+    return 1 + depth(n - 1)
+end function
+let s = 0
+for k = 1 to {WARMUP}
+    s = depth(3)
+next k
+print depth(500000)
+""",
+}
+
+
+def run(path, *options):
+    result = subprocess.run([sys.executable, "-W", "ignore", str(INTP), *options, str(path)],
+                            capture_output=True, text=True, env={**os.environ, "MOMENTUM_DONT_WRITE_BYTECODE": "1"})
+    return result.stdout + result.stderr
+
+
+def main(names):
+    failed = 0
+    for name in names or PROGRAMS:
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / f"{name}.mn"; path.write_text(PROGRAMS[name], encoding="utf-8")
+            tiered, plain = run(path), run(path, "--no-tier")
+        if tiered == plain: print(f"{name:<16} ok"); continue
+        failed += 1; print(f"{name:<16} DIFFERS\n--- tiered\n{tiered}--- --no-tier\n{plain}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
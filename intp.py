@@ -10,15 +10,22 @@ import itertools
 import re
 import locale
 import json
+import hashlib
+import marshal
+import copy
+import importlib.util
+import threading
+import types
+import dis
+import ast as python_ast
 from enum import Enum, auto
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from collections import Counter, namedtuple
+from collections import Counter, OrderedDict, namedtuple
+from array import array
 
-try:
-    import numba
-    NUMBA_ENABLED = True
-except ImportError:
-    NUMBA_ENABLED = False
+# Numba is only imported when a JIT FUNCTION is first called (see JitModule): loading it takes longer than most programs run
+NUMBA_ENABLED = importlib.util.find_spec('numba') is not None
 
 try:
     import tkinter
@@ -49,10 +56,13 @@ MESSAGES = {
     'en': {
         'error_syntax': "Syntax Error", 'error_runtime': "Runtime Error", 'error_unhandled_vm': "Unhandled Internal VM Error",
         'error_file_not_found': "Error: File not found '{filename}'", 'error_import_failed': "Cannot import module: File not found '{path}'",
-        'error_out_of_data': "Out of DATA", 'error_jit_failed': "JIT pre-compilation failed: {e}",
+        'error_unknown_engine': "Unknown engine '{engine}' (choose one of: {engines})",
+        'error_compile_workers': "--compile-workers needs a whole number of processes, not '{value}'",
+        'error_out_of_data': "Out of DATA", 'jit_fallback': "JIT FUNCTION '{name}' runs on the VM instead: {e}",
         'usage_message': "Usage: python {script_name} [your_program.mn]", 'repl_welcome': "Momentum Language. Type 'exit()' to quit.",
         'running_header': "--- Running Momentum Language from '{filename}' ---", 'run_success': "--- Execution successful ---",
         'run_finished_divider': "---------------------------------------------------------",
+        'watch_waiting': "--- Watching for changes (Ctrl+C to stop) ---", 'watch_reloading': "--- Changed: {files}, running again ---",
         'p_err_unexpected_eof': "Unexpected end of file", 'p_err_unexpected_token': "Unexpected token '{value}'",
         'p_err_expected_token': "Expected token {expected}, but found {found}", 'p_err_invalid_factor': "Invalid syntax for factor, found token {token}",
         'p_err_pipe_rhs_not_func': "Right-hand side of Pipe Operator (|>) must be a function",
@@ -77,6 +87,9 @@ MESSAGES = {
         'rt_err_cannot_call_type': "Cannot call or access data of type '{type_name}'", 'rt_err_unknown_builtin': "Unknown built-in function: {name}",
         'rt_err_mat_inverse_failed': "Cannot compute inverse: {e}", 'rt_err_mat_solve_failed': "Cannot solve equation system: {e}",
         'rt_err_not_subscriptable': "Type '{type_name}' is not subscriptable (cannot use [] or () on it)",
+        'rt_err_not_iterable': "Type '{type_name}' cannot be used in FOR EACH",
+        'rt_err_key_not_found': "Key/Index error: '{index}' not found.", 'rt_err_no_len': "Object of type '{type_name}' has no len()",
+        'rt_err_python_exception': "{type_name}: {error}",
         'rt_err_invalid_key_type': "Invalid key type for {container_type}: {key_type}", 'rt_err_assertion_failed': "Assertion failed: {message}",
         'hint_concat_header': "Hint: To combine text with other data types, you must first convert them", 'hint_concat_body': "      to a STRING using the `str()` function.",
         'hint_concat_example': "      Example: `print(f\"Value is {my_number}\")`",
@@ -85,14 +98,29 @@ MESSAGES = {
         'hint_index_oob_header': "Hint: You are trying to access an array element that does not exist.",
         'hint_index_oob_body': "      Check your loop bounds and array indices. Remember that array indexing starts at 0.",
         'traceback_header': "Traceback (most recent call last):",
+        'traceback_frames_omitted': "  ... {count} more calls ...",
+        'debug_peephole': "[peephole] {module}:{function}: {before} -> {after} instructions (-{removed})",
+        'debug_ast_optimizer': "[ast] {module}: {folded} folded, {propagated} constants propagated, {branches} constant branches, {hoisted} invariants hoisted, {vectorized} loops vectorized",
+        'debug_jit_parallel': "[jit] {module}:{function}: line {line} FOR {var} -> prange, reductions: {reductions}",
+        'debug_jit_serial': "[jit] {module}:{function}: line {line} FOR {var} -> range ({reason})",
+        'debug_tier_skipped': "[tier] {module}:{function}: stays on the VM (line {line}: {reason})",
+        'debug_tier_up': "[tier] {function}({types}) -> machine code", 'debug_tier_failed': "[tier] {function}({types}) stays on the VM: {e}",
+        'jit_reason_exits': "BREAK or RETURN leaves the loop", 'jit_reason_nested': "inside a parallel loop",
+        'jit_reason_step': "STEP is not a constant whole number",
+        'jit_reason_carried': "'{name}' carries a value from one iteration to another",
+        'jit_reason_array': "elements of '{name}' written in one iteration may be used by another",
+        'jit_reason_call': "calls '{name}', which may have side effects",
     },
     'th': {
         'error_syntax': "ข้อผิดพลาดทางไวยากรณ์", 'error_runtime': "ข้อผิดพลาดขณะทำงาน", 'error_unhandled_vm': "ข้อผิดพลาดภายใน VM ที่ไม่รู้จัก",
         'error_file_not_found': "ข้อผิดพลาด: ไม่พบไฟล์ '{filename}'", 'error_import_failed': "ไม่สามารถ import โมดูลได้: ไม่พบไฟล์ '{path}'",
-        'error_out_of_data': "ข้อมูลหมดแล้ว (Out of DATA)", 'error_jit_failed': "การคอมพายล์ JIT ล่วงหน้าล้มเหลว: {e}",
+        'error_unknown_engine': "ไม่รู้จัก engine '{engine}' (เลือกได้จาก: {engines})",
+        'error_compile_workers': "--compile-workers ต้องเป็นจำนวนเต็มของจำนวนโปรเซส ไม่ใช่ '{value}'",
+        'error_out_of_data': "ข้อมูลหมดแล้ว (Out of DATA)", 'jit_fallback': "JIT FUNCTION '{name}' จะทำงานบน VM แทน: {e}",
         'usage_message': "การใช้งาน: python {script_name} [your_program.mn]", 'repl_welcome': "Momentum Language. พิมพ์ 'exit()' เพื่อออก",
         'running_header': "--- กำลังรันโค้ด Momentum Language จาก '{filename}' ---", 'run_success': "--- การรันโปรแกรมสำเร็จ ---",
         'run_finished_divider': "---------------------------------------------------------",
+        'watch_waiting': "--- กำลังเฝ้าดูการแก้ไขไฟล์ (กด Ctrl+C เพื่อหยุด) ---", 'watch_reloading': "--- มีการแก้ไข: {files} กำลังรันใหม่ ---",
         'p_err_unexpected_eof': "พบจุดสิ้นสุดของไฟล์ที่ไม่คาดคิด", 'p_err_unexpected_token': "โทเค็นที่ไม่คาดคิด '{value}'",
         'p_err_expected_token': "คาดหวังโทเค็น {expected}, แต่พบ {found}", 'p_err_invalid_factor': "ไวยากรณ์ไม่ถูกต้องสำหรับ factor, พบโทเค็น {token}",
         'p_err_pipe_rhs_not_func': "ด้านขวาของ Pipe Operator (|>) ต้องเป็นฟังก์ชัน",
@@ -117,6 +145,9 @@ MESSAGES = {
         'rt_err_cannot_call_type': "ไม่สามารถเรียกหรือเข้าถึงข้อมูลของ '{type_name}' ได้", 'rt_err_unknown_builtin': "ฟังก์ชันในตัวที่ไม่รู้จัก: {name}",
         'rt_err_mat_inverse_failed': "ไม่สามารถหาอินเวอร์สได้: {e}", 'rt_err_mat_solve_failed': "ไม่สามารถแก้สมการได้: {e}",
         'rt_err_not_subscriptable': "ข้อมูลชนิด '{type_name}' ไม่สามารถเข้าถึงด้วย [] หรือ () ได้",
+        'rt_err_not_iterable': "ข้อมูลชนิด '{type_name}' ไม่สามารถใช้กับ FOR EACH ได้",
+        'rt_err_key_not_found': "ไม่พบ Key/Index: '{index}'", 'rt_err_no_len': "ข้อมูลชนิด '{type_name}' ไม่มีความยาว (ใช้ len() ไม่ได้)",
+        'rt_err_python_exception': "{type_name}: {error}",
         'rt_err_invalid_key_type': "ชนิดของ Key ไม่ถูกต้องสำหรับ {container_type}: {key_type}", 'rt_err_assertion_failed': "การยืนยันล้มเหลว: {message}",
         'hint_concat_header': "คำแนะนำ: หากต้องการรวมข้อความกับข้อมูลชนิดอื่น คุณต้องแปลงข้อมูลนั้น", 'hint_concat_body': "      ให้เป็น STRING โดยใช้ฟังก์ชัน `str()` ก่อน",
         'hint_concat_example': "      ตัวอย่าง: `print(f\"ค่าคือ {my_number}\")`",
@@ -125,6 +156,18 @@ MESSAGES = {
         'hint_index_oob_header': "คำแนะนำ: คุณกำลังพยายามเข้าถึงข้อมูลในอาร์เรย์ตำแหน่งที่ไม่มีอยู่",
         'hint_index_oob_body': "      ตรวจสอบขอบเขตของลูปและค่าดัชนี (index) โดยจำไว้ว่าดัชนีของอาร์เรย์เริ่มที่ 0",
         'traceback_header': "Traceback (การเรียกย้อนหลังล่าสุด):",
+        'traceback_frames_omitted': "  ... เรียกต่ออีก {count} ครั้ง ...",
+        'debug_peephole': "[peephole] {module}:{function}: {before} -> {after} คำสั่ง (ลดลง {removed})",
+        'debug_ast_optimizer': "[ast] {module}: พับค่าคงที่ {folded}, แทนค่าคงที่ {propagated}, เงื่อนไขคงที่ {branches}, ย้ายนิพจน์ออกจากลูป {hoisted}, แปลงลูปเป็น NumPy {vectorized}",
+        'debug_jit_parallel': "[jit] {module}:{function}: บรรทัด {line} FOR {var} -> prange, ตัวสะสมค่า: {reductions}",
+        'debug_jit_serial': "[jit] {module}:{function}: บรรทัด {line} FOR {var} -> range ({reason})",
+        'debug_tier_skipped': "[tier] {module}:{function}: ทำงานบน VM ต่อไป (บรรทัด {line}: {reason})",
+        'debug_tier_up': "[tier] {function}({types}) -> รหัสเครื่อง", 'debug_tier_failed': "[tier] {function}({types}) ทำงานบน VM ต่อไป: {e}",
+        'jit_reason_exits': "มี BREAK หรือ RETURN ออกจากลูป", 'jit_reason_nested': "อยู่ภายในลูปที่ทำงานแบบขนานแล้ว",
+        'jit_reason_step': "STEP ไม่ใช่จำนวนเต็มคงที่",
+        'jit_reason_carried': "'{name}' ส่งค่าต่อจากรอบหนึ่งไปอีกรอบ",
+        'jit_reason_array': "สมาชิกของ '{name}' ที่เขียนในรอบหนึ่งอาจถูกใช้ในรอบอื่น",
+        'jit_reason_call': "เรียก '{name}' ซึ่งอาจมีผลข้างเคียง",
     }
 }
 
@@ -174,7 +217,21 @@ class InterpreterError(MomentumError):
         elif node_or_line and hasattr(node_or_line, 'token') and hasattr(node_or_line.token, 'line'): line = node_or_line.token.line
         self.raw_message = message; self.line = line; self.stack_trace = stack_trace or []
         super().__init__(f"[Line {line}] {message}")
+class VMError(InterpreterError):
+    """A runtime error raised by the VM. Only the failing instruction and the message arguments are recorded; the translated
+    message and the line are built when first read, so an error that a CATCH handles without using it is never formatted."""
+    def __init__(self, chunk, ip, message_key, **kwargs):
+        Exception.__init__(self); self.chunk, self.ip, self.message_key, self.kwargs, self.stack_trace, self._message = chunk, ip, message_key, kwargs, [], None
+    @property
+    def raw_message(self):
+        # A message_key of None carries a ready-made value (a THROWn value or a builtin's exception) whose text is the message
+        if self._message is None: self._message = t(self.message_key, **self.kwargs) if self.message_key else str(self.kwargs['value'])
+        return self._message
+    @property
+    def line(self): return self.chunk.get_line(self.ip)
+    def __str__(self): return f"[Line {self.line}] {self.raw_message}"
 
+TRACEBACK_EDGE_FRAMES = 10 # Outermost and innermost calls printed of a longer stack trace (deep recursion has thousands)
 def format_momentum_error(error, source_lines):
     if isinstance(error, MomentumExit): return
     if not isinstance(error, (ParserError, InterpreterError)):
@@ -196,8 +253,11 @@ def format_momentum_error(error, source_lines):
     elif "out of bounds" in message or "index" in message.lower():
         print(f"\n{t('hint_index_oob_header')}", file=sys.stderr); print(t('hint_index_oob_body'), file=sys.stderr)
     if hasattr(error, 'stack_trace') and error.stack_trace:
-        print(f"\n{t('traceback_header')}", file=sys.stderr)
-        for frame_info in reversed(error.stack_trace):
+        print(f"\n{t('traceback_header')}", file=sys.stderr); frames = error.stack_trace[::-1]
+        if len(frames) > 2 * TRACEBACK_EDGE_FRAMES + 1:
+            omitted = len(frames) - 2 * TRACEBACK_EDGE_FRAMES; frames = frames[:TRACEBACK_EDGE_FRAMES] + [None] + frames[-TRACEBACK_EDGE_FRAMES:]
+        for frame_info in frames:
+            if frame_info is None: print(t('traceback_frames_omitted', count=omitted), file=sys.stderr); continue
             print(f'  File "{frame_info["file"]}", line {frame_info["line"]}, in {frame_info["context"]}', file=sys.stderr)
     print("-" * (len(error_type) + 20), file=sys.stderr)
 
@@ -226,7 +286,7 @@ class Lexer:
         'JIT_FUNCTION': 'JIT_FUNCTION', 'ASYNC_FUNCTION': 'ASYNC_FUNCTION', 'RUN_ASYNC': 'RUN_ASYNC',
         'BREAK': 'BREAK', 'CONTINUE': 'CONTINUE', 'TRY': 'TRY', 'CATCH': 'CATCH', 'FINALLY': 'FINALLY',
         'ENDTRY': 'ENDTRY', 'SWITCH': 'SWITCH', 'CASE': 'CASE', 'DEFAULT': 'DEFAULT', 'ENDSWITCH': 'ENDSWITCH',
-        'EACH': 'EACH', 'IN': 'IN', 'DEBUG': 'DEBUG'
+        'EACH': 'EACH', 'IN': 'IN', 'DEBUG': 'DEBUG', 'THROW': 'THROW'
     }
     _multi_word_map = {
         re.compile(r'\bEND\s+IF\b', re.IGNORECASE): 'ENDIF', re.compile(r'\bELSE\s+IF\b', re.IGNORECASE): 'ELSEIF',
@@ -306,6 +366,8 @@ class FuncCall(AST):
     def name(self): return self.name_token.value
 class Return(AST):
     def __init__(self, expr, token): self.expr, self.token = expr, token
+class Throw(AST):
+    def __init__(self, expr, token): self.expr, self.token = expr, token
 class Program(AST):
     def __init__(self, statements): self.statements = statements
 class NoOp(AST): pass
@@ -535,7 +597,7 @@ class Parser:
             'RETURN': self.return_statement, 'DIM': self.dim_statement, 'DATA': self.data_statement,
             'READ': self.read_statement, 'RESTORE': self.restore_statement, 'RUN_ASYNC': self.run_async_statement,
             'IMPORT': self.import_statement, 'BREAK': self.break_statement, 'CONTINUE': self.continue_statement,
-            'TRY': self.try_statement, 'SWITCH': self.switch_statement, 'DEBUG': self.debug_statement,
+            'TRY': self.try_statement, 'SWITCH': self.switch_statement, 'DEBUG': self.debug_statement, 'THROW': self.throw_statement,
         }
         if tok_type in dispatch: return dispatch[tok_type]()
         
@@ -548,7 +610,7 @@ class Parser:
             right = self.expr()
             return Assign(potential_expr_node, op, right)
 
-        if isinstance(potential_expr_node, FuncCall):
+        if isinstance(potential_expr_node, (FuncCall, Await)):
              return potential_expr_node
         
         if self.pos == len(self.tokens) -1:
@@ -638,6 +700,8 @@ class Parser:
         return FuncDef(func_name, params, block, token, is_async, is_jit)
     def return_statement(self):
         token = self.current_token; self.eat('RETURN'); return Return(self.expr(), token)
+    def throw_statement(self):
+        token = self.current_token; self.eat('THROW'); return Throw(self.expr(), token)
     def dim_statement(self):
         token = self.current_token; self.eat('DIM'); var_token = self.current_token; self.eat('ID'); self.eat('LPAREN')
         size_exprs = [self.expr()]
@@ -645,7 +709,7 @@ class Parser:
         self.eat('RPAREN'); return Dim(var_token, size_exprs, token)
     def data_statement(self):
         token = self.current_token; self.eat('DATA'); values = []
-        stop_tokens = {'LET', 'PRINT', 'INPUT', 'IF', 'WHILE', 'FOR', 'FUNCTION', 'ASYNC_FUNCTION', 'JIT_FUNCTION', 'RETURN', 'DIM', 'DATA', 'READ', 'RESTORE', 'RUN_ASYNC', 'AWAIT', 'ID', 'EOF', 'ELSE', 'ELSEIF', 'WEND', 'NEXT', 'ENDFUNCTION', 'IMPORT', 'BREAK', 'CONTINUE', 'TRY', 'SWITCH'}
+        stop_tokens = {'LET', 'PRINT', 'INPUT', 'IF', 'WHILE', 'FOR', 'FUNCTION', 'ASYNC_FUNCTION', 'JIT_FUNCTION', 'RETURN', 'DIM', 'DATA', 'READ', 'RESTORE', 'RUN_ASYNC', 'AWAIT', 'ID', 'EOF', 'ELSE', 'ELSEIF', 'WEND', 'NEXT', 'ENDFUNCTION', 'IMPORT', 'BREAK', 'CONTINUE', 'TRY', 'SWITCH', 'THROW'}
         while self.current_token and self.current_token.type not in stop_tokens:
             if self.current_token.type == 'MINUS':
                 self.eat('MINUS'); num_tok = self.current_token
@@ -710,6 +774,382 @@ class Parser:
         if self.current_token and self.current_token.type != 'EOF': self.error(t('p_err_unexpected_token', value=self.current_token.value))
         return Program(statements)
 
+# --- AST optimizer: runs between Parser.parse and Compiler.compile ---
+def _walk(node):
+    """Yields `node` and every AST node below it (through lists, and the tuples of If/Switch cases and dict pairs)."""
+    if isinstance(node, AST):
+        yield node; children = node.__dict__.values()
+    elif isinstance(node, (list, tuple)): children = node
+    else: return
+    for child in children: yield from _walk(child)
+def _assignment_root(target):
+    while isinstance(target, SubscriptAccess): target = target.primary
+    return target.value.lower() if isinstance(target, Var) else None
+def _assignment_targets(node):
+    for n in _walk(node):
+        if isinstance(n, Assign): yield n.left
+        elif isinstance(n, Input): yield n.var
+        elif isinstance(n, Read): yield from n.variables
+def _written_names(node):
+    """Counts every binding of a name below `node`: assignments (element stores count for the container), LET, INPUT, READ,
+    DIM, loop counters, CATCH variables, function names and parameters."""
+    writes = Counter(_assignment_root(target) for target in _assignment_targets(node))
+    for n in _walk(node):
+        if isinstance(n, Declare): writes[n.var_node.value.lower()] += 1
+        elif isinstance(n, Dim): writes[n.var_token.value.lower()] += 1
+        elif isinstance(n, For): writes[n.var.value.lower()] += 1
+        elif isinstance(n, ForEach): writes[n.var_token.value.lower()] += 1
+        elif isinstance(n, Try) and n.catch_var: writes[n.catch_var.value.lower()] += 1
+        elif isinstance(n, FuncDef): writes[n.name.lower()] += 1; writes.update(p.value.lower() for p in n.params)
+    writes.pop(None, None); return writes
+def _is_loop_invariant(expr, loop, is_global):
+    """True if `expr` evaluates to the same value on every pass of the FOR `loop`, so its limit/step can be computed once.
+    `is_global(name_token)` tells whether a name in it resolves to a global at the loop."""
+    nodes = list(_walk(expr))
+    if not all(isinstance(n, (Num, String, Var, BinOp, UnaryOp)) for n in nodes): return False
+    names = {n.value.lower() for n in nodes if isinstance(n, Var)}
+    if loop.var.value.lower() in names or names & set(_written_names(loop.block)): return False
+    # Globals can also be rebound by called functions, AWAIT and IMPORT
+    if any(is_global(n.token) for n in nodes if isinstance(n, Var)):
+        for n in _walk(loop.block):
+            if isinstance(n, (Await, RunAsync, Import)) or (isinstance(n, FuncCall) and n.name_token.value.lower() not in BUILTIN_FUNCTIONS): return False
+    return True
+def _switch_label(node):
+    # The value of a literal case label (negative numbers included), or _UNDEFINED when it has to be evaluated at run time
+    if isinstance(node, (Num, String)): return node.value
+    if isinstance(node, UnaryOp) and node.op.type == 'MINUS' and isinstance(node.expr, Num): return -node.expr.value
+    return _UNDEFINED
+def _literal(value, token):
+    # Only plain int/float/str results become literals; bools, numpy scalars and arrays stay runtime values
+    if type(value) is str: return String(Token('STRING', value, token.line))
+    if type(value) in (int, float): return Num(Token('INTEGER' if type(value) is int else 'FLOAT', value, token.line))
+    return None
+class ASTOptimizer:
+    """Rewrites a parsed Program before compilation: propagates single-assignment global constants, folds constant
+    expressions and pure builtin calls, drops IF/WHILE branches with constant conditions, hoists loop-invariant
+    expressions out of FOR/WHILE loops and vectorizes element-wise FOR loops. JIT FUNCTION bodies are left as written for the
+    Numba transpiler."""
+    BINARY_FOLDS = {'MINUS': operator.sub, 'MUL': operator.mul, 'DIV': operator.truediv, 'EQ': operator.eq, 'NEQ': operator.ne,
+                    'GT': operator.gt, 'LT': operator.lt, 'GTE': operator.ge, 'LTE': operator.le}
+    MAX_FOLDED_STRING = 4096
+    def __init__(self, propagate_globals=True):
+        # The REPL compiles each input against a live namespace: a later input may rebind any global, so none is a constant
+        self.constants, self.temp_count, self.element_stores, self.propagate_globals = {}, 0, False, propagate_globals
+        self.stats = {'folded': 0, 'propagated': 0, 'branches': 0, 'hoisted': 0, 'vectorized': 0}
+    def optimize(self, program):
+        writes = _written_names(program.statements); statements = []
+        import_positions = [i for i, stmt in enumerate(program.statements) if isinstance(stmt, Import)]
+        nested_import = any(isinstance(n, Import) for stmt in program.statements if not isinstance(stmt, Import) for n in _walk(stmt))
+        for i, stmt in enumerate(program.statements):
+            statements.extend(self.visit_statement(stmt))
+            # A global bound exactly once, by a top-level LET of a literal that no later IMPORT can overwrite, is a constant from here on
+            if self.propagate_globals and isinstance(stmt, Assign) and isinstance(stmt.left, Var) and isinstance(stmt.right, (Num, String)):
+                name = stmt.left.value.lower()
+                if writes[name] == 1 and not nested_import and all(pos < i for pos in import_positions): self.constants[name] = stmt.right.value
+        program.statements = statements; return program
+    def _folded(self, node): self.stats['folded'] += 1; return node
+
+    # Expressions: fold_<Node> returns the (possibly new) node
+    def fold(self, node):
+        method = getattr(self, f'fold_{type(node).__name__}', None)
+        return method(node) if method else node
+    def fold_Var(self, node):
+        name = node.value.lower()
+        if name not in self.constants: return node
+        self.stats['propagated'] += 1; return _literal(self.constants[name], node.token)
+    def fold_BinOp(self, node):
+        node.left, node.right = self.fold(node.left), self.fold(node.right); op = node.op.type
+        if not isinstance(node.left, (Num, String)): return node
+        # Mirrors the compiled short-circuit: AND yields the falsy left or the right, OR yields 1 or the right
+        if op == 'AND': return self._folded(node.right if node.left.value else node.left)
+        if op == 'OR': return self._folded(node.right if not node.left.value else _literal(1, node.token))
+        if not isinstance(node.right, (Num, String)): return node
+        a, b = node.left.value, node.right.value
+        try:
+            if op == 'PLUS': value = str(a) + str(b) if isinstance(a, str) or isinstance(b, str) else a + b
+            elif op in self.BINARY_FOLDS and not (op == 'DIV' and b == 0): value = self.BINARY_FOLDS[op](a, b)
+            else: return node
+        except (TypeError, ArithmeticError): return node # Left for the VM to report at run time
+        if isinstance(value, bool): value = int(value)
+        if isinstance(value, str) and len(value) > self.MAX_FOLDED_STRING: return node
+        return self._folded(_literal(value, node.token))
+    def fold_UnaryOp(self, node):
+        node.expr = self.fold(node.expr)
+        if node.op.type == 'NOT' and isinstance(node.expr, (Num, String)): return self._folded(_literal(0 if node.expr.value else 1, node.token))
+        if node.op.type == 'MINUS' and isinstance(node.expr, Num): return self._folded(_literal(-node.expr.value, node.token))
+        return node
+    def fold_FuncCall(self, node):
+        node.args = [self.fold(arg) for arg in node.args]; name = node.name_token.value.lower()
+        if name in PURE_BUILTINS and all(isinstance(arg, (Num, String)) for arg in node.args):
+            try: literal = _literal(BUILTIN_FUNCTIONS[name](*[arg.value for arg in node.args]), node.token)
+            except Exception: return node
+            if literal is not None: return self._folded(literal)
+        return node
+    def fold_FString(self, node): node.parts = [self.fold(part) for part in node.parts]; return node
+    def fold_SubscriptAccess(self, node):
+        node.primary = self.fold(node.primary); node.index_exprs = [self.fold(expr) for expr in node.index_exprs]; return node
+    def fold_ArrayLiteral(self, node): node.elements = [self.fold(element) for element in node.elements]; return node
+    def fold_DictLiteral(self, node): node.pairs = [(self.fold(key), self.fold(value)) for key, value in node.pairs]; return node
+    def fold_Await(self, node): node.expr = self.fold(node.expr); return node
+
+    # Statements: visit_<Node> returns the list of statements that replaces the node
+    def visit_statement(self, node):
+        method = getattr(self, f'visit_{type(node).__name__}', None)
+        return method(node) if method else [self.fold(node)]
+    def visit_block(self, statements): return [new for stmt in statements for new in self.visit_statement(stmt)]
+    def visit_Assign(self, node):
+        if isinstance(node.left, SubscriptAccess): node.left = self.fold_SubscriptAccess(node.left)
+        node.right = self.fold(node.right); return [node]
+    def visit_Print(self, node): node.expr = self.fold(node.expr); return [node]
+    def visit_Return(self, node): node.expr = self.fold(node.expr); return [node]
+    def visit_Throw(self, node): node.expr = self.fold(node.expr); return [node]
+    def visit_Debug(self, node): node.expr = self.fold(node.expr); return [node]
+    def visit_Input(self, node):
+        if node.prompt: node.prompt = self.fold(node.prompt)
+        return [node]
+    def visit_Dim(self, node): node.size_exprs = [self.fold(expr) for expr in node.size_exprs]; return [node]
+    def visit_RunAsync(self, node): node.tasks = [self.fold(task) for task in node.tasks]; return [node]
+    def visit_Read(self, node): return [node]
+    def visit_Declare(self, node): return [node]
+    def visit_If(self, node):
+        cases = []
+        for condition, block in node.cases:
+            condition = self.fold(condition)
+            if not isinstance(condition, (Num, String)): cases.append((condition, self.visit_block(block))); continue
+            self.stats['branches'] += 1
+            if not condition.value: continue
+            # Always taken: this block becomes the ELSE of the cases before it and the remaining ones are unreachable
+            else_block = self.visit_block(block)
+            if not cases: return else_block
+            node.cases, node.else_case = cases, else_block; return [node]
+        else_block = self.visit_block(node.else_case) if node.else_case else None
+        if not cases: return else_block or []
+        node.cases, node.else_case = cases, else_block; return [node]
+    def visit_While(self, node):
+        node.condition = self.fold(node.condition)
+        if isinstance(node.condition, (Num, String)) and not node.condition.value: self.stats['branches'] += 1; return []
+        node.block = self.visit_block(node.block); return self.hoist_invariants(node)
+    def visit_For(self, node):
+        node.start, node.end, node.step = self.fold(node.start), self.fold(node.end), self.fold(node.step)
+        node.block = self.visit_block(node.block); statements = self.hoist_invariants(node)
+        return statements[:-1] + self.vectorize(statements[-1])
+    def visit_ForEach(self, node): node.collection = self.fold(node.collection); node.block = self.visit_block(node.block); return [node]
+    def visit_FuncDef(self, node):
+        if not node.is_jit: node.block = self.visit_block(node.block)
+        return [node]
+    def visit_Try(self, node):
+        node.try_block = self.visit_block(node.try_block)
+        if node.catch_block: node.catch_block = self.visit_block(node.catch_block)
+        if node.finally_block: node.finally_block = self.visit_block(node.finally_block)
+        return [node]
+    def visit_Switch(self, node):
+        node.expr = self.fold(node.expr); node.cases = [([self.fold(value) for value in values], self.visit_block(block)) for values, block in node.cases]
+        if node.default_case: node.default_case = self.visit_block(node.default_case)
+        return [node]
+
+    # Loop-invariant code motion
+    def is_invariant(self, node, written):
+        if isinstance(node, (Num, String)): return True
+        if isinstance(node, Var): return node.value.lower() not in written
+        if isinstance(node, BinOp): return self.is_invariant(node.left, written) and self.is_invariant(node.right, written)
+        if isinstance(node, UnaryOp): return self.is_invariant(node.expr, written)
+        if isinstance(node, FuncCall):
+            # An element store may go through an alias of an argument and change len(), str() etc. of it
+            return not self.element_stores and node.name_token.value.lower() in PURE_BUILTINS and all(self.is_invariant(arg, written) for arg in node.args)
+        return False
+    def is_pure(self, node):
+        return all(isinstance(n, (Num, String, Var, BinOp, UnaryOp, SubscriptAccess)) or (isinstance(n, FuncCall) and n.name_token.value.lower() in PURE_BUILTINS) for n in _walk(node))
+    def hoist(self, node, written, hoisted):
+        """Replaces the largest invariant subexpressions of `node` by temporaries, appending their assignments to `hoisted`."""
+        if isinstance(node, (BinOp, UnaryOp, FuncCall)) and self.is_invariant(node, written) and any(isinstance(n, Var) for n in _walk(node)):
+            # '$' cannot appear in a Momentum identifier, so the temporaries never clash with user globals
+            token = Token('ID', f"$invariant{self.temp_count}", node.token.line); self.temp_count += 1; self.stats['hoisted'] += 1
+            hoisted.append(Assign(Var(token), Token('ASSIGN', '=', token.line), node)); return Var(token)
+        if isinstance(node, BinOp):
+            node.left = self.hoist(node.left, written, hoisted)
+            if node.op.type not in ('AND', 'OR'): node.right = self.hoist(node.right, written, hoisted) # The right side of AND/OR may never run
+        elif isinstance(node, UnaryOp): node.expr = self.hoist(node.expr, written, hoisted)
+        elif isinstance(node, FuncCall): node.args = [self.hoist(arg, written, hoisted) for arg in node.args]
+        elif isinstance(node, SubscriptAccess): node.index_exprs = [self.hoist(expr, written, hoisted) for expr in node.index_exprs]
+        elif isinstance(node, FString): node.parts = [self.hoist(part, written, hoisted) for part in node.parts]
+        return node
+    def entry_test(self, loop):
+        # A side-effect free copy of the test that decides whether the loop body runs at least once, or None
+        if isinstance(loop, While): return copy.deepcopy(loop.condition) if self.is_pure(loop.condition) else None
+        if not (isinstance(loop.step, Num) and self.is_pure(loop.start) and self.is_pure(loop.end)): return None
+        op = Token('LTE', '<=', loop.token.line) if loop.step.value > 0 else Token('GTE', '>=', loop.token.line)
+        return BinOp(copy.deepcopy(loop.start), op, copy.deepcopy(loop.end))
+    def hoist_invariants(self, loop):
+        """Returns the statements replacing `loop`: invariant temporaries first, then the loop itself."""
+        # Calls into user code, AWAIT and IMPORT can rebind any global, so such loops are left alone
+        for n in _walk(loop):
+            if isinstance(n, (Await, RunAsync, Import)) or (isinstance(n, FuncCall) and n.name_token.value.lower() not in BUILTIN_FUNCTIONS): return [loop]
+        written, before, guarded = _written_names(loop), [], []
+        self.element_stores = any(not isinstance(target, Var) for target in _assignment_targets(loop))
+        # The condition (or FOR bound and step) is evaluated at least once, so its invariant parts can move unconditionally
+        if isinstance(loop, While): loop.condition = self.hoist(loop.condition, written, before)
+        elif isinstance(loop.start, (Num, Var)): loop.end, loop.step = self.hoist(loop.end, written, before), self.hoist(loop.step, written, before) # FOR evaluates start first
+        # Body expressions only run if the loop does: their temporaries are assigned behind a copy of the entry test. A hoisted
+        # expression may raise (a division, sqrt, a subscript), so it must not move ahead of anything observable: only those of
+        # the body's first statement with an effect are taken, which the statement evaluates before doing anything
+        entry = self.entry_test(loop)
+        for stmt in loop.block if entry is not None else []:
+            if any(isinstance(n, (Break, Continue, Return, Throw)) for n in _walk(stmt)): break
+            if isinstance(stmt, Assign): stmt.right = self.hoist(stmt.right, written, guarded)
+            elif isinstance(stmt, Print): stmt.expr = self.hoist(stmt.expr, written, guarded)
+            elif isinstance(stmt, FuncCall): stmt.args = [self.hoist(arg, written, guarded) for arg in stmt.args]
+            if not isinstance(stmt, NoOp): break
+        if guarded: before.append(If([(entry, guarded)], None, loop.token))
+        return before + [loop]
+
+    # Loop vectorization
+    def vectorize(self, loop):
+        """Returns the statements replacing `loop` by its NumPy kernel (see LoopVectorizer), which keep the loop itself for the runs
+        the kernel declines. Like the hoisted temporaries, the kernel only runs behind the entry test."""
+        entry = self.entry_test(loop)
+        if entry is None: return [loop]
+        try: call, reductions = LoopVectorizer(loop).rewrite()
+        except InterpreterError: return [loop]
+        self.stats['vectorized'] += 1; line = loop.token.line
+        if reductions:
+            results = [Assign(Var(Token('ID', name, line)), Token('ASSIGN', '=', line), FuncCall(Token('ID', '$vector_result', line), [Num(Token('INTEGER', k, line))]))
+                       for k, name in enumerate(reductions)]
+            vectorized = If([(call, results)], [loop], loop.token)
+        else: vectorized = If([(UnaryOp(Token('NOT', 'NOT', line), call), [loop])], None, loop.token)
+        return [If([(entry, [vectorized])], None, loop.token)]
+
+class LoopVectorizer:
+    """Turns a FOR loop whose iterations only touch the array elements at the counter's index into a NumPy kernel: element stores
+    become whole-slice stores, IF cases become masks merged with np.where, and `r = r + e`, `r = r - e`, `r = max(r, e)` and
+    `r = min(r, e)` become reductions over the slice. `rewrite` returns the `$vector_loop` call running the kernel and the names of
+    the reduced variables, or raises InterpreterError (as TierTranspiler.check does) for loops it does not handle.
+
+    The kernel must give exactly the VM's results, so it is written for the cases where NumPy and the VM's scalar operations agree:
+    at run time it declines (see vector_loop) unless every array is a 1-D float64/int64 array the whole range fits in, stored
+    arrays are float64 and share no memory with the others, and the integers the VM would keep as Python ints stay below 2**53.
+    Sums are accumulated in iteration order, so floating point rounds as it does one element at a time."""
+    ARITHMETIC = {'PLUS': '+', 'MINUS': '-', 'MUL': '*', 'DIV': '/'}
+    COMPARISONS = {'EQ': '==', 'NEQ': '!=', 'GT': '>', 'LT': '<', 'GTE': '>=', 'LTE': '<='}
+    REDUCTIONS = {'max': '_max', 'min': '_min'}
+    MAX_PARAMS = 200 # A builtin call passes at most 255 arguments
+    def __init__(self, loop):
+        self.loop, self.counter, self.uses_counter = loop, loop.var.value.lower(), False
+        self.params, self.arrays, self.scalars, self.reductions = {}, [], [], {}
+        self.current, self.lines, self.temp_count = {}, [], 0 # `current`: array name -> kernel value holding its elements so far
+    def rewrite(self):
+        loop = self.loop
+        if not (isinstance(loop.step, Num) and type(loop.step.value) is int and loop.step.value > 0): raise InterpreterError("FOR without a constant positive whole STEP", loop)
+        self.stored = {_assignment_root(node.left) for node in _walk(loop.block) if isinstance(node, Assign) and isinstance(node.left, SubscriptAccess)}
+        self.assigned = {node.left.value.lower() for node in _walk(loop.block) if isinstance(node, Assign) and isinstance(node.left, Var)}
+        bounds = {node.value.lower() for node in _walk([loop.start, loop.end]) if isinstance(node, Var)}
+        if bounds & (self.stored | self.assigned | {self.counter}): raise InterpreterError("FOR bounds change in the loop", loop)
+        if self.counter in self.assigned: raise InterpreterError(f"assigns the FOR variable '{self.counter}'", loop)
+        self.block(loop.block, None)
+        if not self.current and not self.reductions: raise InterpreterError("nothing to vectorize", loop)
+        if len(self.params) > self.MAX_PARAMS: raise InterpreterError("too many variables", loop)
+        params = list(self.params.values()); written = tuple(self.arrays.index(name) for name in self.current)
+        head = [f"def kernel(_start, _limit{''.join(', ' + p for p in params)}):", f"    _s = _slice(_start, _limit, {loop.step.value})",
+                f"    if _s is None: return ({''.join(self.params[name] + ', ' for name in self.reductions)})",
+                f"    _n = len(range(_s.start, _s.stop, _s.step)); _arrays(({''.join(self.params[name] + ', ' for name in self.arrays)}), {written}, _s)"]
+        if self.scalars: head.append(f"    _numbers({', '.join(self.params[name] for name in self.scalars)})")
+        if self.uses_counter: head.append("    _i = _np.arange(_s.start, _s.stop, _s.step)")
+        tail = [f"    {self.params[name]}[_s] = {value}" for name, value in self.current.items()]
+        tail.append(f"    return ({''.join(value + ', ' for value in self.reductions.values())})")
+        source = "\n".join(head + self.lines + tail) + "\n"; line = loop.token.line
+        args = [String(Token('STRING', source, line)), copy.deepcopy(loop.start), copy.deepcopy(loop.end)] + [Var(Token('ID', name, line)) for name in self.params]
+        return FuncCall(Token('ID', '$vector_loop', line), args), list(self.reductions)
+    def param(self, name):
+        if name not in self.params: self.params[name] = f"p{len(self.params)}"
+        return self.params[name]
+    def temp(self, code):
+        name = f"t{self.temp_count}"; self.temp_count += 1; self.lines.append(f"    {name} = {code}"); return name
+    def block(self, statements, mask):
+        for stmt in statements:
+            if isinstance(stmt, If): self.branch(stmt, mask)
+            elif isinstance(stmt, Assign) and isinstance(stmt.left, SubscriptAccess): self.store(stmt, mask)
+            elif isinstance(stmt, Assign): self.reduce(stmt, mask)
+            else: raise InterpreterError(f"'{type(stmt).__name__}'", stmt)
+    def branch(self, node, mask):
+        # Each case runs where its condition holds and none of the earlier ones did; ELSE takes what is left
+        rest = mask
+        for condition, block in node.cases:
+            test = self.temp(self.condition(condition))
+            self.block(block, test if rest is None else self.temp(f"_np.logical_and({rest}, {test})"))
+            rest = self.temp(f"_np.logical_not({test})" if rest is None else f"_np.logical_and({rest}, _np.logical_not({test}))")
+        if node.else_case: self.block(node.else_case, rest)
+    def element(self, node):
+        # The array name of `name[counter]`, or None
+        if not (isinstance(node, SubscriptAccess) and isinstance(node.primary, Var) and len(node.index_exprs) == 1): return None
+        index, name = node.index_exprs[0], node.primary.value.lower()
+        if not (isinstance(index, Var) and index.value.lower() == self.counter) or name == self.counter or name in self.assigned: return None
+        if name not in self.arrays: self.arrays.append(name); self.param(name)
+        return name
+    def store(self, node, mask):
+        name = self.element(node.left)
+        if name is None: raise InterpreterError("stores to an element other than [counter]", node)
+        value, _ = self.value(node.right)
+        old = self.current.get(name, f"{self.params[name]}[_s]")
+        self.current[name] = self.temp(value if mask is None else f"_np.where({mask}, {value}, {old})")
+    def reduce(self, node, mask):
+        name, right = node.left.value.lower(), node.right
+        if name in self.reductions or name in self.arrays: raise InterpreterError(f"assigns '{name}' more than once", node)
+        is_target = lambda n: isinstance(n, Var) and n.value.lower() == name
+        if isinstance(right, BinOp) and right.op.type == 'PLUS' and (is_target(right.left) or is_target(right.right)):
+            function, operand, negated = '_sum', right.right if is_target(right.left) else right.left, False
+        elif isinstance(right, BinOp) and right.op.type == 'MINUS' and is_target(right.left): function, operand, negated = '_sum', right.right, True
+        elif isinstance(right, FuncCall) and right.name.lower() in self.REDUCTIONS and len(right.args) == 2 and is_target(right.args[0]):
+            function, operand, negated = self.REDUCTIONS[right.name.lower()], right.args[1], False
+        else: raise InterpreterError(f"assigns '{name}'", node)
+        value, numpy_typed = self.value(operand)
+        # A term the VM computes as a Python number could make the running total a Python int or float instead of a NumPy scalar
+        if not numpy_typed: raise InterpreterError(f"'{name}' is not reduced over array elements", node)
+        selected = f"_select({value}, {mask}, _n)"
+        self.reductions[name] = self.temp(f"{function}({self.param(name)}, {f'_negate({selected}, _np.negative)' if negated else selected})")
+    def condition(self, node):
+        if isinstance(node, BinOp) and node.op.type in self.COMPARISONS:
+            (left, _), (right, _) = self.value(node.left), self.value(node.right); return f"({left} {self.COMPARISONS[node.op.type]} {right})"
+        if isinstance(node, BinOp) and node.op.type in ('AND', 'OR'):
+            return f"_np.logical_{node.op.type.lower()}({self.condition(node.left)}, {self.condition(node.right)})"
+        if isinstance(node, UnaryOp) and node.op.type == 'NOT': return f"_np.logical_not({self.condition(node.expr)})"
+        return f"({self.value(node)[0]} != 0)"
+    def value(self, node):
+        """Returns (code, numpy_typed): the kernel expression for `node` over the whole slice, and whether the VM computes each
+        element as a NumPy scalar. Those follow NumPy's rules at any size; the others are Python numbers, checked by _exact,
+        _product and _divide to stay where float64/int64 arithmetic gives the same results."""
+        if isinstance(node, Num):
+            if type(node.value) not in (int, float) or not abs(node.value) < VECTOR_EXACT_LIMIT: raise InterpreterError(f"the literal {node.value!r}", node)
+            return repr(node.value), False
+        if isinstance(node, Var):
+            name = node.value.lower()
+            if name == self.counter: self.uses_counter = True; return "_i", False
+            if name in self.stored or name in self.assigned: raise InterpreterError(f"reads '{name}', which the loop assigns", node)
+            if name not in self.scalars: self.scalars.append(name)
+            return self.param(name), False
+        if isinstance(node, SubscriptAccess):
+            name = self.element(node)
+            if name is None: raise InterpreterError("reads an element other than [counter]", node)
+            return self.current.get(name, f"{self.params[name]}[_s]"), True
+        if isinstance(node, BinOp) and node.op.type in self.ARITHMETIC:
+            (left, left_numpy), (right, right_numpy) = self.value(node.left), self.value(node.right); op = node.op.type
+            if left_numpy or right_numpy: return (f"({left} / {right})" if op == 'DIV' else f"_integer({left}, '{self.ARITHMETIC[op]}', {right})"), True
+            if op == 'MUL': return f"_product({left}, {right})", False
+            if op == 'DIV': return f"_divide({left}, {right})", False
+            return f"_exact({left} {self.ARITHMETIC[op]} {right})", False
+        if isinstance(node, UnaryOp) and node.op.type in ('MINUS', 'PLUS'):
+            operand, numpy_typed = self.value(node.expr)
+            if node.op.type == 'PLUS': return operand, numpy_typed
+            return (f"_negate({operand}, _np.negative)" if numpy_typed else f"(-{operand})"), numpy_typed
+        if isinstance(node, FuncCall):
+            name, args = node.name.lower(), [self.value(arg) for arg in node.args]
+            if name == 'abs' and len(args) == 1: return (f"_negate({args[0][0]}, _np.abs)" if args[0][1] else f"_np.abs({args[0][0]})"), args[0][1]
+            if name == 'sqrt' and len(args) == 1: return f"_sqrt({args[0][0]})", False
+            if name in ('max', 'min') and len(args) == 2:
+                # builtin max(a, b) is b only where b > a (min: b < a), so ties and NaNs pick the same operand as the VM
+                (a, a_numpy), (b, b_numpy) = args; picked = f"_np.where({b} {'>' if name == 'max' else '<'} {a}, {b}, {a})"
+                return (picked, True) if a_numpy and b_numpy else (f"_exact({picked}, True)", False)
+            raise InterpreterError(f"calls '{name}'", node)
+        raise InterpreterError(f"'{type(node).__name__}'", node)
+
 ### --- CHANGE START (8/8): Add new OpCodes for F-String and multi-dim index --- ###
 class OpCode(Enum):
     LOAD_CONST=auto(); POP=auto(); LOAD_GLOBAL=auto(); STORE_GLOBAL=auto(); LOAD_LOCAL=auto(); STORE_LOCAL=auto();
@@ -718,65 +1158,322 @@ class OpCode(Enum):
     PRINT=auto(); INPUT=auto(); JUMP_IF_FALSE=auto(); JUMP=auto(); LOOP=auto(); CALL=auto(); RETURN=auto();
     DEFINE_FUNC=auto(); BUILD_ARRAY=auto(); LOAD_SUBSCRIPT=auto(); STORE_SUBSCRIPT=auto(); READ_DATA=auto();
     RESTORE_DATA=auto(); AWAIT=auto(); CREATE_TASK=auto(); IMPORT_MODULE=auto(); BUILD_DICT=auto(); BUILD_STRING=auto();
-    SETUP_TRY=auto(); POP_TRY=auto(); THROW=auto(); DUP=auto(); BUILD_ARRAY_LITERAL=auto(); DEBUG_PRINT=auto();
+    THROW=auto(); DUP=auto(); BUILD_ARRAY_LITERAL=auto(); DEBUG_PRINT=auto();
     GET_LENGTH=auto(); BUILD_TUPLE=auto()
+    # Quickened variants: never emitted by the compiler, the VM rewrites generic opcodes into them in place at runtime
+    ADD_NUM=auto(); ADD_STR=auto(); SUBTRACT_NUM=auto(); MULTIPLY_NUM=auto(); DIVIDE_NUM=auto(); EQUAL_NUM=auto();
+    NOT_EQUAL_NUM=auto(); GREATER_NUM=auto(); LESS_NUM=auto(); GREATER_EQUAL_NUM=auto(); LESS_EQUAL_NUM=auto();
+    LOAD_SUBSCRIPT_ARRAY=auto(); LOAD_SUBSCRIPT_DICT=auto()
+    # CALL takes the callee from the stack; CALL_BUILTIN names a builtin/JIT function by constant and carries a trailing argc byte
+    CALL_BUILTIN=auto()
+    # Prefix carrying the high bytes of the next instruction's operand, for operands that do not fit in one byte (two for jumps)
+    EXTENDED_ARG=auto()
+    # Only produced by the peephole optimizer: JUMP_IF_FALSE fused with the POPs that followed it on both edges
+    POP_JUMP_IF_FALSE=auto()
+    # Superinstructions for loops. FOR_PREP/FOR_STEP drive a counted FOR whose limit and step cannot change inside the loop: FOR_PREP
+    # packs (limit, step, direction) into the hidden local after the counter, FOR_STEP increments and jumps back while in range.
+    # Both carry the counter slot as a trailing byte.
+    FOR_PREP=auto(); FOR_STEP=auto()
+    # `x = x + n` / `x = x - n` statements with a numeric literal n; the trailing byte is n's constant index
+    INC_LOCAL=auto(); DEC_LOCAL=auto(); INC_GLOBAL=auto(); DEC_GLOBAL=auto()
+    # Pop both operands of a comparison and jump forward when it is false
+    COMPARE_JUMP_EQ=auto(); COMPARE_JUMP_NE=auto(); COMPARE_JUMP_GT=auto(); COMPARE_JUMP_LT=auto(); COMPARE_JUMP_GE=auto(); COMPARE_JUMP_LE=auto()
+    # FOR EACH: GET_ITER replaces the collection by an iterator, FOR_ITER stores its next item in the loop variable on top of the
+    # stack and jumps back into the body, falling through once the iterator is exhausted
+    GET_ITER=auto(); FOR_ITER=auto()
+    # SWITCH whose case labels are all literals: pops the subject and jumps by the offset its constant dict maps it to, or falls through
+    # to the DEFAULT code when it is not in the table
+    SWITCH_TABLE=auto()
+    # Calls. CALL_GLOBAL takes the callee from its global slot instead of the stack (trailing byte: argc); CALL_BUILTIN_<n> calls the
+    # builtin/JIT function named by its constant operand with n arguments taken straight off the top of the stack
+    CALL_GLOBAL=auto(); CALL_BUILTIN_0=auto(); CALL_BUILTIN_1=auto(); CALL_BUILTIN_2=auto(); CALL_BUILTIN_3=auto()
+    # `RETURN f(...)`: like CALL_GLOBAL, but the callee takes over the current frame and its stack window
+    TAIL_CALL=auto()
+    # Call of a JIT FUNCTION of this module: CALL_GLOBAL operands, but the Numba version registered under the global's name
+    # in the VM's jit_functions is called while there is one. Rewrites itself to CALL_GLOBAL once there is none.
+    CALL_JIT=auto()
+    # First instruction of a FUNCTION TierTranspiler accepted, and first of each of its loop bodies: counts hotness, and at the entry
+    # runs the machine code version instead when one was compiled for these argument types (see TierState)
+    TIER_UP=auto()
 ### --- CHANGE END (8/8) --- ###
+# Width in bytes of each opcode's operand before EXTENDED_ARG prefixes; opcodes not listed take none
+OPERAND_BYTES = {op.value: 1 for op in (OpCode.LOAD_CONST, OpCode.LOAD_GLOBAL, OpCode.STORE_GLOBAL, OpCode.LOAD_LOCAL, OpCode.STORE_LOCAL,
+    OpCode.CALL, OpCode.CALL_BUILTIN, OpCode.DEFINE_FUNC, OpCode.BUILD_ARRAY, OpCode.IMPORT_MODULE, OpCode.BUILD_DICT, OpCode.BUILD_STRING,
+    OpCode.BUILD_ARRAY_LITERAL, OpCode.DEBUG_PRINT, OpCode.BUILD_TUPLE, OpCode.SWITCH_TABLE, OpCode.CALL_GLOBAL, OpCode.TAIL_CALL, OpCode.CALL_JIT, OpCode.CALL_BUILTIN_0,
+    OpCode.CALL_BUILTIN_1, OpCode.CALL_BUILTIN_2, OpCode.CALL_BUILTIN_3, OpCode.INC_LOCAL, OpCode.DEC_LOCAL, OpCode.INC_GLOBAL, OpCode.DEC_GLOBAL)}
+COMPARE_JUMP_OPCODES = (OpCode.COMPARE_JUMP_EQ, OpCode.COMPARE_JUMP_NE, OpCode.COMPARE_JUMP_GT, OpCode.COMPARE_JUMP_LT, OpCode.COMPARE_JUMP_GE, OpCode.COMPARE_JUMP_LE)
+OPERAND_BYTES.update({op.value: 2 for op in (OpCode.JUMP_IF_FALSE, OpCode.JUMP, OpCode.LOOP, OpCode.POP_JUMP_IF_FALSE,
+    OpCode.FOR_PREP, OpCode.FOR_STEP, OpCode.FOR_ITER, *COMPARE_JUMP_OPCODES)})
+# Fixed-width bytes following the operand that EXTENDED_ARG never applies to
+TRAILING_BYTES = {op.value: 1 for op in (OpCode.CALL_BUILTIN, OpCode.CALL_GLOBAL, OpCode.TAIL_CALL, OpCode.CALL_JIT, OpCode.FOR_PREP, OpCode.FOR_STEP, OpCode.INC_LOCAL, OpCode.DEC_LOCAL, OpCode.INC_GLOBAL, OpCode.DEC_GLOBAL)}
+# Jump offsets are relative to the end of the instruction (trailing bytes included): forward for these, backward for LOOP, FOR_STEP and FOR_ITER
+FORWARD_JUMPS = frozenset(op.value for op in (OpCode.JUMP_IF_FALSE, OpCode.JUMP, OpCode.POP_JUMP_IF_FALSE, OpCode.FOR_PREP, *COMPARE_JUMP_OPCODES))
+JUMP_OPCODES = FORWARD_JUMPS | {OpCode.LOOP.value, OpCode.FOR_STEP.value, OpCode.FOR_ITER.value}
+# Operand types the *_NUM opcodes are specialized for (bool is excluded on purpose: the generic path maps it to int)
+NUMBER_TYPES = frozenset((int, float, np.int64, np.float64))
+# A quickened instruction that had to deoptimize this many times stays generic for good
+QUICKEN_MAX_DEOPTS = 4
 
 class FunctionObject:
     def __init__(self, name, arity, chunk, is_async=False):
         self.name, self.arity, self.chunk, self.is_async = name, arity, chunk, is_async
+        self.globals = None # Value array of the Namespace the function was defined in, bound by DEFINE_FUNC
+        self.call_arity = -1 if is_async else arity # What a synchronous call must pass: one compare checks both arity and async-ness
     def __repr__(self): return f"<Fn {self.name}/{self.arity}>"
 class Chunk:
     def __init__(self, name="<script>"):
         self.name, self.code, self.constants, self.lines_rle = name, bytearray(), [], []
+        # Module-level metadata, only filled in on the top-level <script> chunk by compile_source
+        self.data_pool, self.jit_sources, self.jit_errors, self.imports = [], [], [], []
+        self.global_names = [] # Slot -> name table shared by every chunk of a module; LOAD_GLOBAL/STORE_GLOBAL operands index it
+        self._line_table = None; self.deopt_counts = {}
+        self._constant_index = {}
+        self.exception_table = [] # ExceptionHandlers, innermost TRY first; only read when an error is raised
+        self.tier = None # TierState of a FUNCTION compiled with TIER_UP
     def write(self, byte, line):
-        self.code.append(byte)
+        self.code.append(byte); self._line_table = None
         if not self.lines_rle or self.lines_rle[-1][0] != line: self.lines_rle.append([line, 1])
         else: self.lines_rle[-1][1] += 1
     def get_line(self, ip):
-        current_ip = 0
-        for line, count in self.lines_rle:
-            current_ip += count;
-            if ip < current_ip: return line
+        # lines_rle stays the compact source of truth; the flat ip -> line table is expanded once, on the first error lookup
+        table = self._line_table
+        if table is None:
+            table = array('i')
+            for line, count in self.lines_rle: table.extend(array('i', [line]) * count)
+            self._line_table = table
+        if 0 <= ip < len(table): return table[ip]
         return self.lines_rle[-1][0] if self.lines_rle else '?'
     def add_constant(self, value):
-        # Allow tuples in constants for multi-dim indexing
-        if isinstance(value, (int, float, str, bool, type(None), FunctionObject)):
-             try: return self.constants.index(value)
-             except ValueError: pass # Fall through to append
-
-        for i, c in enumerate(self.constants):
-            if type(c) is not type(value): continue
-            if isinstance(c, np.ndarray):
-                if np.array_equal(c, value): return i
-            elif c == value: return i
-        self.constants.append(value); return len(self.constants) - 1
+        # Hashable constants (tuples included, for multi-dim indexing) are keyed by _constant_key so 1, 1.0, True and -0.0, 0.0 stay
+        # apart; unhashable ones such as ndarrays are only shared by identity
+        try: key = _constant_key(value); index = self._constant_index.get(key)
+        except TypeError: key = (id(value),); index = self._constant_index.get(key)
+        if index is None:
+            index = self._constant_index[key] = len(self.constants); self.constants.append(value)
+        return index
+
+def _constant_key(value):
+    if type(value) is float: return (float, value, math.copysign(1.0, value))
+    if type(value) is tuple: return (tuple, tuple(_constant_key(v) for v in value))
+    return (type(value), value)
+
+class ExceptionHandler:
+    """One exception table row: an error raised by an instruction in [start, end) resumes at `target` with the frame's stack window
+    cut back to `depth` slots. `keeps_error` says whether the handler reads the error message (otherwise it receives None).
+    Positions are code offsets, or Instructions while the chunk is decoded for the optimizer."""
+    __slots__ = ('start', 'end', 'target', 'depth', 'keeps_error')
+    def __init__(self, start, end, target, depth, keeps_error): self.start, self.end, self.target, self.depth, self.keeps_error = start, end, target, depth, keeps_error
+    def positions(self): return (self.start, self.end, self.target)
+
+class Instruction:
+    """One decoded instruction. `arg` is the full operand; jumps point at their `target` Instruction instead of an offset, and a
+    SWITCH_TABLE maps each case value to the Instruction it jumps to in `cases`."""
+    __slots__ = ('op', 'arg', 'trailing', 'line', 'target', 'cases')
+    def __init__(self, op, arg=0, trailing=b'', line=-1, target=None):
+        self.op, self.arg, self.trailing, self.line, self.target, self.cases = op, arg, trailing, line, target, None
+    def successors(self):
+        # Every instruction this one can jump to
+        if self.target is not None: return (self.target,)
+        return tuple(self.cases.values()) if self.cases else ()
+    def __repr__(self): return f"<{OpCode(self.op).name} {self.arg}>"
+def decode_instructions(chunk, jump_targets=None):
+    """Decodes chunk.code into (Instructions, ExceptionHandlers over them). `jump_targets` maps the position of a jump whose offset did not
+    fit its operand to its absolute target."""
+    code, instructions, by_position, jumps, switches = chunk.code, [], {}, [], []
+    ip = start = ext = 0
+    while ip < len(code):
+        op = code[ip]
+        if op == OpCode.EXTENDED_ARG.value: ext = (ext | code[ip + 1]) << 8; ip += 2; continue
+        width = OPERAND_BYTES.get(op, 0); arg = 0
+        for i in range(width): arg = (arg << 8) | code[ip + 1 + i]
+        if width: arg |= ext << (8 * (width - 1))
+        end = ip + 1 + width + TRAILING_BYTES.get(op, 0)
+        instruction = Instruction(op, arg, bytes(code[ip + 1 + width:end]), chunk.get_line(ip))
+        instructions.append(instruction); by_position[start] = instruction
+        if op in JUMP_OPCODES:
+            if jump_targets and ip in jump_targets: target = jump_targets[ip]
+            else: target = end + arg if op in FORWARD_JUMPS else end - arg
+            jumps.append((instruction, target))
+        elif op == OpCode.SWITCH_TABLE.value: switches.append((instruction, end))
+        ip = start = end; ext = 0
+    for instruction, target in jumps: instruction.target = by_position[target]
+    for instruction, end in switches: instruction.cases = {value: by_position[end + offset] for value, offset in chunk.constants[instruction.arg].items()}
+    handlers = [ExceptionHandler(*(by_position[position] for position in handler.positions()), handler.depth, handler.keeps_error) for handler in chunk.exception_table]
+    return instructions, handlers
+def assemble_instructions(chunk, instructions, handlers=()):
+    """Re-encodes `instructions` into chunk.code and chunk.lines_rle, adding EXTENDED_ARG prefixes wherever an operand outgrows its bytes.
+    `handlers` become the chunk's exception table."""
+    prefixes, index = [0] * len(instructions), {id(instruction): i for i, instruction in enumerate(instructions)}
+    while True: # Widening one jump moves others, so repeat until the layout is stable (prefix counts only ever grow)
+        positions, position = [], 0
+        for i, instruction in enumerate(instructions):
+            positions.append(position); position += 2 * prefixes[i] + 1 + OPERAND_BYTES.get(instruction.op, 0) + len(instruction.trailing)
+        positions.append(position); changed = False
+        for i, instruction in enumerate(instructions):
+            width = OPERAND_BYTES.get(instruction.op, 0)
+            if instruction.target is not None:
+                end, target = positions[i + 1], positions[index[id(instruction.target)]]
+                if instruction.op in (OpCode.JUMP.value, OpCode.LOOP.value): instruction.op = OpCode.JUMP.value if target >= end else OpCode.LOOP.value
+                instruction.arg = target - end if instruction.op in FORWARD_JUMPS else end - target
+                if instruction.arg < 0: raise ValueError(f"{OpCode(instruction.op).name} cannot jump backwards")
+            needed = 0
+            while instruction.arg >> (8 * (width + needed)): needed += 1
+            if needed > prefixes[i]: prefixes[i] = needed; changed = True
+        if not changed: break
+    for i, instruction in enumerate(instructions):
+        if instruction.cases is not None: # Jump tables live in the constant pool; rewrite their offsets in place
+            table = chunk.constants[instruction.arg]; table.clear(); table.update({value: positions[index[id(target)]] - positions[i + 1] for value, target in instruction.cases.items()})
+    code, lines_rle = bytearray(), []
+    for i, instruction in enumerate(instructions):
+        arg, width, start = instruction.arg, OPERAND_BYTES.get(instruction.op, 0), len(code)
+        for k in range(prefixes[i], 0, -1): code += bytes((OpCode.EXTENDED_ARG.value, (arg >> (8 * (width + k - 1))) & 0xff))
+        code.append(instruction.op); code += bytes((arg >> (8 * k)) & 0xff for k in range(width - 1, -1, -1)); code += instruction.trailing
+        if lines_rle and lines_rle[-1][0] == instruction.line: lines_rle[-1][1] += len(code) - start
+        else: lines_rle.append([instruction.line, len(code) - start])
+    chunk.code[:] = code; chunk.lines_rle = lines_rle; chunk._line_table = None
+    chunk.exception_table = [ExceptionHandler(*(positions[index[id(instruction)]] for instruction in handler.positions()), handler.depth, handler.keeps_error) for handler in handlers]
+
+# --- Peephole optimizer: runs on decoded Instructions, so jump offsets, operand widths and lines_rle are rebuilt by the assembler ---
+def _sweep(instructions, handlers, dead):
+    # Drops deleted instructions; jumps into a deleted run continue at the next surviving instruction, and so do handler boundaries
+    successor, following = {}, None
+    for instruction in reversed(instructions):
+        if id(instruction) in dead: successor[id(instruction)] = following
+        else: following = instruction
+    for instruction in instructions:
+        if instruction.target is not None and id(instruction.target) in dead: instruction.target = successor[id(instruction.target)]
+        if instruction.cases: instruction.cases = {value: successor[id(target)] if id(target) in dead else target for value, target in instruction.cases.items()}
+    for handler in handlers: handler.start, handler.end, handler.target = (successor[id(i)] if id(i) in dead else i for i in handler.positions())
+    instructions[:] = [instruction for instruction in instructions if id(instruction) not in dead]
+def _jump_references(instructions, handlers):
+    refs = {}
+    for instruction in instructions:
+        for target in instruction.successors(): refs[id(target)] = refs.get(id(target), 0) + 1
+    for handler in handlers: # Range boundaries count too, so no pass merges an instruction across them
+        for target in handler.positions(): refs[id(target)] = refs.get(id(target), 0) + 1
+    return refs
+def _thread_jumps(instructions):
+    # Jumps onto an unconditional JUMP/LOOP go straight to its target, and a JUMP_IF_FALSE onto another JUMP_IF_FALSE takes
+    # that one too (the same falsy value is still on the stack). Conditional jumps keep their direction (FOR_STEP/FOR_ITER go backwards).
+    JUMP, LOOP, JUMP_IF_FALSE, RETURN = OpCode.JUMP.value, OpCode.LOOP.value, OpCode.JUMP_IF_FALSE.value, OpCode.RETURN.value
+    position, changed = {id(instruction): i for i, instruction in enumerate(instructions)}, False
+    for i, instruction in enumerate(instructions):
+        if instruction.target is None: continue
+        seen = {id(instruction)}
+        while id(instruction.target) not in seen:
+            hop = instruction.target; seen.add(id(hop))
+            if not (hop.op in (JUMP, LOOP) or (instruction.op == JUMP_IF_FALSE and hop.op == JUMP_IF_FALSE)): break
+            if instruction.op not in (JUMP, LOOP) and (position[id(hop.target)] <= i) == (instruction.op in FORWARD_JUMPS): break
+            instruction.target = hop.target; changed = True
+        if instruction.op in (JUMP, LOOP) and instruction.target.op == RETURN:
+            instruction.op, instruction.arg, instruction.target = RETURN, 0, None; changed = True
+    return changed
+def _fuse_conditional_pops(instructions, handlers):
+    # JUMP_IF_FALSE L; POP ... <JUMP/LOOP/RETURN> L: POP  ->  POP_JUMP_IF_FALSE past L, when nothing else reaches either POP
+    JUMP_IF_FALSE, POP = OpCode.JUMP_IF_FALSE.value, OpCode.POP.value
+    terminators = (OpCode.JUMP.value, OpCode.LOOP.value, OpCode.RETURN.value, OpCode.TAIL_CALL.value)
+    position, refs, dead = {id(instruction): i for i, instruction in enumerate(instructions)}, _jump_references(instructions, handlers), set()
+    for i, instruction in enumerate(instructions[:-1]):
+        if instruction.op != JUMP_IF_FALSE or id(instruction) in dead: continue
+        fallthrough, landing = instructions[i + 1], instruction.target; t = position[id(landing)]
+        if fallthrough.op != POP or refs.get(id(fallthrough)) or landing.op != POP or refs.get(id(landing)) != 1: continue
+        if t <= i + 1 or t + 1 >= len(instructions) or instructions[t - 1].op not in terminators or {id(fallthrough), id(landing), id(instructions[t - 1])} & dead: continue
+        instruction.op, instruction.target = OpCode.POP_JUMP_IF_FALSE.value, instructions[t + 1]
+        refs[id(instructions[t + 1])] = refs.get(id(instructions[t + 1]), 0) + 1; dead.update((id(fallthrough), id(landing)))
+    _sweep(instructions, handlers, dead); return bool(dead)
+def _remove_redundant_loads(instructions, handlers):
+    # STORE x; POP; LOAD x -> STORE x (the stored value is still on the stack), pure push + POP -> nothing, JUMP to the next instruction -> nothing
+    POP, JUMP = OpCode.POP.value, OpCode.JUMP.value
+    store_load = {OpCode.STORE_LOCAL.value: OpCode.LOAD_LOCAL.value, OpCode.STORE_GLOBAL.value: OpCode.LOAD_GLOBAL.value}
+    pure_pushes = (OpCode.LOAD_CONST.value, OpCode.LOAD_LOCAL.value, OpCode.DUP.value)
+    refs, dead, i = _jump_references(instructions, handlers), set(), 0
+    while i < len(instructions) - 1:
+        first, second = instructions[i], instructions[i + 1]
+        if first.op in store_load and i + 2 < len(instructions) and second.op == POP and not refs.get(id(second)):
+            third = instructions[i + 2]
+            if third.op == store_load[first.op] and third.arg == first.arg and not refs.get(id(third)): dead.update((id(second), id(third))); i += 3; continue
+        if first.op in pure_pushes and second.op == POP and not refs.get(id(second)): dead.update((id(first), id(second))); i += 2; continue
+        if first.op == JUMP and first.target is second: dead.add(id(first))
+        i += 1
+    _sweep(instructions, handlers, dead); return bool(dead)
+def _remove_dead_code(instructions, handlers):
+    # Anything not reachable from the entry point or a handler by fallthrough or a jump (code after JUMP/LOOP/RETURN up to the next label)
+    terminators = (OpCode.JUMP.value, OpCode.LOOP.value, OpCode.RETURN.value, OpCode.TAIL_CALL.value)
+    position, reachable = {id(instruction): i for i, instruction in enumerate(instructions)}, set()
+    pending = [0] + [position[id(handler.target)] for handler in handlers]
+    while pending:
+        i = pending.pop()
+        if i >= len(instructions) or i in reachable: continue
+        reachable.add(i); instruction = instructions[i]
+        pending.extend(position[id(target)] for target in instruction.successors())
+        if instruction.op not in terminators: pending.append(i + 1)
+    dead = {id(instruction) for i, instruction in enumerate(instructions) if i not in reachable}
+    _sweep(instructions, handlers, dead); return bool(dead)
+def optimize_chunk(chunk):
+    """Runs the peephole passes over `chunk` until none of them finds anything more; returns the instruction counts (before, after)."""
+    instructions, handlers = decode_instructions(chunk); before = len(instructions)
+    while (_thread_jumps(instructions) | _fuse_conditional_pops(instructions, handlers) | _remove_redundant_loads(instructions, handlers)
+           | _remove_dead_code(instructions, handlers)): pass
+    assemble_instructions(chunk, instructions, handlers); return before, len(instructions)
+def optimize_function(function, module_name):
+    """Optimizes `function` and every function nested in its constants, printing the per-chunk reduction when DEBUG_OPTIMIZER is set."""
+    before, after = optimize_chunk(function.chunk)
+    if DEBUG_OPTIMIZER: print(t('debug_peephole', module=module_name, function=function.name, before=before, after=after, removed=before - after), file=sys.stderr)
+    for constant in function.chunk.constants:
+        if isinstance(constant, FunctionObject): optimize_function(constant, module_name)
 
 class Compiler:
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, global_names=None, tier_sources=None):
         self.chunk, self.scope_depth, self.locals, self.parent = Chunk(), 0, [], parent
+        if parent is not None: self.global_names, self.global_slots = parent.global_names, parent.global_slots
+        else:
+            self.global_names = global_names if global_names is not None else []
+            self.global_slots = {name: slot for slot, name in enumerate(self.global_names)}
+        self.chunk.global_names = self.global_names
+        self.long_jumps = {} # Jump position -> absolute target, for offsets beyond 16 bits; resolved by relocate_long_jumps
         self.function = FunctionObject("<script>", 0, self.chunk) if parent is None else None
         self.loop_stack = []
-        self.foreach_iterator_count = 0
+        self.try_depth = 0 # Number of TRY blocks in this function whose protected range encloses the code being compiled
+        self.jit_names = parent.jit_names if parent is not None else set() # JIT FUNCTIONs of this module, called with CALL_JIT
+        self.tier_sources = parent.tier_sources if parent is not None else tier_sources or {} # id(FuncDef) -> TierTranspiler source
 
     def error(self, message, token): raise ParserError(message, token)
     def compile(self, program_node):
-        self.visit(program_node)
-        self.emit(OpCode.LOAD_CONST, -1); self.emit_byte(self.chunk.add_constant(None), -1)
-        self.emit(OpCode.RETURN, -1); return self.function
+        self.jit_names.update(stmt.name.lower() for stmt in program_node.statements if isinstance(stmt, FuncDef) and stmt.is_jit)
+        # The value of a trailing expression statement becomes the script result (echoed by the REPL)
+        if not self.visit_Program(program_node, keep_last_value=True):
+            self.emit_constant(None, -1)
+        self.emit(OpCode.RETURN, -1); self.relocate_long_jumps(); return self.function
     def emit(self, opcode, line): self.chunk.write(opcode.value, line)
     def emit_byte(self, byte, line): self.chunk.write(byte, line)
     def emit_bytes(self, b1, b2, line): self.emit_byte(b1, line); self.emit_byte(b2, line)
-    def emit_constant(self, value, line):
-        idx = self.chunk.add_constant(value)
-        self.emit(OpCode.LOAD_CONST, line); self.emit_byte(idx, line)
-    def emit_jump(self, instruction, line):
+    def emit_arg(self, opcode, arg, line):
+        # Operands above 0xff spill their high bytes into EXTENDED_ARG prefixes
+        shift = 8
+        while arg >> shift: shift += 8
+        for high in range(shift - 8, 0, -8): self.emit_bytes(OpCode.EXTENDED_ARG.value, (arg >> high) & 0xff, line)
+        self.emit(opcode, line); self.emit_byte(arg & 0xff, line)
+    def emit_constant(self, value, line): self.emit_arg(OpCode.LOAD_CONST, self.chunk.add_constant(value), line)
+    def emit_jump(self, instruction, line, trailing=()):
         self.emit(instruction, line); self.emit_byte(0xff, line); self.emit_byte(0xff, line)
-        return len(self.chunk.code) - 2
+        for byte in trailing: self.emit_byte(byte, line)
+        return len(self.chunk.code) - 2 - len(trailing)
     def patch_jump(self, offset):
-        jump = len(self.chunk.code) - offset - 2
-        if jump > 65535: raise Exception("Jump too large")
+        jump = len(self.chunk.code) - offset - 2 - TRAILING_BYTES.get(self.chunk.code[offset - 1], 0)
+        if jump > 65535: self.long_jumps[offset - 1] = len(self.chunk.code); jump = 0
         self.chunk.code[offset] = (jump >> 8) & 0xff; self.chunk.code[offset + 1] = jump & 0xff
+    def emit_loop(self, loop_start, line, instruction=OpCode.LOOP, trailing=()):
+        offset = len(self.chunk.code) - loop_start + 3 + len(trailing)
+        if offset > 65535: self.long_jumps[len(self.chunk.code)] = loop_start; offset = 0
+        self.emit(instruction, line); self.emit_bytes((offset >> 8) & 0xff, offset & 0xff, line)
+        for byte in trailing: self.emit_byte(byte, line)
+    def relocate_long_jumps(self):
+        # Jumps past 64 KB were left with a placeholder offset; re-encode the chunk so they get EXTENDED_ARG prefixes
+        if self.long_jumps: assemble_instructions(self.chunk, *decode_instructions(self.chunk, self.long_jumps)); self.long_jumps.clear()
+    def global_slot(self, name):
+        slot = self.global_slots.get(name)
+        if slot is None: slot = self.global_slots[name] = len(self.global_names); self.global_names.append(name)
+        return slot
     def begin_scope(self): self.scope_depth += 1
     def end_scope(self):
         self.scope_depth -= 1; pops_needed = 0
@@ -795,18 +1492,25 @@ class Compiler:
             if self.locals[i]['name'] == name: return i
         return -1
     def visit(self, node): getattr(self, f'visit_{type(node).__name__}')(node)
-    def visit_Program(self, node): 
+    def leaves_value(self, stmt):
+        # Net stack effect of a statement: expressions, assignments, DIM, INPUT and function definitions push a value
+        if isinstance(stmt, Declare): return self.scope_depth == 0 # Inside a scope the pushed None *is* the new local's slot
+        return not isinstance(stmt, (Print, If, While, For, ForEach, Return, Debug, Data, Read, Restore, RunAsync, Import, Break, Continue, Try, Throw, Switch, NoOp))
+    def visit_Program(self, node, keep_last_value=False):
         for i, stmt in enumerate(node.statements):
+             if not (keep_last_value and i == len(node.statements) - 1) and self.emit_increment(stmt): continue
              self.visit(stmt)
-             if not isinstance(stmt, (Print, Assign, If, While, For, ForEach, FuncDef, Return, Debug, Declare)) and i < len(node.statements) -1:
-                 # Pop result of expressions used as statements, unless it's the last one in a script (for REPL)
+             if self.leaves_value(stmt):
+                 if keep_last_value and i == len(node.statements) - 1: return True
+                 # Pop the result of statements so loop bodies and local slots stay balanced
                  self.emit(OpCode.POP, stmt.token.line if hasattr(stmt, 'token') else -1)
+        return False
     def visit_NoOp(self, node): pass
     def visit_Num(self, node): self.emit_constant(node.value, node.token.line)
     def visit_String(self, node): self.emit_constant(node.value, node.token.line)
     def visit_FString(self, node):
         for part in node.parts: self.visit(part)
-        self.emit_bytes(OpCode.BUILD_STRING.value, len(node.parts), node.token.line)
+        self.emit_arg(OpCode.BUILD_STRING, len(node.parts), node.token.line)
     def visit_BinOp(self, node):
         if isinstance(node.left, Num) and isinstance(node.right, Num):
             val_l, val_r = node.left.value, node.right.value
@@ -827,25 +1531,23 @@ class Compiler:
         op_map = {'PLUS': OpCode.ADD, 'MINUS': OpCode.SUBTRACT, 'MUL': OpCode.MULTIPLY, 'DIV': OpCode.DIVIDE, 'EQ': OpCode.EQUAL, 'NEQ': OpCode.NOT_EQUAL, 'GT': OpCode.GREATER, 'LT': OpCode.LESS, 'GTE': OpCode.GREATER_EQUAL, 'LTE': OpCode.LESS_EQUAL}
         self.emit(op_map[node.op.type], node.op.line)
     def visit_UnaryOp(self, node):
+        if node.op.type == 'MINUS' and isinstance(node.expr, Num): self.emit_constant(-node.expr.value, node.token.line); return
         self.visit(node.expr)
-        if node.op.type == 'MINUS' and isinstance(node.expr, Num):
-            self.chunk.code.pop(); self.chunk.code.pop(); self.emit_constant(-node.expr.value, node.token.line); return
         op_map = {'MINUS': OpCode.NEGATE, 'NOT': OpCode.NOT}
         if node.op.type in op_map: self.emit(op_map[node.op.type], node.op.line)
     def visit_Var(self, node):
         local_idx = self.resolve_local(node.token)
-        if local_idx != -1: self.emit_bytes(OpCode.LOAD_LOCAL.value, local_idx, node.token.line)
-        else: self.emit_bytes(OpCode.LOAD_GLOBAL.value, self.chunk.add_constant(node.value.lower()), node.token.line)
+        if local_idx != -1: self.emit_arg(OpCode.LOAD_LOCAL, local_idx, node.token.line)
+        else: self.emit_arg(OpCode.LOAD_GLOBAL, self.global_slot(node.value.lower()), node.token.line)
     
     def visit_Assign(self, node):
         if isinstance(node.left, Var):
             self.visit(node.right) # Standard: value then store
             local_idx = self.resolve_local(node.left.token)
             if local_idx != -1:
-                self.emit_bytes(OpCode.STORE_LOCAL.value, local_idx, node.token.line)
+                self.emit_arg(OpCode.STORE_LOCAL, local_idx, node.token.line)
             else:
-                const_idx = self.chunk.add_constant(node.left.value.lower())
-                self.emit_bytes(OpCode.STORE_GLOBAL.value, const_idx, node.token.line)
+                self.emit_arg(OpCode.STORE_GLOBAL, self.global_slot(node.left.value.lower()), node.token.line)
         elif isinstance(node.left, SubscriptAccess):
             # For store, we need container, key, then value on stack
             self.visit(node.left.primary) # 1. Container
@@ -853,7 +1555,7 @@ class Compiler:
             if len(node.left.index_exprs) > 1:
                 for expr in node.left.index_exprs:
                     self.visit(expr)
-                self.emit_bytes(OpCode.BUILD_TUPLE.value, len(node.left.index_exprs), node.token.line)
+                self.emit_arg(OpCode.BUILD_TUPLE, len(node.left.index_exprs), node.token.line)
             else:
                 self.visit(node.left.index_exprs[0])
             self.visit(node.right) # 3. Value
@@ -868,14 +1570,13 @@ class Compiler:
         
         local_idx = self.resolve_local(var_node.token)
         if local_idx != -1:
-            self.emit_bytes(OpCode.STORE_LOCAL.value, local_idx, node.token.line)
+            self.emit_arg(OpCode.STORE_LOCAL, local_idx, node.token.line)
         elif self.scope_depth > 0:
             self.add_local(var_node.token)
             new_local_idx = self.resolve_local(var_node.token)
-            self.emit_bytes(OpCode.STORE_LOCAL.value, new_local_idx, node.token.line)
+            self.emit_arg(OpCode.STORE_LOCAL, new_local_idx, node.token.line)
         else:
-            const_idx = self.chunk.add_constant(var_node.value.lower())
-            self.emit_bytes(OpCode.STORE_GLOBAL.value, const_idx, node.token.line)
+            self.emit_arg(OpCode.STORE_GLOBAL, self.global_slot(var_node.value.lower()), node.token.line)
 
     def visit_Print(self, node): self.visit(node.expr); self.emit(OpCode.PRINT, node.token.line)
     def visit_Input(self, node):
@@ -889,9 +1590,9 @@ class Compiler:
             # For input, the value is already on the stack from INPUT opcode
             local_idx = self.resolve_local(assign_node.left.token)
             if local_idx != -1:
-                self.emit_bytes(OpCode.STORE_LOCAL.value, local_idx, node.token.line)
+                self.emit_arg(OpCode.STORE_LOCAL, local_idx, node.token.line)
             else:
-                self.emit_bytes(OpCode.STORE_GLOBAL.value, self.chunk.add_constant(assign_node.left.value.lower()), node.token.line)
+                self.emit_arg(OpCode.STORE_GLOBAL, self.global_slot(assign_node.left.value.lower()), node.token.line)
         elif isinstance(assign_node.left, SubscriptAccess):
             # This is complex: INPUT value is on stack. We need container, key, then value.
             # We pop the input, compile container/key, then push input back.
@@ -902,7 +1603,7 @@ class Compiler:
             # push key (might be a tuple)
             if len(assign_node.left.index_exprs) > 1:
                 for expr in assign_node.left.index_exprs: self.visit(expr)
-                self.emit_bytes(OpCode.BUILD_TUPLE.value, len(assign_node.left.index_exprs), node.token.line)
+                self.emit_arg(OpCode.BUILD_TUPLE, len(assign_node.left.index_exprs), node.token.line)
             else:
                 self.visit(assign_node.left.index_exprs[0])
 
@@ -911,88 +1612,159 @@ class Compiler:
             # For now, we assume INPUT assigns to a simple var. Let's simplify this visit method.
             if isinstance(node.var, Var):
                 local_idx = self.resolve_local(node.var.token)
-                if local_idx != -1: self.emit_bytes(OpCode.STORE_LOCAL.value, local_idx, node.token.line)
-                else: self.emit_bytes(OpCode.STORE_GLOBAL.value, self.chunk.add_constant(node.var.value.lower()), node.token.line)
+                if local_idx != -1: self.emit_arg(OpCode.STORE_LOCAL, local_idx, node.token.line)
+                else: self.emit_arg(OpCode.STORE_GLOBAL, self.global_slot(node.var.value.lower()), node.token.line)
             else:
                  # This path is now unsupported to simplify compilation.
                  self.error("INPUT only supports assignment to simple variables.", node.token)
+    def emit_increment(self, stmt):
+        """Compiles an `x = x + n` / `x = x - n` statement (n a numeric literal) to one INC/DEC opcode; returns False for anything else."""
+        if not (isinstance(stmt, Assign) and isinstance(stmt.left, Var) and isinstance(stmt.right, BinOp) and stmt.right.op.type in ('PLUS', 'MINUS')): return False
+        operand, amount = stmt.right.left, stmt.right.right
+        if not (isinstance(operand, Var) and operand.value.lower() == stmt.left.value.lower() and isinstance(amount, Num) and type(amount.value) in (int, float)): return False
+        constant = self.chunk.add_constant(amount.value)
+        if constant > 0xff: return False
+        slot, decrement = self.resolve_local(stmt.left.token), stmt.right.op.type == 'MINUS'
+        if slot != -1: opcode = OpCode.DEC_LOCAL if decrement else OpCode.INC_LOCAL
+        else: opcode, slot = OpCode.DEC_GLOBAL if decrement else OpCode.INC_GLOBAL, self.global_slot(stmt.left.value.lower())
+        self.emit_arg(opcode, slot, stmt.token.line); self.emit_byte(constant, stmt.token.line); return True
+    COMPARE_JUMPS = {'EQ': OpCode.COMPARE_JUMP_EQ, 'NEQ': OpCode.COMPARE_JUMP_NE, 'GT': OpCode.COMPARE_JUMP_GT, 'LT': OpCode.COMPARE_JUMP_LT,
+                     'GTE': OpCode.COMPARE_JUMP_GE, 'LTE': OpCode.COMPARE_JUMP_LE}
+    def emit_condition_jump(self, condition, line):
+        """Compiles `condition` and a jump taken when it is false. Returns (jump, leaves_value): a comparison is fused into a COMPARE_JUMP
+        that consumes its operands, anything else is tested by JUMP_IF_FALSE and stays on the stack on both edges."""
+        if isinstance(condition, BinOp) and condition.op.type in self.COMPARE_JUMPS:
+            self.visit(condition.left); self.visit(condition.right); return self.emit_jump(self.COMPARE_JUMPS[condition.op.type], line), False
+        self.visit(condition); return self.emit_jump(OpCode.JUMP_IF_FALSE, line), True
     def visit_If(self, node):
-        exit_jumps, last_case_jump = [], -1
-        for i, (condition, block) in enumerate(node.cases):
-            if i > 0: self.patch_jump(last_case_jump)
-            self.visit(condition); false_jump = self.emit_jump(OpCode.JUMP_IF_FALSE, condition.token.line)
-            self.emit(OpCode.POP, condition.token.line); self.visit_Program(Program(block)); exit_jumps.append(self.emit_jump(OpCode.JUMP, -1))
-            self.patch_jump(false_jump); self.emit(OpCode.POP, condition.token.line); last_case_jump = false_jump
+        exit_jumps = []
+        for condition, block in node.cases:
+            false_jump, leaves_value = self.emit_condition_jump(condition, condition.token.line)
+            if leaves_value: self.emit(OpCode.POP, condition.token.line)
+            self.visit_Program(Program(block)); exit_jumps.append(self.emit_jump(OpCode.JUMP, -1))
+            self.patch_jump(false_jump)
+            if leaves_value: self.emit(OpCode.POP, condition.token.line)
         if node.else_case: self.visit_Program(Program(node.else_case))
         for jump in exit_jumps: self.patch_jump(jump)
     def visit_While(self, node):
         loop_start = len(self.chunk.code); self.loop_stack.append({'start': loop_start, 'breaks': []})
-        self.visit(node.condition); exit_jump = self.emit_jump(OpCode.JUMP_IF_FALSE, node.token.line)
-        self.emit(OpCode.POP, node.token.line); self.visit_Program(Program(node.block))
-        offset = len(self.chunk.code) - loop_start + 3
-        self.emit(OpCode.LOOP, -1); self.emit_bytes((offset >> 8) & 0xff, offset & 0xff, -1)
-        self.patch_jump(exit_jump); self.emit(OpCode.POP, node.token.line)
+        if self.chunk.tier: self.emit(OpCode.TIER_UP, node.token.line)
+        exit_jump, leaves_value = self.emit_condition_jump(node.condition, node.token.line)
+        if leaves_value: self.emit(OpCode.POP, node.token.line)
+        self.visit_Program(Program(node.block))
+        self.emit_loop(loop_start, -1)
+        self.patch_jump(exit_jump)
+        if leaves_value: self.emit(OpCode.POP, node.token.line)
         loop = self.loop_stack.pop()
         for break_jump in loop['breaks']: self.patch_jump(break_jump)
+    def is_loop_invariant(self, expr, loop): return _is_loop_invariant(expr, loop, lambda token: self.resolve_local(token) == -1)
     def visit_For(self, node):
-        self.begin_scope(); self.visit(node.start); self.add_local(node.var.token); loop_start = len(self.chunk.code)
-        self.loop_stack.append({'start': loop_start, 'breaks': []})
+        self.begin_scope(); self.visit(node.start); self.add_local(node.var.token); counter_slot = self.resolve_local(node.var.token)
+        if counter_slot < 0xff and self.is_loop_invariant(node.end, node) and self.is_loop_invariant(node.step, node):
+            self.visit(node.end); self.locals.append({'name': '', 'depth': self.scope_depth}) # Hidden local: the limit, then (limit, step, direction)
+            self.visit(node.step); exit_jump = self.emit_jump(OpCode.FOR_PREP, node.token.line, (counter_slot,)); body_start = len(self.chunk.code)
+            if self.chunk.tier: self.emit(OpCode.TIER_UP, node.token.line)
+            self.loop_stack.append({'start': body_start, 'breaks': [], 'continues': []}); self.visit_Program(Program(node.block)); loop = self.loop_stack.pop()
+            for continue_jump in loop['continues']: self.patch_jump(continue_jump)
+            self.emit_loop(body_start, node.token.line, OpCode.FOR_STEP, (counter_slot,)); self.patch_jump(exit_jump)
+            for break_jump in loop['breaks']: self.patch_jump(break_jump)
+            self.end_scope(); return
+        # Limit or step may change inside the loop: both are re-evaluated on every pass
+        loop_start = len(self.chunk.code)
+        self.loop_stack.append({'start': loop_start, 'breaks': [], 'continues': []})
+        if self.chunk.tier: self.emit(OpCode.TIER_UP, node.token.line)
         self.visit(node.var); self.visit(node.end); self.visit(node.step)
         self.emit_constant(0, node.token.line); self.emit(OpCode.GREATER, node.token.line); is_positive_jump = self.emit_jump(OpCode.JUMP_IF_FALSE, node.token.line)
         self.emit(OpCode.POP, node.token.line); self.emit(OpCode.LESS_EQUAL, node.token.line); end_cond_jump = self.emit_jump(OpCode.JUMP, node.token.line)
         self.patch_jump(is_positive_jump); self.emit(OpCode.POP, node.token.line); self.emit(OpCode.GREATER_EQUAL, node.token.line); self.patch_jump(end_cond_jump)
         exit_jump = self.emit_jump(OpCode.JUMP_IF_FALSE, node.token.line); self.emit(OpCode.POP, node.token.line); self.visit_Program(Program(node.block))
-        offset = len(self.chunk.code) - loop_start + 3
+        for continue_jump in self.loop_stack[-1]['continues']: self.patch_jump(continue_jump)
         self.visit(node.var); self.visit(node.step); self.emit(OpCode.ADD, node.token.line)
-        self.emit_bytes(OpCode.STORE_LOCAL.value, self.resolve_local(node.var.token), node.token.line); self.emit(OpCode.POP, node.token.line)
-        self.emit(OpCode.LOOP, node.token.line); self.emit_bytes((offset >> 8) & 0xff, offset & 0xff, node.token.line)
+        self.emit_arg(OpCode.STORE_LOCAL, self.resolve_local(node.var.token), node.token.line); self.emit(OpCode.POP, node.token.line)
+        self.emit_loop(loop_start, node.token.line)
         self.patch_jump(exit_jump); self.emit(OpCode.POP, node.token.line); loop = self.loop_stack.pop()
         for break_jump in loop['breaks']: self.patch_jump(break_jump)
         self.end_scope()
     def visit_FuncDef(self, node):
-        if node.is_jit: return
+        # A JIT FUNCTION is compiled for the VM as well: CALL_JIT runs this version when it cannot be (or failed to be) JIT-compiled
         sub_compiler = Compiler(parent=self); sub_compiler.function = FunctionObject(node.name.lower(), len(node.params), sub_compiler.chunk, node.is_async)
+        sub_compiler.locals.append({'name': '', 'depth': 0}) # Slot 0 of a call frame holds the callee itself
         sub_compiler.begin_scope()
         for param in node.params: sub_compiler.add_local(param.token)
-        sub_compiler.visit(Program(node.block)); sub_compiler.emit(OpCode.LOAD_CONST, -1); sub_compiler.emit_byte(sub_compiler.chunk.add_constant(None), -1)
-        sub_compiler.emit(OpCode.RETURN, -1); function = sub_compiler.function; const_idx = self.chunk.add_constant(function)
-        self.emit(OpCode.DEFINE_FUNC, node.token.line); self.emit_byte(const_idx, node.token.line)
-        name_idx = self.chunk.add_constant(node.name.lower()); self.emit(OpCode.STORE_GLOBAL, node.token.line); self.emit_byte(name_idx, node.token.line)
-    def visit_Return(self, node): self.visit(node.expr); self.emit(OpCode.RETURN, node.token.line)
+        tier_source = self.tier_sources.get(id(node)) if self.parent is None else None
+        if tier_source: sub_compiler.chunk.tier = TierState(node.name.lower(), tier_source); sub_compiler.emit(OpCode.TIER_UP, node.token.line)
+        sub_compiler.visit(Program(node.block)); sub_compiler.emit_constant(None, -1)
+        sub_compiler.emit(OpCode.RETURN, -1); sub_compiler.relocate_long_jumps(); function = sub_compiler.function
+        self.emit_arg(OpCode.DEFINE_FUNC, self.chunk.add_constant(function), node.token.line)
+        self.emit_arg(OpCode.STORE_GLOBAL, self.global_slot(node.name.lower()), node.token.line)
+    CALL_BUILTIN_N = (OpCode.CALL_BUILTIN_0, OpCode.CALL_BUILTIN_1, OpCode.CALL_BUILTIN_2, OpCode.CALL_BUILTIN_3)
+    def visit_Throw(self, node): self.visit(node.expr); self.emit(OpCode.THROW, node.token.line)
+    def visit_Return(self, node):
+        call = node.expr
+        # A call in tail position of a function reuses the frame, unless a TRY handler inside this frame must stay reachable
+        if (self.parent is not None and not self.try_depth and isinstance(call, FuncCall) and len(call.args) <= 0xff and self.resolve_local(call.name_token) == -1
+                and call.name_token.value.lower() not in BUILTIN_FUNCTIONS and call.name_token.value.lower() not in self.jit_names):
+            for arg in call.args: self.visit(arg)
+            self.emit_arg(OpCode.TAIL_CALL, self.global_slot(call.name_token.value.lower()), node.token.line); self.emit_byte(len(call.args), node.token.line)
+            return
+        self.visit(node.expr); self.emit(OpCode.RETURN, node.token.line)
     def visit_FuncCall(self, node):
         func_name = node.name_token.value.lower()
-        if func_name in BUILTIN_FUNCTIONS or func_name in JIT_FUNCTIONS:
+        if func_name in BUILTIN_FUNCTIONS:
              for arg in node.args: self.visit(arg)
-             self.emit_bytes(OpCode.CALL.value, self.chunk.add_constant(func_name), node.token.line); self.emit_byte(len(node.args), node.token.line)
+             name = self.chunk.add_constant(func_name)
+             if len(node.args) < len(self.CALL_BUILTIN_N): self.emit_arg(self.CALL_BUILTIN_N[len(node.args)], name, node.token.line)
+             else: self.emit_arg(OpCode.CALL_BUILTIN, name, node.token.line); self.emit_byte(len(node.args), node.token.line)
              return
+        if self.resolve_local(node.name_token) == -1 and len(node.args) <= 0xff:
+            for arg in node.args: self.visit(arg)
+            opcode = OpCode.CALL_JIT if func_name in self.jit_names else OpCode.CALL_GLOBAL
+            self.emit_arg(opcode, self.global_slot(func_name), node.token.line); self.emit_byte(len(node.args), node.token.line)
+            return
         self.visit(Var(node.name_token));
         for arg in node.args: self.visit(arg)
-        self.emit(OpCode.CALL, node.token.line); self.emit_bytes(0xFF, len(node.args), node.token.line)
+        self.emit_arg(OpCode.CALL, len(node.args), node.token.line)
     def visit_Dim(self, node):
         for size_expr in node.size_exprs: self.visit(size_expr)
-        self.emit(OpCode.BUILD_ARRAY, node.token.line); self.emit_byte(len(node.size_exprs), node.token.line)
-        self.emit_bytes(OpCode.STORE_GLOBAL.value, self.chunk.add_constant(node.var_token.value.lower()), node.token.line)
+        self.emit_arg(OpCode.BUILD_ARRAY, len(node.size_exprs), node.token.line)
+        self.emit_arg(OpCode.STORE_GLOBAL, self.global_slot(node.var_token.value.lower()), node.token.line)
     def visit_Data(self, node): pass
     def visit_Read(self, node):
         for var_node in node.variables:
-            self.emit(OpCode.READ_DATA, var_node.token.line)
-            assign_node = Assign(var_node, Token('ASSIGN', '=', var_node.token.line), None)
-            self.visit_Assign(assign_node) # This is a bit of a hack
+            line = var_node.token.line
+            if isinstance(var_node, SubscriptAccess):
+                self.visit(var_node.primary)
+                if len(var_node.index_exprs) > 1:
+                    for expr in var_node.index_exprs: self.visit(expr)
+                    self.emit_arg(OpCode.BUILD_TUPLE, len(var_node.index_exprs), line)
+                else: self.visit(var_node.index_exprs[0])
+                self.emit(OpCode.READ_DATA, line); self.emit(OpCode.STORE_SUBSCRIPT, line)
+            else:
+                self.emit(OpCode.READ_DATA, line); local_idx = self.resolve_local(var_node.token)
+                if local_idx != -1: self.emit_arg(OpCode.STORE_LOCAL, local_idx, line)
+                else: self.emit_arg(OpCode.STORE_GLOBAL, self.global_slot(var_node.value.lower()), line)
+            self.emit(OpCode.POP, line)
     def visit_Restore(self, node): self.emit(OpCode.RESTORE_DATA, node.token.line)
     def visit_Await(self, node): self.visit(node.expr); self.emit(OpCode.AWAIT, node.token.line)
     def visit_RunAsync(self, node):
         for task in node.tasks: self.visit(task); self.emit(OpCode.CREATE_TASK, task.token.line)
-    def visit_Import(self, node): self.emit_bytes(OpCode.IMPORT_MODULE.value, self.chunk.add_constant(node.filename_token.value), node.token.line)
+    def visit_Import(self, node): self.emit_arg(OpCode.IMPORT_MODULE, self.chunk.add_constant(node.filename_token.value), node.token.line)
+    def pop_loop_locals(self, loop, line):
+        # Leaving a FOR EACH pass early drops the loop variable and the body's locals, as the end of the pass would
+        for _ in range(len(self.locals) - loop.get('locals', len(self.locals))): self.emit(OpCode.POP, line)
     def visit_Break(self, node):
         if not self.loop_stack: self.error(t('p_err_break_outside_loop'), node.token)
+        self.pop_loop_locals(self.loop_stack[-1], node.token.line)
         jump = self.emit_jump(OpCode.JUMP, node.token.line); self.loop_stack[-1]['breaks'].append(jump)
     def visit_Continue(self, node):
         if not self.loop_stack: self.error(t('p_err_continue_outside_loop'), node.token)
-        loop_start = self.loop_stack[-1]['start']; offset = len(self.chunk.code) - loop_start + 3
-        self.emit(OpCode.LOOP, node.token.line); self.emit_bytes((offset >> 8) & 0xff, offset & 0xff, node.token.line)
+        self.pop_loop_locals(self.loop_stack[-1], node.token.line)
+        # FOR loops continue at their increment, WHILE loops at the condition
+        if 'continues' in self.loop_stack[-1]: self.loop_stack[-1]['continues'].append(self.emit_jump(OpCode.JUMP, node.token.line))
+        else: self.emit_loop(self.loop_stack[-1]['start'], node.token.line)
     def visit_DictLiteral(self, node):
         for key_node, value_node in reversed(node.pairs): self.visit(key_node); self.visit(value_node)
-        self.emit_bytes(OpCode.BUILD_DICT.value, len(node.pairs), node.token.line)
+        self.emit_arg(OpCode.BUILD_DICT, len(node.pairs), node.token.line)
     
     def visit_SubscriptAccess(self, node):
         self.visit(node.primary) # 1. Container
@@ -1000,115 +1772,122 @@ class Compiler:
         if len(node.index_exprs) > 1:
             for expr in node.index_exprs:
                 self.visit(expr)
-            self.emit_bytes(OpCode.BUILD_TUPLE.value, len(node.index_exprs), node.token.line)
+            self.emit_arg(OpCode.BUILD_TUPLE, len(node.index_exprs), node.token.line)
         else:
             self.visit(node.index_exprs[0])
         self.emit(OpCode.LOAD_SUBSCRIPT, node.token.line)
 
     def visit_Try(self, node):
-        try_jump = self.emit_jump(OpCode.SETUP_TRY, node.token.line); self.begin_scope()
-        self.visit_Program(Program(node.try_block)); self.end_scope(); self.emit(OpCode.POP_TRY, node.token.line)
-        finally_jump = self.emit_jump(OpCode.JUMP, node.token.line); self.patch_jump(try_jump)
+        # Nothing runs on entry or exit: the try block becomes a row of the exception table, which the VM only reads when an error is
+        # raised. The handler resumes with the stack cut back to this statement's locals, then gets the message (or None if unused).
+        start, depth = len(self.chunk.code), len(self.locals)
+        self.begin_scope(); self.try_depth += 1; self.visit_Program(Program(node.try_block)); self.try_depth -= 1; self.end_scope()
+        keeps_error = bool(node.catch_block) and any(isinstance(n, Var) and n.value.lower() == node.catch_var.value.lower() for n in _walk(node.catch_block))
+        handler = ExceptionHandler(start, len(self.chunk.code), 0, depth, keeps_error)
+        finally_jump = self.emit_jump(OpCode.JUMP, node.token.line); handler.target = len(self.chunk.code); self.chunk.exception_table.append(handler)
         if node.catch_block:
             self.begin_scope(); self.add_local(node.catch_var.token)
-            self.emit_bytes(OpCode.STORE_LOCAL.value, self.resolve_local(node.catch_var.token), node.catch_var.token.line)
+            self.emit_arg(OpCode.STORE_LOCAL, self.resolve_local(node.catch_var.token), node.catch_var.token.line)
             self.visit_Program(Program(node.catch_block)); self.end_scope()
+        else: self.emit(OpCode.POP, node.token.line) # Discard the error message pushed by the VM
         self.patch_jump(finally_jump)
         if node.finally_block: self.visit_Program(Program(node.finally_block))
     def visit_Switch(self, node):
-        self.visit(node.expr); exit_jumps = []; next_case_jumps = []
-        for values, block in node.cases:
-            for jump in next_case_jumps: self.patch_jump(jump)
-            next_case_jumps.clear()
-            for value in values:
-                self.emit(OpCode.DUP, value.token.line); self.visit(value); self.emit(OpCode.EQUAL, value.token.line)
-                next_case_jumps.append(self.emit_jump(OpCode.JUMP_IF_FALSE, value.token.line))
-                self.emit(OpCode.POP, value.token.line)
-            for jump in next_case_jumps: self.patch_jump(jump); self.emit(OpCode.POP, -1)
-            next_case_jumps.clear(); self.emit(OpCode.POP, -1); self.visit_Program(Program(block))
-            exit_jumps.append(self.emit_jump(OpCode.JUMP, -1)); break
-        for jump in next_case_jumps: self.patch_jump(jump)
-        self.emit(OpCode.POP, -1)
-        if node.default_case: self.visit_Program(Program(node.default_case))
+        line = node.token.line; self.visit(node.expr); exit_jumps = []
+        labels = [[_switch_label(value) for value in values] for values, _ in node.cases]
+        if node.cases and all(label is not _UNDEFINED for case_labels in labels for label in case_labels):
+            # Literal labels: one hashed lookup. Offsets are relative to the end of SWITCH_TABLE; the first case listing a value wins.
+            table = {}; self.emit_arg(OpCode.SWITCH_TABLE, self.chunk.add_constant(table), line); table_end = len(self.chunk.code)
+            if node.default_case: self.visit_Program(Program(node.default_case))
+            exit_jumps.append(self.emit_jump(OpCode.JUMP, -1))
+            for (_, block), case_labels in zip(node.cases, labels):
+                for label in case_labels: table.setdefault(label, len(self.chunk.code) - table_end)
+                self.visit_Program(Program(block)); exit_jumps.append(self.emit_jump(OpCode.JUMP, -1))
+        else:
+            # Linear chain: DUP the subject and test each label in order; COMPARE_JUMP_NE branches to the case body on equality
+            case_jumps = []
+            for values, _ in node.cases:
+                jumps = []
+                for value in values:
+                    self.emit(OpCode.DUP, value.token.line); self.visit(value); jumps.append(self.emit_jump(OpCode.COMPARE_JUMP_NE, value.token.line))
+                case_jumps.append(jumps)
+            self.emit(OpCode.POP, line)
+            if node.default_case: self.visit_Program(Program(node.default_case))
+            exit_jumps.append(self.emit_jump(OpCode.JUMP, -1))
+            for (_, block), jumps in zip(node.cases, case_jumps):
+                for jump in jumps: self.patch_jump(jump)
+                self.emit(OpCode.POP, line); self.visit_Program(Program(block)); exit_jumps.append(self.emit_jump(OpCode.JUMP, -1))
         for jump in exit_jumps: self.patch_jump(jump)
     def visit_ArrayLiteral(self, node):
         for element in node.elements:
             self.visit(element)
-        self.emit_bytes(OpCode.BUILD_ARRAY_LITERAL.value, len(node.elements), node.token.line)
+        self.emit_arg(OpCode.BUILD_ARRAY_LITERAL, len(node.elements), node.token.line)
     def visit_ForEach(self, node):
-        self.begin_scope()
-        self.visit(node.collection)
-        coll_var_name = f"__foreach_coll_{self.foreach_iterator_count}"
-        coll_token = Token('ID', coll_var_name, node.token.line)
-        self.add_local(coll_token)
-        coll_local_idx = self.resolve_local(coll_token)
-        self.emit_constant(0, node.token.line)
-        idx_var_name = f"__foreach_idx_{self.foreach_iterator_count}"
-        idx_token = Token('ID', idx_var_name, node.token.line)
-        self.add_local(idx_token)
-        idx_local_idx = self.resolve_local(idx_token)
-        self.foreach_iterator_count += 1
-        loop_start = len(self.chunk.code)
-        self.loop_stack.append({'start': loop_start, 'breaks': []})
-        self.emit_bytes(OpCode.LOAD_LOCAL.value, idx_local_idx, node.token.line)
-        self.emit_bytes(OpCode.LOAD_LOCAL.value, coll_local_idx, node.token.line)
-        self.emit(OpCode.GET_LENGTH, node.token.line)
-        self.emit(OpCode.LESS, node.token.line)
-        exit_jump = self.emit_jump(OpCode.JUMP_IF_FALSE, node.token.line)
-        self.emit(OpCode.POP, node.token.line)
-        self.begin_scope()
-        self.add_local(node.var_token)
-        item_local_idx = self.resolve_local(node.var_token)
-        self.emit_bytes(OpCode.LOAD_LOCAL.value, coll_local_idx, node.token.line)
-        self.emit_bytes(OpCode.LOAD_LOCAL.value, idx_local_idx, node.token.line)
-        self.emit(OpCode.LOAD_SUBSCRIPT, node.token.line)
-        self.emit_bytes(OpCode.STORE_LOCAL.value, item_local_idx, node.token.line)
-        self.emit(OpCode.POP, node.token.line)
-        self.visit_Program(Program(node.block))
-        self.end_scope()
-        self.emit_bytes(OpCode.LOAD_LOCAL.value, idx_local_idx, node.token.line)
-        self.emit_constant(1, node.token.line)
-        self.emit(OpCode.ADD, node.token.line)
-        self.emit_bytes(OpCode.STORE_LOCAL.value, idx_local_idx, node.token.line)
-        self.emit(OpCode.POP, node.token.line)
-        offset = len(self.chunk.code) - loop_start + 3
-        self.emit(OpCode.LOOP, node.token.line)
-        self.emit_bytes((offset >> 8) & 0xff, offset & 0xff, node.token.line)
-        self.patch_jump(exit_jump)
-        self.emit(OpCode.POP, node.token.line)
-        loop = self.loop_stack.pop()
+        line = node.token.line; self.begin_scope(); self.visit(node.collection); self.emit(OpCode.GET_ITER, line)
+        self.locals.append({'name': '', 'depth': self.scope_depth}) # Hidden local: the iterator
+        self.emit_constant(None, line); self.add_local(node.var_token)
+        # FOR_ITER sits at the bottom of the loop: it stores the next item in the loop variable and jumps back, so a pass costs one dispatch.
+        # The body is a scope of its own that ends every pass.
+        enter_jump = self.emit_jump(OpCode.JUMP, line); body_start = len(self.chunk.code)
+        self.loop_stack.append({'start': body_start, 'breaks': [], 'continues': [], 'locals': len(self.locals)})
+        self.begin_scope(); self.visit_Program(Program(node.block)); self.end_scope()
+        self.patch_jump(enter_jump); loop = self.loop_stack.pop()
+        for continue_jump in loop['continues']: self.patch_jump(continue_jump)
+        self.emit_loop(body_start, line, OpCode.FOR_ITER)
         for break_jump in loop['breaks']: self.patch_jump(break_jump)
         self.end_scope()
     def visit_Debug(self, node):
         self.visit(node.expr)
         expr_str_idx = self.chunk.add_constant(node.expr_str)
-        self.emit_bytes(OpCode.DEBUG_PRINT.value, expr_str_idx, node.token.line)
+        self.emit_arg(OpCode.DEBUG_PRINT, expr_str_idx, node.token.line)
 
-class MomentumToPythonTranspiler:
+class LoopAccesses:
+    """What one pass over a block reads and writes, in the order it happens (see MomentumToPythonTranspiler._scan)."""
     def __init__(self):
-        self.numba_builtins = {'abs', 'round', 'int', 'float'}
+        self.writes = {}        # Scalar name -> the Assign statements (or None for loop headers, DIM, LET) that write it
+        self.reads = Counter()  # Scalar name -> number of reads
+        self.exposed = set()    # Names read before this pass has certainly written them: they see the previous pass's value
+        self.stores, self.loads = {}, {} # Array name -> index keys written / read through subscripts
+        self.allocated = set()  # Arrays created by DIM in the block, private to each pass
+        self.calls = set()
+        self.events = []        # ('read' | 'write', name) in execution order, ('end', For) after each FOR
+class MomentumToPythonTranspiler:
+    # Additive, multiplicative and min/max updates of an accumulator, which Numba turns into per-thread partial results
+    REDUCTION_OPS = {'PLUS': '+', 'MINUS': '+', 'MUL': '*'}
+    def __init__(self, pure_functions=()):
+        self.numba_builtins = {'abs', 'round', 'int', 'float', 'len'}
         self.numba_math_funcs = {'sqrt', 'sin', 'cos', 'tan', 'asin', 'acos', 'atan', 'sinh', 'cosh', 'tanh', 'exp', 'log', 'log10', 'floor', 'ceil'}
+        # Calls a parallel loop may make: they cannot write to anything another iteration reads
+        self.pure_calls = self.numba_builtins | self.numba_math_funcs | {'rows', 'cols', 'min', 'max'} | set(pure_functions)
     def transpile(self, func_node):
         self.indent_level = 1; param_names = {p.value.lower() for p in func_node.params}
         local_vars = self._find_local_vars(func_node.block, param_names)
-        init_code = "".join([f"{self.indent()}{var} = 0.0\n" for var in local_vars])
-        body_code = "".join(self._visit(stmt) for stmt in func_node.block); return init_code + body_code
+        # FOR loops are decided against the whole function: a value a loop leaves behind must not be read after it
+        self.parallel_depth, self.loop_report = 0, []; self.function_events = self._scan(func_node.block).events
+        init_code = "".join([f"{self.indent()}{var} = 0.0\n" for var in sorted(local_vars)])
+        body_code = "".join(self._visit_statement(stmt) for stmt in func_node.block); return init_code + body_code
     def _find_local_vars(self, block, param_names):
-        locals_found = set()
+        # Scalars start out as 0.0 so a variable assigned on one branch only is still defined; arrays (DIM, array literals) and
+        # FOR EACH items get their type from their first assignment instead, since Numba cannot unify them with a float
+        locals_found, arrays = set(), set()
         def traverse(statements):
             for stmt in statements:
                 if isinstance(stmt, Assign) and isinstance(stmt.left, Var):
-                    var_name = stmt.left.value.lower()
-                    if var_name not in param_names: locals_found.add(var_name)
-                elif isinstance(stmt, For):
-                    var_name = stmt.var.value.lower()
-                    if var_name not in param_names: locals_found.add(var_name); traverse(stmt.block)
+                    (arrays if isinstance(stmt.right, ArrayLiteral) else locals_found).add(stmt.left.value.lower())
+                elif isinstance(stmt, Declare): locals_found.add(stmt.var_node.value.lower())
+                elif isinstance(stmt, Dim): arrays.add(stmt.var_token.value.lower())
+                elif isinstance(stmt, For): locals_found.add(stmt.var.value.lower()); traverse(stmt.block)
+                elif isinstance(stmt, ForEach): arrays.add(stmt.var_token.value.lower()); traverse(stmt.block)
+                elif isinstance(stmt, While): traverse(stmt.block)
                 elif isinstance(stmt, If):
                     for _, case_block in stmt.cases: traverse(case_block)
                     if stmt.else_case: traverse(stmt.else_case)
-        traverse(block); return locals_found
+        traverse(block); return locals_found - arrays - param_names
     def indent(self): return "    " * self.indent_level
     def _visit(self, node): return getattr(self, f'_visit_{type(node).__name__}', self.generic_visit)(node)
+    def _visit_statement(self, stmt): return f"{self.indent()}{self._visit(stmt)}\n" if isinstance(stmt, FuncCall) else self._visit(stmt)
+    def _visit_block(self, block):
+        self.indent_level += 1; code = "".join(self._visit_statement(stmt) for stmt in block) or f"{self.indent()}pass\n"; self.indent_level -= 1; return code
     def generic_visit(self, node): raise InterpreterError(f"Command '{type(node).__name__}' is not supported in JIT", node)
     def _visit_BinOp(self, node):
         op_map = {'PLUS':'+', 'MINUS':'-', 'MUL':'*', 'DIV':'/', 'EQ':'==', 'NEQ':'!=', 'LT':'<', 'LTE':'<=', 'GT':'>', 'GTE':'>=', 'AND':'and', 'OR':'or'}
@@ -1119,39 +1898,963 @@ class MomentumToPythonTranspiler:
         return self._visit(node.expr)
     def _visit_Num(self, node): return str(node.value)
     def _visit_Var(self, node): return node.value.lower()
+    def _index(self, node): return str(node.value) if isinstance(node, Num) and type(node.value) is int else f"int({self._visit(node)})"
+    def _visit_SubscriptAccess(self, node): return f"{self._visit(node.primary)}[{', '.join(self._index(expr) for expr in node.index_exprs)}]"
+    def _visit_ArrayLiteral(self, node):
+        if not node.elements: raise InterpreterError("An empty array literal is not supported in JIT", node)
+        return f"np.array([{', '.join(f'float({self._visit(element)})' for element in node.elements)}])"
     def _visit_Assign(self, node): return f"{self.indent()}{self._visit(node.left)} = {self._visit(node.right)}\n"
+    def _visit_Declare(self, node): return "" # Already initialized by transpile()
+    def _visit_Dim(self, node):
+        sizes = [f"int({self._visit(expr)})" for expr in node.size_exprs]
+        shape = sizes[0] if len(sizes) == 1 else f"({', '.join(sizes)})"
+        return f"{self.indent()}{node.var_token.value.lower()} = np.zeros({shape})\n"
     def _visit_If(self, node):
-        code = ""; cond, block = node.cases[0]; code += f"{self.indent()}if {self._visit(cond)}:\n"
-        self.indent_level += 1; code += "".join(self._visit(stmt) for stmt in block); self.indent_level -= 1
-        for cond, block in node.cases[1:]:
-            code += f"{self.indent()}elif {self._visit(cond)}:\n"; self.indent_level += 1; code += "".join(self._visit(stmt) for stmt in block); self.indent_level -= 1
-        if node.else_case:
-            code += f"{self.indent()}else:\n"; self.indent_level += 1; code += "".join(self._visit(stmt) for stmt in node.else_case); self.indent_level -= 1
+        code = ""; cond, block = node.cases[0]; code += f"{self.indent()}if {self._visit(cond)}:\n{self._visit_block(block)}"
+        for cond, block in node.cases[1:]: code += f"{self.indent()}elif {self._visit(cond)}:\n{self._visit_block(block)}"
+        if node.else_case: code += f"{self.indent()}else:\n{self._visit_block(node.else_case)}"
         return code
+    def _visit_While(self, node): return f"{self.indent()}while {self._visit(node.condition)}:\n{self._visit_block(node.block)}"
     def _visit_For(self, node):
         var, start, end, step = self._visit(node.var), self._visit(node.start), self._visit(node.end), self._visit(node.step)
-        end_adj = f"int({end}) + (1 if {step} > 0 else -1)"; code = f"{self.indent()}for {var} in numba.prange(int({start}), {end_adj}, int({step})):\n"
-        self.indent_level += 1; code += "".join(self._visit(stmt) for stmt in node.block); self.indent_level -= 1; return code
+        # Only the outermost loop that can run in parallel gets prange; loops inside it run serially within each iteration
+        if self.parallel_depth: reason, reductions = ('jit_reason_nested', {}), ()
+        else: reason, reductions = self._parallel_check(node)
+        self.loop_report.append((node.token.line, var, reason, reductions))
+        if reason: return f"{self.indent()}for {var} in range(int({start}), int({end}) + (1 if {step} > 0 else -1), int({step})):\n{self._visit_block(node.block)}"
+        # Numba only turns a prange with no step (or a literal 1) into a parfor: any other step counts the iterations instead. Momentum
+        # names are lower case, so the upper case names of the helper variables cannot clash with them
+        step = self._constant_step(node.step)
+        if step == 1: code = f"{self.indent()}for {var} in numba.prange(int({start}), int({end}) + 1):\n"
+        else:
+            code = (f"{self.indent()}{var}_START = int({start})\n"
+                    f"{self.indent()}for {var}_K in numba.prange((int({end}) - {var}_START) // {step} + 1):\n{self.indent()}    {var} = {var}_START + {var}_K * {step}\n")
+        self.parallel_depth += 1; code += self._visit_block(node.block); self.parallel_depth -= 1; return code
+    def _constant_step(self, step):
+        # The literal whole number STEP of a FOR, or None
+        sign = 1
+        if isinstance(step, UnaryOp) and step.op.type == 'MINUS': sign, step = -1, step.expr
+        return sign * step.value if isinstance(step, Num) and type(step.value) is int and step.value else None
+    # --- Loop dependency analysis: may the iterations of a FOR run in any order, at the same time? ---
+    def _parallel_check(self, node):
+        """Returns (None, reduction names) when the iterations of `node` are independent apart from reductions, else
+        ((message key, kwargs) naming why, ())."""
+        if self._constant_step(node.step) is None: return ('jit_reason_step', {}), ()
+        if self._leaves_loop(node.block): return ('jit_reason_exits', {}), ()
+        var = node.var.value.lower(); body = self._scan(node.block); reductions = []
+        impure = sorted(body.calls - self.pure_calls)
+        if impure: return ('jit_reason_call', {'name': impure[0]}), ()
+        for name, writes in body.writes.items():
+            if name == var: return ('jit_reason_carried', {'name': name}), ()
+            if name in body.exposed:
+                # Read before it is written: fine only as an accumulator every iteration updates the same way and nothing else reads
+                ops = {self._reduction_op(stmt, name) for stmt in writes}
+                if None in ops or len(ops) > 1 or body.reads[name] != len(writes): return ('jit_reason_carried', {'name': name}), ()
+                reductions.append(name)
+            elif self._read_after(node, name): return ('jit_reason_carried', {'name': name}), ()
+        index = f"int({var})"
+        for name, keys in body.stores.items():
+            if name in body.allocated: continue
+            # Each iteration must write its own elements (the loop variable is one of the indices) and only read those back
+            accessed = set(keys) | set(body.loads.get(name, ()))
+            if len(accessed) > 1 or index not in keys[0] or name in body.reads: return ('jit_reason_array', {'name': name}), ()
+        return None, tuple(sorted(reductions))
+    def _reduction_op(self, stmt, name):
+        if stmt is None: return None
+        value = stmt.right
+        if isinstance(value, BinOp) and value.op.type in self.REDUCTION_OPS:
+            operands = (value.left, value.right) if value.op.type != 'MINUS' else (value.left,)
+            if any(isinstance(operand, Var) and operand.value.lower() == name for operand in operands): return self.REDUCTION_OPS[value.op.type]
+        if isinstance(value, FuncCall) and value.name.lower() in ('min', 'max') and len(value.args) == 2:
+            if any(isinstance(arg, Var) and arg.value.lower() == name for arg in value.args): return value.name.lower()
+        return None
+    def _read_after(self, node, name):
+        # Whether the function reads the value `name` has when the loop ends: the first access after the loop is a read
+        events = self.function_events; position = events.index(('end', node)) + 1
+        for event in events[position:]:
+            if event[1] == name: return event[0] == 'read'
+        return False
+    def _scan(self, block, accesses=None, assigned=None):
+        """Collects the accesses of one pass over `block`. `assigned` holds the names certainly written so far in the pass;
+        writes inside IF branches and loop bodies are not certain to happen, so they only count within that block."""
+        accesses = accesses or LoopAccesses(); assigned = set() if assigned is None else assigned
+        def write(name, stmt):
+            accesses.writes.setdefault(name, []).append(stmt); accesses.events.append(('write', name)); assigned.add(name)
+        for stmt in block:
+            if isinstance(stmt, Assign):
+                self._scan_expr(stmt.right, accesses, assigned)
+                if isinstance(stmt.left, Var): write(stmt.left.value.lower(), stmt)
+                else: self._scan_subscript(stmt.left, accesses, assigned, accesses.stores)
+            elif isinstance(stmt, Declare): write(stmt.var_node.value.lower(), None)
+            elif isinstance(stmt, Dim):
+                for expr in stmt.size_exprs: self._scan_expr(expr, accesses, assigned)
+                name = stmt.var_token.value.lower(); accesses.allocated.add(name); write(name, None)
+            elif isinstance(stmt, If):
+                for cond, case_block in stmt.cases: self._scan_expr(cond, accesses, assigned); self._scan(case_block, accesses, set(assigned))
+                if stmt.else_case: self._scan(stmt.else_case, accesses, set(assigned))
+            elif isinstance(stmt, While):
+                self._scan_expr(stmt.condition, accesses, assigned); self._scan(stmt.block, accesses, set(assigned))
+                self._scan_expr(stmt.condition, accesses, assigned) # Evaluated again after the body
+            elif isinstance(stmt, For):
+                for expr in (stmt.start, stmt.end, stmt.step): self._scan_expr(expr, accesses, assigned)
+                inner = set(assigned); inner.add(stmt.var.value.lower()); accesses.writes.setdefault(stmt.var.value.lower(), []).append(None)
+                accesses.events.append(('write', stmt.var.value.lower())); self._scan(stmt.block, accesses, inner); accesses.events.append(('end', stmt))
+            elif isinstance(stmt, ForEach):
+                self._scan_expr(stmt.collection, accesses, assigned)
+                inner = set(assigned); inner.add(stmt.var_token.value.lower()); accesses.writes.setdefault(stmt.var_token.value.lower(), []).append(None)
+                accesses.events.append(('write', stmt.var_token.value.lower())); self._scan(stmt.block, accesses, inner)
+            elif isinstance(stmt, Return): self._scan_expr(stmt.expr, accesses, assigned)
+            elif isinstance(stmt, (FuncCall, BinOp, UnaryOp, Var, SubscriptAccess)): self._scan_expr(stmt, accesses, assigned)
+        return accesses
+    def _scan_expr(self, node, accesses, assigned):
+        if isinstance(node, Var):
+            name = node.value.lower(); accesses.reads[name] += 1; accesses.events.append(('read', name))
+            if name not in assigned: accesses.exposed.add(name)
+        elif isinstance(node, SubscriptAccess): self._scan_subscript(node, accesses, assigned, accesses.loads)
+        elif isinstance(node, BinOp): self._scan_expr(node.left, accesses, assigned); self._scan_expr(node.right, accesses, assigned)
+        elif isinstance(node, UnaryOp): self._scan_expr(node.expr, accesses, assigned)
+        elif isinstance(node, ArrayLiteral):
+            for element in node.elements: self._scan_expr(element, accesses, assigned)
+        elif isinstance(node, FuncCall):
+            name = node.name.lower()
+            # The shape of an array is not one of its elements: rows/cols/len of an array the loop writes to is fine
+            if name in ('rows', 'cols', 'len') and len(node.args) == 1 and isinstance(node.args[0], Var): return
+            accesses.calls.add(name)
+            for arg in node.args: self._scan_expr(arg, accesses, assigned)
+    def _scan_subscript(self, node, accesses, assigned, table):
+        # a[i][j] and a[i, j] address the same element: the key is the flattened tuple of index expressions
+        indices = []
+        while isinstance(node, SubscriptAccess): indices[:0] = node.index_exprs; node = node.primary
+        for expr in indices: self._scan_expr(expr, accesses, assigned)
+        if not isinstance(node, Var): self._scan_expr(node, accesses, assigned); return
+        table.setdefault(node.value.lower(), []).append(tuple(self._index(expr) for expr in indices))
+    def _leaves_loop(self, block, nested=False):
+        for stmt in block:
+            if isinstance(stmt, Return) or (isinstance(stmt, Break) and not nested): return True
+            if isinstance(stmt, If) and any(self._leaves_loop(case_block, nested) for case_block in [*(b for _, b in stmt.cases), stmt.else_case or []]): return True
+            if isinstance(stmt, (While, For, ForEach)) and self._leaves_loop(stmt.block, True): return True
+        return False
+    def _visit_ForEach(self, node):
+        return f"{self.indent()}for {node.var_token.value.lower()} in {self._visit(node.collection)}:\n{self._visit_block(node.block)}"
+    def _visit_Break(self, node): return f"{self.indent()}break\n"
+    def _visit_Continue(self, node): return f"{self.indent()}continue\n"
     def _visit_FuncCall(self, node):
         func_name = node.name_token.value.lower(); args_code = ', '.join(self._visit(arg) for arg in node.args)
+        if func_name == 'rows': return f"({args_code}).shape[0]"
+        if func_name == 'cols': return f"({args_code}).shape[1]"
+        if func_name in ('min', 'max'): return f"np.{func_name}({args_code})" if len(node.args) == 1 else f"{func_name}({args_code})"
         if func_name in self.numba_builtins: return f"{func_name}({args_code})"
         if func_name in self.numba_math_funcs: return f"math.{func_name}({args_code})"
         return f"{func_name}({args_code})"
     def _visit_Return(self, node): return f"{self.indent()}return {self._visit(node.expr)}\n"
     def _visit_NoOp(self, node): return ""
+class TierTranspiler(MomentumToPythonTranspiler):
+    """Transpiles a plain FUNCTION for tiered execution (see TierState). A JIT FUNCTION opts into Numba's semantics; a tiered one
+    must give exactly the VM's results, so `check` only lets through functions that compute numbers from their arguments, and
+    comparisons, OR and NOT keep their 1/0 and operand results. The builtins that can fail raise, so the VM reruns the call."""
+    CALLS = {'abs': 'abs', 'float': 'float', 'int': '_int', 'round': '_round', 'sqrt': '_sqrt', 'sin': '_sin', 'cos': '_cos'}
+    OPERATORS = {'PLUS', 'MINUS', 'MUL', 'DIV', 'EQ', 'NEQ', 'LT', 'LTE', 'GT', 'GTE', 'AND', 'OR'}
+    # Integer arithmetic wraps around in machine code; these raise instead, so the VM reruns the call with Python integers
+    CHECKED = {'PLUS': '_add', 'MINUS': '_sub', 'MUL': '_mul'}
+    def check(self, func_node):
+        """Raises InterpreterError naming the first thing that keeps `func_node` on the VM."""
+        self.name, self.arity = func_node.name.lower(), len(func_node.params)
+        params = {p.value.lower() for p in func_node.params}
+        if not self._returns(func_node.block): raise InterpreterError("may end without RETURN", func_node)
+        self._check_block(func_node.block, set(params), set(params), set())
+    def _returns(self, block):
+        last = block[-1] if block else None
+        if isinstance(last, If): return last.else_case is not None and all(self._returns(b) for b in [*(b for _, b in last.cases), last.else_case])
+        return isinstance(last, Return)
+    def _check_block(self, block, visible, assigned, loop_vars):
+        # `visible`: the locals in scope; `assigned`: those certainly holding a number here. Returns `assigned` at the end of the block
+        for stmt in block:
+            if isinstance(stmt, Declare):
+                name = stmt.var_node.value.lower()
+                if name in visible: raise InterpreterError(f"LET {name} shadows another local", stmt)
+                visible.add(name); assigned.discard(name)
+            elif isinstance(stmt, Assign):
+                if not isinstance(stmt.left, Var): raise InterpreterError("writes to an element", stmt)
+                self._check_expr(stmt.right, visible, assigned); name = stmt.left.value.lower()
+                if name not in visible: raise InterpreterError(f"assigns the global '{name}'", stmt)
+                if name in loop_vars: raise InterpreterError(f"assigns the FOR variable '{name}'", stmt)
+                assigned.add(name)
+            elif isinstance(stmt, If):
+                branches = []
+                for cond, case_block in stmt.cases:
+                    self._check_expr(cond, visible, assigned); branches.append(self._check_block(case_block, set(visible), set(assigned), loop_vars))
+                if stmt.else_case is None: continue
+                branches.append(self._check_block(stmt.else_case, set(visible), set(assigned), loop_vars))
+                assigned |= set.intersection(*branches) & visible
+            elif isinstance(stmt, While):
+                self._check_expr(stmt.condition, visible, assigned); self._check_block(stmt.block, set(visible), set(assigned), loop_vars)
+            elif isinstance(stmt, For):
+                var, step = stmt.var.value.lower(), stmt.step
+                if isinstance(step, UnaryOp) and step.op.type == 'MINUS' and isinstance(step.expr, Num): step = step.expr
+                if not (isinstance(step, Num) and type(step.value) is int and step.value): raise InterpreterError("FOR without a constant whole STEP", stmt)
+                if var in visible: raise InterpreterError(f"FOR {var} shadows another local", stmt)
+                self._check_expr(stmt.start, visible, assigned); self._check_expr(stmt.end, visible, assigned)
+                written = {node.left.value.lower() for node in _walk(stmt.block) if isinstance(node, Assign) and isinstance(node.left, Var)}
+                if written & {node.value.lower() for node in _walk(stmt.end) if isinstance(node, Var)}: raise InterpreterError(f"FOR {var} limit changes in the loop", stmt)
+                self._check_block(stmt.block, visible | {var}, assigned | {var}, loop_vars | {var})
+            elif isinstance(stmt, Return): self._check_expr(stmt.expr, visible, assigned)
+            elif isinstance(stmt, FuncCall): self._check_expr(stmt, visible, assigned)
+            elif not isinstance(stmt, (Break, Continue, NoOp)): raise InterpreterError(f"'{type(stmt).__name__}'", stmt)
+        return assigned
+    def _check_expr(self, node, visible, assigned):
+        if isinstance(node, Num):
+            if type(node.value) not in (int, float): raise InterpreterError(f"the literal {node.value!r}", node)
+        elif isinstance(node, Var):
+            name = node.value.lower()
+            if name not in visible: raise InterpreterError(f"reads the global '{name}'", node)
+            if name not in assigned: raise InterpreterError(f"may read '{name}' before it is set", node)
+        elif isinstance(node, BinOp):
+            if node.op.type not in self.OPERATORS: raise InterpreterError(f"the operator {node.op.value}", node)
+            self._check_expr(node.left, visible, assigned); self._check_expr(node.right, visible, assigned)
+        elif isinstance(node, UnaryOp): self._check_expr(node.expr, visible, assigned)
+        elif isinstance(node, FuncCall):
+            name = node.name.lower()
+            if not (name in self.CALLS and len(node.args) == 1 or name == self.name and name not in visible and len(node.args) == self.arity):
+                raise InterpreterError(f"calls '{name}'", node)
+            for arg in node.args: self._check_expr(arg, visible, assigned)
+        else: raise InterpreterError(f"'{type(node).__name__}'", node)
+    def transpile(self, func_node):
+        # `check` proved every local is set before it is read, so none needs a starting value. `_DEPTH` counts the recursive calls
+        # below the one the VM made: machine code recursion runs on the C stack, so past TIER_MAX_DEPTH the VM takes the call back
+        self.indent_level = 1; guard = f"    if _DEPTH > {TIER_MAX_DEPTH}: raise RecursionError(\"too deep for machine code\")\n"
+        return guard + "".join(self._visit_statement(stmt) for stmt in func_node.block)
+    def _visit_BinOp(self, node):
+        op = node.op.type
+        if op in ('EQ', 'NEQ', 'LT', 'LTE', 'GT', 'GTE'): return f"(1 if {super()._visit_BinOp(node)} else 0)"
+        if op == 'OR': return f"(1 if {self._visit(node.left)} else {self._visit(node.right)})"
+        if op in self.CHECKED: return f"{self.CHECKED[op]}({self._visit(node.left)}, {self._visit(node.right)})"
+        return super()._visit_BinOp(node)
+    def _visit_UnaryOp(self, node):
+        if node.op.type == 'NOT': return f"(0 if {self._visit(node.expr)} else 1)"
+        return f"_neg({self._visit(node.expr)})" if node.op.type == 'MINUS' else super()._visit_UnaryOp(node)
+    def _visit_For(self, node):
+        var, start, end, step = self._visit(node.var), self._visit(node.start), self._visit(node.end), self._visit(node.step)
+        # The VM counts while counter <= limit (>= going down); a float start makes range() fail to compile, keeping the call on the VM
+        bound = f"math.ceil({end}) - 1" if isinstance(node.step, UnaryOp) else f"math.floor({end}) + 1"
+        return f"{self.indent()}for {var} in range({start}, {bound}, {step}):\n{self._visit_block(node.block)}"
+    def _visit_FuncCall(self, node):
+        func_name = node.name.lower(); args = [self._visit(arg) for arg in node.args]
+        if func_name == self.name: args.append("_DEPTH + 1")
+        return f"{self.CALLS.get(func_name, func_name)}({', '.join(args)})"
+# Prepended to every tiered function: the math builtins raise where Python's would instead of returning nan or a wrapped integer,
+# and so does integer arithmetic whose result does not fit in 64 bits (float arithmetic never trips the checks, apart from some
+# nan results, which only send the call back to the VM)
+TIER_PRELUDE = '''import math
+import numba
+
+@numba.njit
+def _add(a, b):
+    r = a + b
+    if (a >= 0) == (b >= 0) and (r >= 0) != (a >= 0): raise OverflowError("integer overflow")
+    return r
+@numba.njit
+def _sub(a, b):
+    r = a - b
+    if (a >= 0) != (b >= 0) and (r >= 0) != (a >= 0): raise OverflowError("integer overflow")
+    return r
+@numba.njit
+def _mul(a, b):
+    r = a * b
+    if r != a * 1.0 * b: raise OverflowError("integer overflow")
+    return r
+@numba.njit
+def _neg(x):
+    r = -x
+    if x < 0 and r < 0: raise OverflowError("integer overflow")
+    return r
+@numba.njit
+def _sqrt(x):
+    if x < 0: raise ValueError("math domain error")
+    return math.sqrt(x)
+@numba.njit
+def _sin(x):
+    if math.isinf(x): raise ValueError("math domain error")
+    return math.sin(x)
+@numba.njit
+def _cos(x):
+    if math.isinf(x): raise ValueError("math domain error")
+    return math.cos(x)
+@numba.njit
+def _int(x):
+    if not -9.2e18 < x < 9.2e18: raise OverflowError("integer out of range")
+    return int(x)
+@numba.njit
+def _round(x):
+    if not -9.2e18 < x < 9.2e18: raise OverflowError("integer out of range")
+    return round(x)
+
+'''
+
+# --- Whole-program transpilation (--engine=py): a module becomes Python source whose code objects run without the VM ---
+def _own_nodes(node):
+    # Like _walk, but does not enter nested FUNCTION bodies (the FuncDef itself is still yielded)
+    if isinstance(node, FuncDef): yield node; return
+    if isinstance(node, AST): yield node; children = node.__dict__.values()
+    elif isinstance(node, (list, tuple)): children = node
+    else: return
+    for child in children: yield from _own_nodes(child)
+def py_global_name(name):
+    # Loop invariants hoisted by ASTOptimizer are named `$invariantN`, which no Momentum identifier can collide with
+    return f"h_{name[1:]}" if name.startswith('$') else f"m_{name}"
+def py_builtin_name(name): return f"_h_{name[1:]}" if name.startswith('$') else f"_b_{name}" # `$vector_loop` and the like, see BUILTIN_FUNCTIONS
+class ModuleTranspiler:
+    """Translates a whole module into Python source for --engine=py. The top level becomes the `_script` coroutine and every FUNCTION
+    a Python function; globals are `m_<name>` entries of the module dict, while the locals the Compiler would give a slot (parameters,
+    loop counters, LET in a nested scope, CATCH variables) are Python locals. Each generated line records the .mn line it came from.
+
+    Values keep the VM's semantics: `+` goes through _add unless neither operand can be a string, comparisons, OR and NOT give 1/0,
+    FOR follows FOR_PREP/FOR_STEP and errors carry the VM's messages (see py_error_message)."""
+    COMPARISONS = {'EQ': '==', 'NEQ': '!=', 'LT': '<', 'LTE': '<=', 'GT': '>', 'GTE': '>='}
+    ARITHMETIC = {'PLUS': '+', 'MINUS': '-', 'MUL': '*', 'DIV': '/'}
+    # Builtins that never return a string, so a `+` on their result can stay a plain Python addition
+    NUMERIC_BUILTINS = frozenset(('time', 'int', 'float', 'len', 'abs', 'round', 'is_int', 'is_float', 'is_string', 'is_array', 'is_dict',
+                                  'sqrt', 'sin', 'cos', 'random', 'randint', 'sum', 'average', 'median', 'stdev_p', 'var_p', 'rows', 'cols'))
+    SWITCH_CHAIN_LIMIT = 4 # Case blocks tested one after another; more are split by a binary search on the case number
+    def __init__(self, parent=None, function=None):
+        self.parent, self.function, self.root = parent, function, parent.root if parent else self
+        self.lines, self.indent, self.locals, self.scope_depth = [], 0, [], 0 # lines: (indent, text, .mn line)
+        self.assigned_globals, self.loop_stack, self.try_depth, self.temp_count = set(), [], 0, 0
+        self.params, self.tail_loop = [], False
+        self.is_async = function is None or function.is_async or function.name.lower() in self.root.async_functions
+    def transpile(self, program):
+        """Returns (python_source, line_map), where line_map[i] is the .mn line of generated line i + 1."""
+        self.analyze(program); self.constants, self.global_names = [], set()
+        for stmt in program.statements: self.visit(stmt)
+        lines = [(0, text, 1) for text in self.constants] + [(0, "async def _script():", 1)]
+        if self.assigned_globals: lines.append((1, f"global {', '.join(sorted(self.assigned_globals))}", 1))
+        lines += [(indent + 1, text, line) for indent, text, line in self.lines or [(0, "pass", 1)]]
+        return "".join(f"{'    ' * indent}{text}\n" for indent, text, _ in lines), [line for _, _, line in lines]
+    def analyze(self, program):
+        nodes = list(_walk(program.statements)); functions = [n for n in nodes if isinstance(n, FuncDef)]
+        self.function_names = {f.name.lower() for f in functions}
+        self.jit_functions = {id(stmt) for stmt in program.statements if isinstance(stmt, FuncDef) and stmt.is_jit}
+        self.any_string = any(isinstance(n, Import) for n in nodes) # Globals bound by IMPORT can hold anything
+        # A FUNCTION that awaits, imports or calls one that does is a coroutine, called with `await`
+        calls, self.async_functions = {}, set()
+        for function in functions:
+            if function.is_async: continue
+            name, own = function.name.lower(), list(_own_nodes(function.block))
+            calls.setdefault(name, set()).update(n.name.lower() for n in own if isinstance(n, FuncCall))
+            if any(isinstance(n, (Await, Import)) for n in own): self.async_functions.add(name)
+        while callers := {name for name, called in calls.items() if name not in self.async_functions and called & self.async_functions}:
+            self.async_functions |= callers
+        # Names that may hold a string at some point: every binding of the name anywhere in the module counts
+        bindings, self.string_names = {}, set()
+        for n in nodes:
+            if isinstance(n, Assign) and isinstance(n.left, Var): bindings.setdefault(n.left.value.lower(), []).append(n.right)
+            elif isinstance(n, For): bindings.setdefault(n.var.value.lower(), []).extend((n.start, n.step))
+            elif isinstance(n, ForEach): self.string_names.add(n.var_token.value.lower())
+            elif isinstance(n, Try) and n.catch_var: self.string_names.add(n.catch_var.value.lower())
+            elif isinstance(n, (Input, Read)): self.string_names.update(v.value.lower() for v in (n.variables if isinstance(n, Read) else [n.var]) if isinstance(v, Var))
+            elif isinstance(n, FuncDef): self.string_names.update(p.value.lower() for p in n.params)
+        while found := {name for name, values in bindings.items() if name not in self.string_names and any(map(self.may_be_string, values))}:
+            self.string_names |= found
+    def may_be_string(self, node):
+        if isinstance(node, (Num, ArrayLiteral, DictLiteral)): return False
+        if isinstance(node, Var): return self.root.any_string or node.value.lower() in self.root.string_names
+        if isinstance(node, BinOp):
+            op = node.op.type
+            if op in self.COMPARISONS or op in ('MINUS', 'DIV'): return False
+            if op == 'OR': return self.may_be_string(node.right)
+            if op == 'MUL' and any(isinstance(side, Num) and type(side.value) is float for side in (node.left, node.right)): return False
+            return self.may_be_string(node.left) or self.may_be_string(node.right)
+        if isinstance(node, UnaryOp): return node.op.type == 'PLUS' and self.may_be_string(node.expr)
+        if isinstance(node, FuncCall): return node.name.lower() not in self.NUMERIC_BUILTINS
+        return True
+    # --- Scopes, mirroring the Compiler's ---
+    def begin_scope(self): self.scope_depth += 1
+    def end_scope(self):
+        self.scope_depth -= 1
+        while self.locals and self.locals[-1]['depth'] > self.scope_depth: self.locals.pop()
+    def add_local(self, name_token):
+        name = name_token.value.lower()
+        for local in reversed(self.locals):
+            if local['depth'] < self.scope_depth: break
+            if local['name'] == name: raise ParserError(t('p_err_var_already_declared', name=name), name_token)
+        live, py_name, n = {local['py'] for local in self.locals}, f"l_{name}", 0
+        while py_name in live: n += 1; py_name = f"l_{name}_{n}" # A shadowing local gets its own Python variable
+        self.locals.append({'name': name, 'depth': self.scope_depth, 'py': py_name}); return py_name
+    def resolve_local(self, name_token):
+        name = name_token.value.lower()
+        for local in reversed(self.locals):
+            if local['name'] == name: return local['py']
+        return None
+    def load_global(self, name): self.root.global_names.add(name); return py_global_name(name)
+    def store_global(self, name): py_name = self.load_global(name); self.assigned_globals.add(py_name); return py_name
+    def temp(self): self.temp_count += 1; return f"_t{self.temp_count}"
+    # --- Statements ---
+    def emit(self, text, line): self.lines.append((self.indent, text, line))
+    def body(self, statements, line, head=(), tail=()):
+        start = len(self.lines)
+        for text in head: self.emit(text, line)
+        for stmt in statements: self.visit(stmt)
+        for text in tail: self.emit(text, line)
+        if len(self.lines) == start: self.emit("pass", line)
+    def block(self, statements, line, head=(), tail=()): self.indent += 1; self.body(statements, line, head, tail); self.indent -= 1
+    def visit(self, node):
+        method = getattr(self, f"visit_{type(node).__name__}", None)
+        if method: method(node)
+        else: self.emit(self.expr(node), node.token.line)
+    def visit_NoOp(self, node): pass
+    def visit_Data(self, node): pass
+    def visit_Print(self, node): self.emit(f"print({self.expr(node.expr)})", node.token.line)
+    def target(self, node):
+        if isinstance(node, SubscriptAccess): return self.expr_SubscriptAccess(node)
+        return self.resolve_local(node.token) or self.store_global(node.value.lower())
+    def visit_Assign(self, node): value = self.expr(node.right); self.emit(f"{self.target(node.left)} = {value}", node.token.line)
+    def visit_Declare(self, node):
+        var = node.var_node; target = self.add_local(var.token) if self.scope_depth > 0 else self.target(var)
+        self.emit(f"{target} = None", node.token.line)
+    def visit_Input(self, node):
+        if isinstance(node.var, SubscriptAccess): raise ParserError("INPUT only supports assignment to simple variables.", node.token)
+        prompt = self.expr(node.prompt) if node.prompt else "''"; self.emit(f"{self.target(node.var)} = input({prompt})", node.token.line)
+    def visit_Dim(self, node):
+        sizes = ", ".join(self.expr(size) for size in node.size_exprs)
+        self.emit(f"{self.store_global(node.var_token.value.lower())} = _dim({sizes})", node.token.line)
+    def visit_Read(self, node):
+        for var in node.variables: self.emit(f"{self.target(var)} = _rt.read()", var.token.line)
+    def visit_Restore(self, node): self.emit("_rt.restore()", node.token.line)
+    def visit_Import(self, node): self.emit(f"await _rt.import_module({node.filename_token.value!r})", node.token.line)
+    def visit_RunAsync(self, node):
+        for task in node.tasks: self.emit(f"_create_task({self.expr(task)})", task.token.line)
+    def visit_Debug(self, node): self.emit(f"_debug({node.expr_str!r}, {self.expr(node.expr)})", node.token.line)
+    def visit_Throw(self, node): self.emit(f"raise _Error(str({self.expr(node.expr)}))", node.token.line)
+    def visit_If(self, node):
+        for i, (condition, block) in enumerate(node.cases):
+            self.emit(f"{'elif' if i else 'if'} {self.test(condition)}:", condition.token.line); self.block(block, condition.token.line)
+        if node.else_case: self.emit("else:", node.token.line); self.block(node.else_case, node.token.line)
+    def loop(self, statements, line, increment=()):
+        self.loop_stack.append(increment); self.block(statements, line, tail=increment); self.loop_stack.pop()
+    def visit_While(self, node): self.emit(f"while {self.test(node.condition)}:", node.token.line); self.loop(node.block, node.token.line)
+    def is_loop_invariant(self, expr, loop): return _is_loop_invariant(expr, loop, lambda token: self.resolve_local(token) is None)
+    def visit_For(self, node):
+        line = node.token.line; self.begin_scope(); start = self.expr(node.start); var = self.add_local(node.var.token)
+        may_be_string = self.root.any_string or node.var.value.lower() in self.root.string_names or self.may_be_string(node.step)
+        if self.is_loop_invariant(node.end, node) and self.is_loop_invariant(node.step, node):
+            end, step = self.expr(node.end), self.expr(node.step)
+            if node.var.value.lower() not in _written_names(node.block):
+                # Nothing in the body assigns the counter, so it just takes the values FOR_STEP would give it
+                self.emit(f"for {var} in _for_range({start}, {end}, {step}):", line); self.loop(node.block, line)
+            else:
+                limit, step_value, up = self.temp(), self.temp(), self.temp()
+                self.emit(f"{var} = {start}; {limit} = {end}; {step_value} = {step}; {up} = {step_value} > 0", line)
+                self.emit(f"while ({var} <= {limit} if {up} else {var} >= {limit}):", line)
+                self.loop(node.block, line, (f"{var} = {self.add(var, step_value, may_be_string)}",))
+        else:
+            # Limit or step may change inside the loop: both are evaluated again on every pass, and CONTINUE runs the increment
+            self.emit(f"{var} = {start}", line); end, step = self.expr(node.end), self.expr(node.step)
+            self.emit(f"while ({var} <= {end} if {step} > 0 else {var} >= {end}):", line)
+            self.loop(node.block, line, (f"{var} = {self.add(var, step, may_be_string)}",))
+        self.end_scope()
+    def visit_ForEach(self, node):
+        line = node.token.line; self.begin_scope(); collection = self.expr(node.collection); var = self.add_local(node.var_token)
+        self.emit(f"for {var} in _iter({collection}):", line); self.begin_scope(); self.loop(node.block, line); self.end_scope(); self.end_scope()
+    def visit_Break(self, node):
+        if not self.loop_stack: raise ParserError(t('p_err_break_outside_loop'), node.token)
+        self.emit("break", node.token.line)
+    def visit_Continue(self, node):
+        if not self.loop_stack: raise ParserError(t('p_err_continue_outside_loop'), node.token)
+        for text in self.loop_stack[-1]: self.emit(text, node.token.line)
+        self.emit("continue", node.token.line)
+    def visit_Try(self, node):
+        line = node.token.line; self.emit("try:", line)
+        self.begin_scope(); self.try_depth += 1; self.block(node.try_block, line); self.try_depth -= 1; self.end_scope()
+        if node.catch_block:
+            error = self.temp(); self.emit(f"except Exception as {error}:", node.catch_var.token.line)
+            keeps_error = any(isinstance(n, Var) and n.value.lower() == node.catch_var.value.lower() for n in _walk(node.catch_block))
+            self.begin_scope(); var = self.add_local(node.catch_var.token)
+            self.block(node.catch_block, node.catch_var.token.line, head=(f"{var} = {f'_error_message({error})' if keeps_error else 'None'}",)); self.end_scope()
+        else: self.emit("except Exception:", line); self.block([], line)
+        if node.finally_block:
+            for stmt in node.finally_block: self.visit(stmt)
+    def visit_Switch(self, node):
+        line = node.token.line; subject = self.temp(); self.emit(f"{subject} = {self.expr(node.expr)}", line)
+        labels = [[_switch_label(value) for value in values] for values, _ in node.cases]
+        if node.cases and all(label is not _UNDEFINED for case_labels in labels for label in case_labels):
+            # Literal labels: one dict lookup gives the number of the case to run (0 is the default); the first case listing a value wins
+            table, case = {}, self.temp()
+            for number, case_labels in enumerate(labels, 1):
+                for label in case_labels: table.setdefault(label, number)
+            constant = f"_k{len(self.root.constants)}"; self.root.constants.append(f"{constant} = {table!r}")
+            self.emit("try:", line); self.block([], line, head=(f"{case} = {constant}.get({subject}, 0)",))
+            self.emit("except TypeError:", line); self.block([], line, head=(f"{case} = _switch_unhashable({subject})",))
+            self.switch_dispatch(case, [node.default_case] + [block for _, block in node.cases], 0, len(node.cases) + 1, line)
+            return
+        for i, (values, block) in enumerate(node.cases):
+            condition = " or ".join(f"{subject} == {self.expr(value)}" for value in values)
+            self.emit(f"{'elif' if i else 'if'} {condition}:", values[0].token.line); self.block(block, values[0].token.line)
+        if node.default_case:
+            if node.cases: self.emit("else:", line); self.block(node.default_case, line)
+            else: self.body(node.default_case, line)
+    def switch_dispatch(self, case, blocks, low, high, line):
+        if high - low == 1: self.body(blocks[low] or [], line); return
+        if high - low > self.SWITCH_CHAIN_LIMIT:
+            middle = (low + high) // 2
+            self.emit(f"if {case} < {middle}:", line); self.indent += 1; self.switch_dispatch(case, blocks, low, middle, line); self.indent -= 1
+            self.emit("else:", line); self.indent += 1; self.switch_dispatch(case, blocks, middle, high, line); self.indent -= 1
+            return
+        for number in range(low, high):
+            header = f"if {case} == {number}:" if number == low else f"elif {case} == {number}:" if number < high - 1 else "else:"
+            self.emit(header, line); self.block(blocks[number] or [], line)
+    def visit_FuncDef(self, node):
+        line, name = node.token.line, node.name.lower()
+        function = ModuleTranspiler(self, node); function.transpile_function(); py_name = self.store_global(name)
+        self.emit(f"{'async def' if function.is_async else 'def'} {py_name}({', '.join(function.params)}):", line)
+        self.lines.extend((self.indent + 1 + indent, text, source_line) for indent, text, source_line in function.lines)
+        if id(node) in self.root.jit_functions: self.emit(f"{py_name} = _jit({name!r}, {py_name})", line)
+        if node.is_async: self.emit(f"{py_name} = _async_function({name!r})", line)
+    def transpile_function(self):
+        node = self.function; line = node.token.line; self.begin_scope()
+        self.params = [self.add_local(param.token) for param in node.params]
+        # A recursive call in tail position restarts the body in a loop instead of growing the Python stack (like TAIL_CALL)
+        self.tail_loop = id(node) not in self.root.jit_functions and self.has_self_tail_call(node.block)
+        if self.tail_loop: self.indent = 1
+        self.body(node.block, line, tail=("return None",) if self.tail_loop else ())
+        head = [(0, f"global {', '.join(sorted(self.assigned_globals))}", line)] if self.assigned_globals else []
+        self.lines = head + ([(0, "while True:", line)] if self.tail_loop else []) + self.lines
+    def is_self_tail_call(self, call):
+        return (isinstance(call, FuncCall) and call.name.lower() == self.function.name.lower() and len(call.args) == len(self.function.params))
+    def has_self_tail_call(self, statements):
+        for stmt in statements:
+            if isinstance(stmt, Return) and self.is_self_tail_call(stmt.expr): return True
+            if isinstance(stmt, If) and any(self.has_self_tail_call(block or []) for block in [block for _, block in stmt.cases] + [stmt.else_case]): return True
+            if isinstance(stmt, Switch) and any(self.has_self_tail_call(block or []) for block in [block for _, block in stmt.cases] + [stmt.default_case]): return True
+        return False
+    def visit_Return(self, node):
+        call, line = node.expr, node.token.line
+        if self.tail_loop and not self.loop_stack and not self.try_depth and self.is_self_tail_call(call) and self.resolve_local(call.name_token) is None:
+            if self.params: self.emit(f"{', '.join(self.params)} = {', '.join(self.expr(arg) for arg in call.args)}", line)
+            self.emit("continue", line); return
+        self.emit(f"return {self.expr(call)}", line)
+    # --- Expressions: `expr` gives the value the VM would push, `test` anything with the same truth value ---
+    def expr(self, node): return getattr(self, f"expr_{type(node).__name__}")(node)
+    def test(self, node):
+        if isinstance(node, BinOp):
+            op = node.op.type
+            if op in self.COMPARISONS: return f"({self.expr(node.left)} {self.COMPARISONS[op]} {self.expr(node.right)})"
+            if op in ('AND', 'OR'): return f"({self.test(node.left)} {op.lower()} {self.test(node.right)})"
+        if isinstance(node, UnaryOp) and node.op.type == 'NOT': return f"(not {self.test(node.expr)})"
+        return self.expr(node)
+    def add(self, left, right, may_be_string):
+        return f"_add({left}, {right})" if may_be_string else f"({left} + {right})"
+    def expr_Num(self, node):
+        # A folded float may be inf or nan, whose repr is not a Python literal
+        if not math.isfinite(node.value): return f"float('{node.value!r}')"
+        return repr(node.value) if node.value >= 0 else f"({node.value!r})"
+    def expr_String(self, node): return repr(node.value)
+    def expr_FString(self, node):
+        # %s formatting calls str() on each value, as BUILD_STRING does
+        values = [self.expr(part) for part in node.parts if not isinstance(part, String)]
+        if not values: return repr("".join(part.value for part in node.parts))
+        template = "".join(part.value.replace('%', '%%') if isinstance(part, String) else '%s' for part in node.parts)
+        return f"({template!r} % ({', '.join(values)},))"
+    def expr_Var(self, node): return self.resolve_local(node.token) or self.load_global(node.value.lower())
+    def expr_BinOp(self, node):
+        op = node.op.type
+        if op in self.COMPARISONS: return f"(1 if {self.test(node)} else 0)"
+        if op == 'AND': return f"({self.expr(node.left)} and {self.expr(node.right)})"
+        if op == 'OR': return f"(1 if {self.test(node.left)} else {self.expr(node.right)})"
+        left, right = self.expr(node.left), self.expr(node.right)
+        if op == 'PLUS': return self.add(left, right, self.may_be_string(node.left) or self.may_be_string(node.right))
+        return f"({left} {self.ARITHMETIC[op]} {right})"
+    def expr_UnaryOp(self, node):
+        if node.op.type == 'NOT': return f"(0 if {self.test(node.expr)} else 1)"
+        return f"(-{self.expr(node.expr)})" if node.op.type == 'MINUS' else self.expr(node.expr)
+    def expr_SubscriptAccess(self, node):
+        return f"{self.expr(node.primary)}[{', '.join(self.expr(index) for index in node.index_exprs)}]"
+    def expr_ArrayLiteral(self, node): return f"_np.array([{', '.join(self.expr(element) for element in node.elements)}], dtype=object)"
+    def expr_DictLiteral(self, node):
+        # The VM evaluates the pairs last to first: that order only shows when more than one of them calls something
+        if sum(any(isinstance(n, (FuncCall, Await)) for n in _walk(pair)) for pair in node.pairs) > 1:
+            return f"_reversed_dict({', '.join(f'({self.expr(key)}, {self.expr(value)})' for key, value in reversed(node.pairs))})"
+        return f"{{{', '.join(f'{self.expr(key)}: {self.expr(value)}' for key, value in node.pairs)}}}"
+    def expr_Await(self, node): return f"(await _await({self.expr(node.expr)}))"
+    def expr_FuncCall(self, node):
+        name, args = node.name.lower(), ", ".join(self.expr(arg) for arg in node.args)
+        if name in BUILTIN_FUNCTIONS: return f"{py_builtin_name(name)}({args})"
+        local = self.resolve_local(node.name_token)
+        if local: return f"{local}({args})"
+        call = f"{self.load_global(name)}({args})"
+        if name in self.root.async_functions: return f"(await {call})"
+        if self.is_async and name not in self.root.function_names:
+            # A function of another module may be a coroutine: await it when it returns one
+            result = self.temp(); return f"((await {result}) if type({result} := {call}) is _coroutine else {result})"
+        return call
+
+class RegOp(Enum):
+    """Instructions of --engine=reg. Each one is a tuple (opcode, operands...) in a RegisterChunk's code list; a jump target is the
+    absolute index of an instruction and always the last operand. Register operands index the frame's register file: the locals
+    (parameters first) at their Compiler slot, then temporaries, then the chunk's constants, which sit at the end of the file and are
+    addressed from it with negative indexes, so any operand reads a local, a temporary or a constant alike."""
+    MOVE=auto(); LOAD_GLOBAL=auto(); STORE_GLOBAL=auto()
+    # dst, a, b: dst = a <op> b, with the stack VM's semantics (comparisons give 1/0)
+    ADD=auto(); SUBTRACT=auto(); MULTIPLY=auto(); DIVIDE=auto(); EQUAL=auto(); NOT_EQUAL=auto(); GREATER=auto(); LESS=auto()
+    GREATER_EQUAL=auto(); LESS_EQUAL=auto(); NEGATE=auto(); NOT=auto()
+    # slot, amount: `x = x + n` / `x = x - n` on a global x, n a numeric literal
+    INC_GLOBAL=auto(); DEC_GLOBAL=auto()
+    # JUMP_IF / JUMP_UNLESS test a register's truth value; JUMP_IF_<cmp> a b target jumps when `a <cmp> b` holds, JUMP_UNLESS_<cmp> when not
+    JUMP=auto(); JUMP_IF=auto(); JUMP_UNLESS=auto()
+    JUMP_IF_EQ=auto(); JUMP_IF_NE=auto(); JUMP_IF_GT=auto(); JUMP_IF_LT=auto(); JUMP_IF_GE=auto(); JUMP_IF_LE=auto()
+    JUMP_UNLESS_EQ=auto(); JUMP_UNLESS_NE=auto(); JUMP_UNLESS_GT=auto(); JUMP_UNLESS_LT=auto(); JUMP_UNLESS_GE=auto(); JUMP_UNLESS_LE=auto()
+    # FOR_PREP counter limit step exit / FOR_STEP counter body: the stack VM's FOR_PREP/FOR_STEP, (limit, step, direction) in counter + 1
+    FOR_PREP=auto(); FOR_STEP=auto(); GET_ITER=auto(); FOR_ITER=auto(); SWITCH_TABLE=auto()
+    # Calls take a tuple of argument registers; the callee's registers start as a copy of them followed by its chunk's `registers`
+    CALL=auto(); CALL_GLOBAL=auto(); CALL_JIT=auto(); TAIL_CALL=auto(); CALL_BUILTIN=auto(); RETURN=auto()
+    DEFINE_FUNC=auto(); DIM=auto(); BUILD_ARRAY_LITERAL=auto(); BUILD_DICT=auto(); BUILD_STRING=auto(); BUILD_TUPLE=auto()
+    LOAD_SUBSCRIPT=auto(); STORE_SUBSCRIPT=auto(); PRINT=auto(); INPUT=auto(); READ_DATA=auto(); RESTORE_DATA=auto()
+    AWAIT=auto(); CREATE_TASK=auto(); IMPORT_MODULE=auto(); THROW=auto(); DEBUG_PRINT=auto()
+class RegisterChunk(Chunk):
+    """Code of one function for --engine=reg: `code` is a list of RegOp tuples, so ips, lines_rle and the exception table count
+    instructions. An ExceptionHandler's `depth` is the register that receives the error (None when there is no CATCH).
+    `registers` is what follows the arguments in a new frame's register file: None for the other locals and temporaries, then the
+    constants in reverse order."""
+    def __init__(self, name="<script>"): super().__init__(name); self.code, self.registers = [], []
+class RegisterCompiler:
+    """Compiles the AST for --engine=reg. Scopes, global slots, TRY tables, tail calls and the choice of call instructions follow the
+    Compiler; what changes is where values live. An expression leaves its value in a register: a local or constant is used in place,
+    anything computed goes to a temporary above the live locals, or straight into the local it is assigned to. Each instruction names
+    its operands, so nothing is loaded, stored or popped around it, conditions branch on comparisons directly and loops test at the bottom."""
+    BINARY_OPS = {'PLUS': RegOp.ADD, 'MINUS': RegOp.SUBTRACT, 'MUL': RegOp.MULTIPLY, 'DIV': RegOp.DIVIDE, 'EQ': RegOp.EQUAL, 'NEQ': RegOp.NOT_EQUAL,
+                  'GT': RegOp.GREATER, 'LT': RegOp.LESS, 'GTE': RegOp.GREATER_EQUAL, 'LTE': RegOp.LESS_EQUAL}
+    JUMP_IF_OPS = {'EQ': RegOp.JUMP_IF_EQ, 'NEQ': RegOp.JUMP_IF_NE, 'GT': RegOp.JUMP_IF_GT, 'LT': RegOp.JUMP_IF_LT, 'GTE': RegOp.JUMP_IF_GE, 'LTE': RegOp.JUMP_IF_LE}
+    JUMP_UNLESS_OPS = {'EQ': RegOp.JUMP_UNLESS_EQ, 'NEQ': RegOp.JUMP_UNLESS_NE, 'GT': RegOp.JUMP_UNLESS_GT, 'LT': RegOp.JUMP_UNLESS_LT,
+                       'GTE': RegOp.JUMP_UNLESS_GE, 'LTE': RegOp.JUMP_UNLESS_LE}
+    def __init__(self, parent=None):
+        self.chunk, self.scope_depth, self.locals, self.parent = RegisterChunk(), 0, [], parent
+        if parent is not None: self.global_names, self.global_slots, self.jit_names = parent.global_names, parent.global_slots, parent.jit_names
+        else: self.global_names, self.global_slots, self.jit_names = [], {}, set()
+        self.chunk.global_names = self.global_names
+        self.function = FunctionObject("<script>", 0, self.chunk) if parent is None else None
+        self.loop_stack, self.try_depth = [], 0
+        self.temp_top, self.register_count = 0, 0 # Next free temporary, and the size of the frame's register file before the constants
+    def error(self, message, token): raise ParserError(message, token)
+    def compile(self, program):
+        self.jit_names.update(stmt.name.lower() for stmt in program.statements if isinstance(stmt, FuncDef) and stmt.is_jit)
+        self.block(program.statements); self.emit(RegOp.RETURN, -1, self.constant(None)); self.finish(); return self.function
+    def finish(self): self.chunk.registers = [None] * (self.register_count - self.function.arity) + self.chunk.constants[::-1]
+    def emit(self, opcode, line, *operands): self.chunk.write((opcode.value, *operands), line); return len(self.chunk.code) - 1
+    def emit_jump(self, opcode, line, *operands): return self.emit(opcode, line, *operands, None)
+    def patch(self, jump, target=None):
+        code = self.chunk.code; code[jump] = code[jump][:-1] + (len(code) if target is None else target,)
+    def constant(self, value): return -1 - self.chunk.add_constant(value)
+    def global_slot(self, name):
+        slot = self.global_slots.get(name)
+        if slot is None: slot = self.global_slots[name] = len(self.global_names); self.global_names.append(name)
+        return slot
+    # --- Registers: locals take the register of their Compiler slot, temporaries are handed out above them within one statement ---
+    def begin_scope(self): self.scope_depth += 1
+    def end_scope(self):
+        self.scope_depth -= 1
+        while self.locals and self.locals[-1]['depth'] > self.scope_depth: self.locals.pop()
+    def add_local(self, name_token):
+        name = name_token.value.lower()
+        for local in reversed(self.locals):
+            if local['depth'] < self.scope_depth: break
+            if local['name'] == name: self.error(t('p_err_var_already_declared', name=name), name_token)
+        return self.hidden_local(name)
+    def hidden_local(self, name=''):
+        # Temporaries of the statement declaring it move above the new local
+        self.locals.append({'name': name, 'depth': self.scope_depth}); self.temp_top = max(self.temp_top, len(self.locals))
+        self.register_count = max(self.register_count, len(self.locals)); return len(self.locals) - 1
+    def resolve_local(self, name_token):
+        name = name_token.value.lower()
+        for i in range(len(self.locals) - 1, -1, -1):
+            if self.locals[i]['name'] == name: return i
+        return -1
+    def temp(self):
+        register = self.temp_top; self.temp_top += 1; self.register_count = max(self.register_count, self.temp_top); return register
+    def result(self, dst): return self.temp() if dst is None else dst
+    # --- Statements ---
+    def block(self, statements):
+        for stmt in statements: self.visit(stmt)
+    def visit(self, node):
+        self.temp_top = len(self.locals) # No temporary outlives the statement that made it
+        method = getattr(self, f'visit_{type(node).__name__}', None)
+        if method: method(node)
+        else: self.expr(node)
+    def visit_NoOp(self, node): pass
+    def visit_Data(self, node): pass
+    def visit_Print(self, node): self.emit(RegOp.PRINT, node.token.line, self.expr(node.expr))
+    def store(self, target, value, line):
+        # Writes the value of register `value` to the variable `target`
+        local = self.resolve_local(target.token)
+        if local != -1: self.emit(RegOp.MOVE, line, local, value)
+        else: self.emit(RegOp.STORE_GLOBAL, line, self.global_slot(target.value.lower()), value)
+    def visit_Assign(self, node):
+        left, line = node.left, node.token.line
+        if isinstance(left, SubscriptAccess):
+            container = self.expr(left.primary); key = self.index(left.index_exprs, line)
+            self.emit(RegOp.STORE_SUBSCRIPT, line, container, key, self.expr(node.right)); return
+        local = self.resolve_local(left.token)
+        if local != -1: self.expr(node.right, local); return
+        right = node.right; name = left.value.lower()
+        if (isinstance(right, BinOp) and right.op.type in ('PLUS', 'MINUS') and isinstance(right.left, Var) and right.left.value.lower() == name
+                and isinstance(right.right, Num) and type(right.right.value) in (int, float)):
+            self.emit(RegOp.DEC_GLOBAL if right.op.type == 'MINUS' else RegOp.INC_GLOBAL, line, self.global_slot(name), self.constant(right.right.value)); return
+        self.emit(RegOp.STORE_GLOBAL, line, self.global_slot(name), self.expr(right))
+    def visit_Declare(self, node):
+        if self.scope_depth > 0: self.emit(RegOp.MOVE, node.token.line, self.add_local(node.var_node.token), self.constant(None))
+        else: self.emit(RegOp.STORE_GLOBAL, node.token.line, self.global_slot(node.var_node.value.lower()), self.constant(None))
+    def visit_Input(self, node):
+        if not isinstance(node.var, Var): self.error("INPUT only supports assignment to simple variables.", node.token)
+        prompt = self.expr(node.prompt) if node.prompt else self.constant(""); local = self.resolve_local(node.var.token)
+        value = local if local != -1 else self.temp(); self.emit(RegOp.INPUT, node.token.line, value, prompt)
+        if local == -1: self.store(node.var, value, node.token.line)
+    def visit_Dim(self, node):
+        sizes = tuple(self.expr(size) for size in node.size_exprs)
+        self.emit(RegOp.DIM, node.token.line, self.global_slot(node.var_token.value.lower()), sizes)
+    def visit_Read(self, node):
+        for var in node.variables:
+            line = var.token.line; self.temp_top = len(self.locals)
+            if isinstance(var, SubscriptAccess):
+                container = self.expr(var.primary); key = self.index(var.index_exprs, line); value = self.temp()
+                self.emit(RegOp.READ_DATA, line, value); self.emit(RegOp.STORE_SUBSCRIPT, line, container, key, value)
+            else:
+                local = self.resolve_local(var.token); value = local if local != -1 else self.temp(); self.emit(RegOp.READ_DATA, line, value)
+                if local == -1: self.store(var, value, line)
+    def visit_Restore(self, node): self.emit(RegOp.RESTORE_DATA, node.token.line)
+    def visit_Import(self, node): self.emit(RegOp.IMPORT_MODULE, node.token.line, node.filename_token.value)
+    def visit_RunAsync(self, node):
+        for task in node.tasks: self.emit(RegOp.CREATE_TASK, task.token.line, self.expr(task))
+    def visit_Debug(self, node): self.emit(RegOp.DEBUG_PRINT, node.token.line, self.expr(node.expr), node.expr_str)
+    def visit_Throw(self, node): self.emit(RegOp.THROW, node.token.line, self.expr(node.expr))
+    def visit_If(self, node):
+        exit_jumps = []
+        for i, (condition, block) in enumerate(node.cases):
+            false_jumps = self.jump_unless(condition); self.block(block)
+            if node.else_case or i < len(node.cases) - 1: exit_jumps.append(self.emit_jump(RegOp.JUMP, -1))
+            for jump in false_jumps: self.patch(jump)
+        if node.else_case: self.block(node.else_case)
+        for jump in exit_jumps: self.patch(jump)
+    def loop_body(self, statements):
+        self.loop_stack.append({'breaks': [], 'continues': []}); self.block(statements); return self.loop_stack.pop()
+    def visit_While(self, node):
+        # The condition sits at the bottom and jumps back while it holds: one branch per pass
+        enter_jump = self.emit_jump(RegOp.JUMP, node.token.line); body_start = len(self.chunk.code); loop = self.loop_body(node.block)
+        self.patch(enter_jump)
+        for jump in loop['continues']: self.patch(jump)
+        for jump in self.jump_if(node.condition): self.patch(jump, body_start)
+        for jump in loop['breaks']: self.patch(jump)
+    def is_loop_invariant(self, expr, loop): return _is_loop_invariant(expr, loop, lambda token: self.resolve_local(token) == -1)
+    def visit_For(self, node):
+        line = node.token.line; self.begin_scope(); self.expr(node.start, len(self.locals)); counter = self.add_local(node.var.token)
+        if self.is_loop_invariant(node.end, node) and self.is_loop_invariant(node.step, node):
+            self.hidden_local() # counter + 1: (limit, step, direction), set by FOR_PREP
+            exit_jump = self.emit_jump(RegOp.FOR_PREP, line, counter, self.expr(node.end), self.expr(node.step)); body_start = len(self.chunk.code)
+            loop = self.loop_body(node.block)
+            for jump in loop['continues']: self.patch(jump)
+            self.emit(RegOp.FOR_STEP, line, counter, body_start); self.patch(exit_jump)
+        else:
+            # Limit or step may change inside the loop: both are evaluated again on every pass
+            loop_start = len(self.chunk.code); limit = self.expr(node.end); step = self.expr(node.step)
+            down_jump = self.emit_jump(RegOp.JUMP_UNLESS_GT, line, step, self.constant(0))
+            exit_jumps = [self.emit_jump(RegOp.JUMP_UNLESS_LE, line, counter, limit)]; body_jump = self.emit_jump(RegOp.JUMP, line)
+            self.patch(down_jump); exit_jumps.append(self.emit_jump(RegOp.JUMP_UNLESS_GE, line, counter, limit)); self.patch(body_jump)
+            loop = self.loop_body(node.block)
+            for jump in loop['continues']: self.patch(jump)
+            self.temp_top = len(self.locals); self.emit(RegOp.ADD, line, counter, counter, self.expr(node.step)); self.emit(RegOp.JUMP, line, loop_start)
+            for jump in exit_jumps: self.patch(jump)
+        for jump in loop['breaks']: self.patch(jump)
+        self.end_scope()
+    def visit_ForEach(self, node):
+        line = node.token.line; self.begin_scope(); collection = self.expr(node.collection); iterator = self.hidden_local()
+        self.emit(RegOp.GET_ITER, line, iterator, collection); var = self.add_local(node.var_token)
+        enter_jump = self.emit_jump(RegOp.JUMP, line); body_start = len(self.chunk.code)
+        self.begin_scope(); loop = self.loop_body(node.block); self.end_scope(); self.patch(enter_jump)
+        for jump in loop['continues']: self.patch(jump)
+        self.emit(RegOp.FOR_ITER, line, var, iterator, body_start)
+        for jump in loop['breaks']: self.patch(jump)
+        self.end_scope()
+    def visit_Break(self, node):
+        if not self.loop_stack: self.error(t('p_err_break_outside_loop'), node.token)
+        self.loop_stack[-1]['breaks'].append(self.emit_jump(RegOp.JUMP, node.token.line))
+    def visit_Continue(self, node):
+        if not self.loop_stack: self.error(t('p_err_continue_outside_loop'), node.token)
+        self.loop_stack[-1]['continues'].append(self.emit_jump(RegOp.JUMP, node.token.line))
+    def visit_Try(self, node):
+        start = len(self.chunk.code)
+        self.begin_scope(); self.try_depth += 1; self.block(node.try_block); self.try_depth -= 1; self.end_scope()
+        keeps_error = bool(node.catch_block) and any(isinstance(n, Var) and n.value.lower() == node.catch_var.value.lower() for n in _walk(node.catch_block))
+        handler = ExceptionHandler(start, len(self.chunk.code), 0, None, keeps_error)
+        finally_jump = self.emit_jump(RegOp.JUMP, node.token.line); handler.target = len(self.chunk.code); self.chunk.exception_table.append(handler)
+        if node.catch_block:
+            self.begin_scope(); handler.depth = self.add_local(node.catch_var.token); self.block(node.catch_block); self.end_scope()
+        self.patch(finally_jump)
+        if node.finally_block: self.block(node.finally_block)
+    def visit_Switch(self, node):
+        line = node.token.line; subject = self.expr(node.expr); exit_jumps = []
+        labels = [[_switch_label(value) for value in values] for values, _ in node.cases]
+        if node.cases and all(label is not _UNDEFINED for case_labels in labels for label in case_labels):
+            # Literal labels: the table maps each to the index of its case body; the first case listing a value wins
+            table = {}; self.emit(RegOp.SWITCH_TABLE, line, subject, table)
+            if node.default_case: self.block(node.default_case)
+            for (_, block), case_labels in zip(node.cases, labels):
+                exit_jumps.append(self.emit_jump(RegOp.JUMP, -1))
+                for label in case_labels: table.setdefault(label, len(self.chunk.code))
+                self.block(block)
+        else:
+            case_jumps = [[self.emit_jump(RegOp.JUMP_UNLESS_NE, value.token.line, subject, self.expr(value)) for value in values] for values, _ in node.cases]
+            if node.default_case: self.block(node.default_case)
+            for (_, block), jumps in zip(node.cases, case_jumps):
+                exit_jumps.append(self.emit_jump(RegOp.JUMP, -1))
+                for jump in jumps: self.patch(jump)
+                self.block(block)
+        for jump in exit_jumps: self.patch(jump)
+    def visit_FuncDef(self, node):
+        sub_compiler = RegisterCompiler(parent=self); sub_compiler.function = FunctionObject(node.name.lower(), len(node.params), sub_compiler.chunk, node.is_async)
+        sub_compiler.begin_scope()
+        for param in node.params: sub_compiler.add_local(param.token)
+        sub_compiler.block(node.block); sub_compiler.emit(RegOp.RETURN, -1, sub_compiler.constant(None)); sub_compiler.finish()
+        self.emit(RegOp.DEFINE_FUNC, node.token.line, self.global_slot(node.name.lower()), sub_compiler.function)
+    def visit_Return(self, node):
+        call = node.expr
+        if (self.parent is not None and not self.try_depth and isinstance(call, FuncCall) and self.resolve_local(call.name_token) == -1
+                and call.name.lower() not in BUILTIN_FUNCTIONS and call.name.lower() not in self.jit_names):
+            self.emit(RegOp.TAIL_CALL, node.token.line, self.global_slot(call.name.lower()), self.arguments(call.args)); return
+        self.emit(RegOp.RETURN, node.token.line, self.expr(call))
+    # --- Conditions: compiled to branches, giving the jumps still to be patched to the other edge ---
+    def jump_unless(self, node):
+        """Jumps taken when `node` is false; falls through when it is true."""
+        mark = self.temp_top
+        if isinstance(node, BinOp) and node.op.type in self.JUMP_UNLESS_OPS:
+            left = self.expr(node.left); right = self.expr(node.right); self.temp_top = mark
+            return [self.emit_jump(self.JUMP_UNLESS_OPS[node.op.type], node.op.line, left, right)]
+        if isinstance(node, BinOp) and node.op.type == 'AND': return self.jump_unless(node.left) + self.jump_unless(node.right)
+        if isinstance(node, BinOp) and node.op.type == 'OR':
+            true_jumps = self.jump_if(node.left); false_jumps = self.jump_unless(node.right)
+            for jump in true_jumps: self.patch(jump)
+            return false_jumps
+        if isinstance(node, UnaryOp) and node.op.type == 'NOT': return self.jump_if(node.expr)
+        value = self.expr(node); self.temp_top = mark; return [self.emit_jump(RegOp.JUMP_UNLESS, node.token.line, value)]
+    def jump_if(self, node):
+        """Jumps taken when `node` is true; falls through when it is false."""
+        mark = self.temp_top
+        if isinstance(node, BinOp) and node.op.type in self.JUMP_IF_OPS:
+            left = self.expr(node.left); right = self.expr(node.right); self.temp_top = mark
+            return [self.emit_jump(self.JUMP_IF_OPS[node.op.type], node.op.line, left, right)]
+        if isinstance(node, BinOp) and node.op.type == 'AND':
+            false_jumps = self.jump_unless(node.left); true_jumps = self.jump_if(node.right)
+            for jump in false_jumps: self.patch(jump)
+            return true_jumps
+        if isinstance(node, BinOp) and node.op.type == 'OR': return self.jump_if(node.left) + self.jump_if(node.right)
+        if isinstance(node, UnaryOp) and node.op.type == 'NOT': return self.jump_unless(node.expr)
+        value = self.expr(node); self.temp_top = mark; return [self.emit_jump(RegOp.JUMP_IF, node.token.line, value)]
+    # --- Expressions: `expr` returns the register holding the value, which is `dst` when one is given ---
+    def expr(self, node, dst=None):
+        register = getattr(self, f'expr_{type(node).__name__}')(node, dst)
+        if dst is not None and register != dst: self.emit(RegOp.MOVE, node.token.line, dst, register); return dst
+        return register
+    def arguments(self, nodes): return tuple(self.expr(node) for node in nodes)
+    def index(self, index_exprs, line):
+        if len(index_exprs) == 1: return self.expr(index_exprs[0])
+        indexes = self.arguments(index_exprs); key = self.temp(); self.emit(RegOp.BUILD_TUPLE, line, key, indexes); return key
+    def expr_Num(self, node, dst): return self.constant(node.value)
+    def expr_String(self, node, dst): return self.constant(node.value)
+    def expr_Var(self, node, dst):
+        local = self.resolve_local(node.token)
+        if local != -1: return local
+        register = self.result(dst); self.emit(RegOp.LOAD_GLOBAL, node.token.line, register, self.global_slot(node.value.lower())); return register
+    def expr_BinOp(self, node, dst):
+        op = node.op.type
+        if isinstance(node.left, Num) and isinstance(node.right, Num) and op in ('PLUS', 'MINUS', 'MUL', 'DIV') and not (op == 'DIV' and node.right.value == 0):
+            return self.constant({'PLUS': operator.add, 'MINUS': operator.sub, 'MUL': operator.mul, 'DIV': operator.truediv}[op](node.left.value, node.right.value))
+        if op in ('AND', 'OR'):
+            # The result is written twice, so it goes to a fresh temporary that the right operand cannot be reading
+            value = self.temp(); self.expr(node.left, value); false_jump = self.emit_jump(RegOp.JUMP_UNLESS, node.op.line, value)
+            if op == 'OR': self.emit(RegOp.MOVE, node.op.line, value, self.constant(1)); end_jump = self.emit_jump(RegOp.JUMP, node.op.line); self.patch(false_jump)
+            self.expr(node.right, value); self.patch(end_jump if op == 'OR' else false_jump); self.temp_top = value + 1; return value
+        mark = self.temp_top; left = self.expr(node.left); return self.gather(mark, self.BINARY_OPS[op], node.op.line, dst, left, self.expr(node.right))
+    def expr_UnaryOp(self, node, dst):
+        if node.op.type == 'MINUS' and isinstance(node.expr, Num): return self.constant(-node.expr.value)
+        if node.op.type not in ('MINUS', 'NOT'): return self.expr(node.expr, dst)
+        mark = self.temp_top; return self.gather(mark, RegOp.NEGATE if node.op.type == 'MINUS' else RegOp.NOT, node.op.line, dst, self.expr(node.expr))
+    def gather(self, mark, opcode, line, dst, *operands):
+        # Emits an instruction on operands evaluated since `mark`: their temporaries are free again once it has read them
+        self.temp_top = mark; register = self.result(dst); self.emit(opcode, line, register, *operands); return register
+    def expr_FString(self, node, dst): mark = self.temp_top; return self.gather(mark, RegOp.BUILD_STRING, node.token.line, dst, self.arguments(node.parts))
+    def expr_ArrayLiteral(self, node, dst):
+        mark = self.temp_top; return self.gather(mark, RegOp.BUILD_ARRAY_LITERAL, node.token.line, dst, self.arguments(node.elements))
+    def expr_DictLiteral(self, node, dst):
+        # Pairs are evaluated last to first, like the stack VM's BUILD_DICT operands; the dict is built first to last
+        mark = self.temp_top; pairs = [(self.expr(key), self.expr(value)) for key, value in reversed(node.pairs)]
+        return self.gather(mark, RegOp.BUILD_DICT, node.token.line, dst, tuple(reversed(pairs)))
+    def expr_SubscriptAccess(self, node, dst):
+        mark = self.temp_top; container = self.expr(node.primary)
+        return self.gather(mark, RegOp.LOAD_SUBSCRIPT, node.token.line, dst, container, self.index(node.index_exprs, node.token.line))
+    def expr_Await(self, node, dst): mark = self.temp_top; return self.gather(mark, RegOp.AWAIT, node.token.line, dst, self.expr(node.expr))
+    def expr_FuncCall(self, node, dst):
+        name, line, mark = node.name.lower(), node.token.line, self.temp_top
+        if name in BUILTIN_FUNCTIONS: return self.gather(mark, RegOp.CALL_BUILTIN, line, dst, name, self.arguments(node.args))
+        local = self.resolve_local(node.name_token)
+        if local != -1: return self.gather(mark, RegOp.CALL, line, dst, local, self.arguments(node.args))
+        opcode = RegOp.CALL_JIT if name in self.jit_names else RegOp.CALL_GLOBAL
+        return self.gather(mark, opcode, line, dst, self.global_slot(name), self.arguments(node.args))
 
 class CallFrame:
-    __slots__ = ('function', 'ip', 'stack_base');
-    def __init__(self, function, ip, stack_base): self.function, self.ip, self.stack_base = function, ip, stack_base
-class TryBlock:
-    __slots__ = ('handler_ip', 'stack_size')
-    def __init__(self, handler_ip, stack_size): self.handler_ip, self.stack_size = handler_ip, stack_size
+    # Frames are recycled through VM.frame_pool, so every field is (re)set by reset()
+    __slots__ = ('function', 'ip', 'stack_base', 'return_base', 'code', 'constants', 'globals', 'ext');
+    def __init__(self, function, ip, stack_base, globals): self.reset(function, stack_base, stack_base, globals); self.ip = ip
+    def reset(self, function, stack_base, return_base, globals):
+        # Locals live at stack_base + slot (slot 0 is the callee for CALL); RETURN truncates the stack to return_base and pushes the result there
+        self.function, self.ip, self.stack_base, self.return_base, self.globals = function, 0, stack_base, return_base, globals
+        self.ext = 0 # High operand bits left by EXTENDED_ARG for the next _read_byte/_read_short
+        self.code, self.constants = function.chunk.code, function.chunk.constants # Cached for the dispatch loop
+# Marks a global slot that was compiled but never assigned
+_UNDEFINED = object()
+# Python exceptions escaping an opcode handler that are reported (and catchable by TRY) as Momentum runtime errors
+PYTHON_RUNTIME_ERRORS = (IndexError, TypeError, ValueError, ZeroDivisionError, KeyError)
+class Namespace:
+    """The globals of one module instance. Compiled code addresses them by slot; `slots` maps names for IMPORT binding and the REPL.
+    `imports` are the module namespaces bound by IMPORT, latest last."""
+    __slots__ = ('names', 'slots', 'values', 'imports')
+    def __init__(self, names=()): self.names, self.slots, self.values, self.imports = list(names), {}, [], []; self.sync()
+    def sync(self):
+        # Cover names appended to `names` since the last sync (the REPL compiles each line against the live table); a name an
+        # earlier IMPORT provides starts out bound to it
+        for slot in range(len(self.values), len(self.names)):
+            name = self.names[slot]; value = self.lookup(name) if self.imports else _UNDEFINED
+            self.slots[name] = slot; self.values.append(value)
+    def lookup(self, name):
+        """What an importer sees for `name`: this module's own global, else the value from its latest IMPORT that provides one."""
+        pending, seen = [self], set()
+        while pending: # Depth first, latest import first; `seen` stops at import cycles
+            namespace = pending.pop()
+            if id(namespace) in seen: continue
+            seen.add(id(namespace)); slot = namespace.slots.get(name)
+            if slot is not None and namespace.values[slot] is not _UNDEFINED: return namespace.values[slot]
+            pending.extend(namespace.imports)
+        return _UNDEFINED
+    def bind(self, module):
+        # IMPORT: the names this table already has slots for take the module's current values; nothing else is copied,
+        # later names resolve through `imports` in sync()
+        if all(namespace is not module for namespace in self.imports): self.imports.append(module)
+        for slot, name in enumerate(self.names):
+            value = module.lookup(name)
+            if value is not _UNDEFINED: self.values[slot] = value
+    def get(self, name, default=None):
+        slot = self.slots.get(name)
+        return default if slot is None or self.values[slot] is _UNDEFINED else self.values[slot]
+    def items(self): return [(name, value) for name, value in zip(self.names, self.values) if value is not _UNDEFINED]
 class VM:
     def __init__(self, jit_functions, data_pool, compiled_modules, base_path):
-        self.stack, self.globals, self.frames, self.try_stack = [], {}, [], []
+        self.stack, self.namespace, self.frames = [], Namespace(), []
+        self.frame_pool = [] # CallFrames released by RETURN, reused by the next call
         self.jit_functions, self.data_pool, self.data_ptr = jit_functions, data_pool, 0
         self.compiled_modules, self.base_path = compiled_modules, base_path
         self.dispatch_table = self._create_dispatch_table()
+        # Opcodes whose handlers return an awaitable; their slot in dispatch_table is None so the sync loop hands them back to run()
+        self.async_dispatch_table = {OpCode.AWAIT.value: self._op_await, OpCode.IMPORT_MODULE.value: self._op_import_module}
+        for opcode in self.async_dispatch_table: self.dispatch_table[opcode] = None
+        # EXTENDED_ARG runs these directly with the high bits; every other operand reader picks them up from frame.ext
+        self.wide_dispatch_table = {OpCode.LOAD_CONST.value: self._op_load_const_wide, OpCode.LOAD_GLOBAL.value: self._op_load_global_wide,
+            OpCode.STORE_GLOBAL.value: self._op_store_global_wide, OpCode.LOAD_LOCAL.value: self._op_load_local_wide,
+            OpCode.STORE_LOCAL.value: self._op_store_local_wide, OpCode.JUMP_IF_FALSE.value: self._op_jump_if_false_wide,
+            OpCode.JUMP.value: self._op_jump_wide, OpCode.LOOP.value: self._op_loop_wide, OpCode.POP_JUMP_IF_FALSE.value: self._op_pop_jump_if_false_wide}
     def _create_dispatch_table(self):
         table = [None] * (len(OpCode) + 1); handlers = {
             OpCode.LOAD_CONST: self._op_load_const, OpCode.POP: self._op_pop, OpCode.LOAD_GLOBAL: self._op_load_global,
@@ -1167,130 +2870,445 @@ class VM:
             OpCode.READ_DATA: self._op_read_data, OpCode.RESTORE_DATA: self._op_restore_data,
             OpCode.AWAIT: self._op_await, OpCode.CREATE_TASK: self._op_create_task,
             OpCode.IMPORT_MODULE: self._op_import_module, OpCode.BUILD_DICT: self._op_build_dict,
-            OpCode.BUILD_STRING: self._op_build_string, OpCode.SETUP_TRY: self._op_setup_try, OpCode.POP_TRY: self._op_pop_try,
-            OpCode.THROW: self._op_throw, OpCode.DUP: self._op_dup,
+            OpCode.BUILD_STRING: self._op_build_string, OpCode.THROW: self._op_throw, OpCode.DUP: self._op_dup,
             OpCode.BUILD_ARRAY_LITERAL: self._op_build_array_literal, OpCode.DEBUG_PRINT: self._op_debug_print,
             OpCode.GET_LENGTH: self._op_get_length, OpCode.BUILD_TUPLE: self._op_build_tuple,
+            OpCode.ADD_NUM: self._op_add_num, OpCode.ADD_STR: self._op_add_str, OpCode.SUBTRACT_NUM: self._op_subtract_num,
+            OpCode.MULTIPLY_NUM: self._op_multiply_num, OpCode.DIVIDE_NUM: self._op_divide_num, OpCode.EQUAL_NUM: self._op_equal_num,
+            OpCode.NOT_EQUAL_NUM: self._op_not_equal_num, OpCode.GREATER_NUM: self._op_greater_num, OpCode.LESS_NUM: self._op_less_num,
+            OpCode.GREATER_EQUAL_NUM: self._op_greater_equal_num, OpCode.LESS_EQUAL_NUM: self._op_less_equal_num,
+            OpCode.LOAD_SUBSCRIPT_ARRAY: self._op_load_subscript_array, OpCode.LOAD_SUBSCRIPT_DICT: self._op_load_subscript_dict,
+            OpCode.CALL_BUILTIN: self._op_call_builtin, OpCode.EXTENDED_ARG: self._op_extended_arg, OpCode.POP_JUMP_IF_FALSE: self._op_pop_jump_if_false,
+            OpCode.FOR_PREP: self._op_for_prep, OpCode.FOR_STEP: self._op_for_step, OpCode.INC_LOCAL: self._op_inc_local, OpCode.DEC_LOCAL: self._op_dec_local,
+            OpCode.INC_GLOBAL: self._op_inc_global, OpCode.DEC_GLOBAL: self._op_dec_global,
+            OpCode.COMPARE_JUMP_EQ: self._op_compare_jump_eq, OpCode.COMPARE_JUMP_NE: self._op_compare_jump_ne, OpCode.COMPARE_JUMP_GT: self._op_compare_jump_gt,
+            OpCode.COMPARE_JUMP_LT: self._op_compare_jump_lt, OpCode.COMPARE_JUMP_GE: self._op_compare_jump_ge, OpCode.COMPARE_JUMP_LE: self._op_compare_jump_le,
+            OpCode.GET_ITER: self._op_get_iter, OpCode.FOR_ITER: self._op_for_iter, OpCode.SWITCH_TABLE: self._op_switch_table,
+            OpCode.CALL_GLOBAL: self._op_call_global, OpCode.CALL_JIT: self._op_call_jit, OpCode.CALL_BUILTIN_0: self._op_call_builtin_0, OpCode.CALL_BUILTIN_1: self._op_call_builtin_1,
+            OpCode.CALL_BUILTIN_2: self._op_call_builtin_2, OpCode.CALL_BUILTIN_3: self._op_call_builtin_3, OpCode.TAIL_CALL: self._op_tail_call,
+            OpCode.TIER_UP: self._op_tier_up,
         }
         for opcode, handler in handlers.items(): table[opcode.value] = handler
         return table
-    def _read_byte(self, frame): ip = frame.ip; frame.ip += 1; return frame.function.chunk.code[ip]
-    def _read_short(self, frame): ip = frame.ip; frame.ip += 2; chunk = frame.function.chunk; return (chunk.code[ip] << 8) | chunk.code[ip+1]
-    def _read_constant(self, frame): return frame.function.chunk.constants[self._read_byte(frame)]
-    def _op_load_const(self, frame): self.stack.append(self._read_constant(frame))
+    def _read_byte(self, frame):
+        ip = frame.ip; frame.ip = ip + 1; ext = frame.ext
+        if ext: frame.ext = 0
+        return ext | frame.code[ip]
+    def _read_short(self, frame):
+        ip = frame.ip; frame.ip = ip + 2; code = frame.code; ext = frame.ext
+        if ext: frame.ext = 0
+        return (ext << 8) | (code[ip] << 8) | code[ip+1]
+    def _read_constant(self, frame): return frame.constants[self._read_byte(frame)]
+    def _op_extended_arg(self, frame):
+        ip = frame.ip; code = frame.code; ext = (frame.ext | code[ip]) << 8; wide = self.wide_dispatch_table.get(code[ip + 1])
+        if wide is None: frame.ext = ext; frame.ip = ip + 1
+        else: frame.ext = 0; frame.ip = ip + 2; wide(frame, ext)
+    def _op_load_const_wide(self, frame, ext): ip = frame.ip; frame.ip = ip + 1; self.stack.append(frame.constants[ext | frame.code[ip]])
+    def _op_load_global_wide(self, frame, ext):
+        ip = frame.ip; frame.ip = ip + 1; slot = ext | frame.code[ip]; value = frame.globals[slot]
+        if value is not _UNDEFINED: self.stack.append(value)
+        else: self._global_not_found(frame, slot)
+    def _op_store_global_wide(self, frame, ext): ip = frame.ip; frame.ip = ip + 1; frame.globals[ext | frame.code[ip]] = self.stack[-1]
+    def _op_load_local_wide(self, frame, ext): ip = frame.ip; frame.ip = ip + 1; stack = self.stack; stack.append(stack[frame.stack_base + (ext | frame.code[ip])])
+    def _op_store_local_wide(self, frame, ext): ip = frame.ip; frame.ip = ip + 1; stack = self.stack; stack[frame.stack_base + (ext | frame.code[ip])] = stack[-1]
+    def _op_jump_if_false_wide(self, frame, ext):
+        ip = frame.ip; code = frame.code
+        frame.ip = ip + 2 + ((ext << 8) | (code[ip] << 8) | code[ip + 1]) if not self.stack[-1] else ip + 2
+    def _op_pop_jump_if_false_wide(self, frame, ext):
+        ip = frame.ip; code = frame.code
+        frame.ip = ip + 2 + ((ext << 8) | (code[ip] << 8) | code[ip + 1]) if not self.stack.pop() else ip + 2
+    def _op_jump_wide(self, frame, ext): ip = frame.ip; code = frame.code; frame.ip = ip + 2 + ((ext << 8) | (code[ip] << 8) | code[ip + 1])
+    def _op_loop_wide(self, frame, ext): ip = frame.ip; code = frame.code; frame.ip = ip + 2 - ((ext << 8) | (code[ip] << 8) | code[ip + 1])
+    def _op_load_const(self, frame): ip = frame.ip; frame.ip = ip + 1; self.stack.append(frame.constants[frame.code[ip]])
     def _op_pop(self, frame): self.stack.pop()
-    def _op_define_func(self, frame): self.stack.append(self._read_constant(frame))
+    def _op_define_func(self, frame):
+        prototype = self._read_constant(frame); function = FunctionObject(prototype.name, prototype.arity, prototype.chunk, prototype.is_async)
+        function.globals = frame.globals; self.stack.append(function)
     def _op_load_global(self, frame):
-        name = self._read_constant(frame)
-        try: self.stack.append(self.globals[name])
-        except KeyError: self._throw(InterpreterError(t('rt_err_var_not_found', name=name), self._get_current_line(frame)))
-    def _op_store_global(self, frame): self.globals[self._read_constant(frame)] = self.stack[-1]
-    def _op_load_local(self, frame): self.stack.append(self.stack[frame.stack_base + self._read_byte(frame)])
-    def _op_store_local(self, frame): self.stack[frame.stack_base + self._read_byte(frame)] = self.stack[-1]
-    def _execute_binary_op(self, op, line):
+        ip = frame.ip; frame.ip = ip + 1; value = frame.globals[frame.code[ip]]
+        if value is not _UNDEFINED: self.stack.append(value)
+        else: self._global_not_found(frame, frame.code[ip])
+    def _global_not_found(self, frame, slot):
+        name = frame.function.chunk.global_names[slot]
+        self._raise(frame, 'rt_err_var_not_found', name=name)
+    def _op_store_global(self, frame): ip = frame.ip; frame.ip = ip + 1; frame.globals[frame.code[ip]] = self.stack[-1]
+    def _op_load_local(self, frame): ip = frame.ip; frame.ip = ip + 1; stack = self.stack; stack.append(stack[frame.stack_base + frame.code[ip]])
+    def _op_store_local(self, frame): ip = frame.ip; frame.ip = ip + 1; stack = self.stack; stack[frame.stack_base + frame.code[ip]] = stack[-1]
+    def _execute_binary_op(self, op, frame):
         b, a = self.stack.pop(), self.stack.pop()
         try:
             if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
                 np_op_map = {operator.add: operator.add, operator.sub: operator.sub, operator.mul: operator.mul, operator.truediv: operator.truediv}
-                if op not in np_op_map: self._throw(InterpreterError(t('rt_err_unsupported_op_matrix', op_name=op.__name__), line))
+                if op not in np_op_map: self._raise(frame, 'rt_err_unsupported_op_matrix', op_name=op.__name__)
                 self.stack.append(np_op_map[op](a, b))
             elif op is operator.add:
                 if isinstance(a, str) or isinstance(b, str): self.stack.append(str(a) + str(b))
                 elif isinstance(a, dict) or isinstance(b, dict): raise TypeError()
                 else: self.stack.append(op(a, b))
-            else: result = op(a, b); self.stack.append(int(result) if isinstance(result, bool) else result)
-        except TypeError: self._throw(InterpreterError(t('rt_err_type_error_op', op=op.__name__, type_a=builtin_type(a).upper(), type_b=builtin_type(b).upper()), line))
-    def _op_add(self, frame): self._execute_binary_op(operator.add, self._get_current_line(frame))
-    def _op_subtract(self, frame): self._execute_binary_op(operator.sub, self._get_current_line(frame))
-    def _op_multiply(self, frame): self._execute_binary_op(operator.mul, self._get_current_line(frame))
-    def _op_divide(self, frame): self._execute_binary_op(operator.truediv, self._get_current_line(frame))
-    def _op_equal(self, frame): self._execute_binary_op(operator.eq, self._get_current_line(frame))
-    def _op_not_equal(self, frame): self._execute_binary_op(operator.ne, self._get_current_line(frame))
-    def _op_greater(self, frame): self._execute_binary_op(operator.gt, self._get_current_line(frame))
-    def _op_less(self, frame): self._execute_binary_op(operator.lt, self._get_current_line(frame))
-    def _op_greater_equal(self, frame): self._execute_binary_op(operator.ge, self._get_current_line(frame))
-    def _op_less_equal(self, frame): self._execute_binary_op(operator.le, self._get_current_line(frame))
+            else: result = op(a, b); self.stack.append(int(result) if isinstance(result, (bool, np.bool_)) else result)
+        except TypeError: self._raise(frame, 'rt_err_type_error_op', op=op.__name__, type_a=builtin_type(a).upper(), type_b=builtin_type(b).upper())
+    # --- Quickening: generic opcodes rewrite themselves into type-specialized variants after observing their operands ---
+    def _quicken(self, frame, specialized):
+        chunk = frame.function.chunk; ip = frame.ip - 1
+        if chunk.deopt_counts.get(ip, 0) < QUICKEN_MAX_DEOPTS: chunk.code[ip] = specialized.value
+    def _deoptimize(self, frame, generic):
+        chunk = frame.function.chunk; ip = frame.ip - 1
+        chunk.code[ip] = generic.value; chunk.deopt_counts[ip] = chunk.deopt_counts.get(ip, 0) + 1
+    def _binary_generic(self, frame, op, specialized):
+        if type(self.stack[-2]) in NUMBER_TYPES and type(self.stack[-1]) in NUMBER_TYPES: self._quicken(frame, specialized)
+        self._execute_binary_op(op, frame)
+    def _op_add(self, frame):
+        a, b = self.stack[-2], self.stack[-1]
+        if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES: self._quicken(frame, OpCode.ADD_NUM)
+        elif type(a) is str and type(b) is str: self._quicken(frame, OpCode.ADD_STR)
+        self._execute_binary_op(operator.add, frame)
+    def _op_subtract(self, frame): self._binary_generic(frame, operator.sub, OpCode.SUBTRACT_NUM)
+    def _op_multiply(self, frame): self._binary_generic(frame, operator.mul, OpCode.MULTIPLY_NUM)
+    def _op_divide(self, frame): self._binary_generic(frame, operator.truediv, OpCode.DIVIDE_NUM)
+    def _op_equal(self, frame): self._binary_generic(frame, operator.eq, OpCode.EQUAL_NUM)
+    def _op_not_equal(self, frame): self._binary_generic(frame, operator.ne, OpCode.NOT_EQUAL_NUM)
+    def _op_greater(self, frame): self._binary_generic(frame, operator.gt, OpCode.GREATER_NUM)
+    def _op_less(self, frame): self._binary_generic(frame, operator.lt, OpCode.LESS_NUM)
+    def _op_greater_equal(self, frame): self._binary_generic(frame, operator.ge, OpCode.GREATER_EQUAL_NUM)
+    def _op_less_equal(self, frame): self._binary_generic(frame, operator.le, OpCode.LESS_EQUAL_NUM)
+    # Specialized variants: guard on the operand types, otherwise fall back to (and restore) the generic opcode
+    def _op_add_num(self, frame):
+        stack = self.stack; a, b = stack[-2], stack[-1]
+        if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES: del stack[-1]; stack[-1] = a + b
+        else: self._deoptimize(frame, OpCode.ADD); self._op_add(frame)
+    def _op_add_str(self, frame):
+        stack = self.stack; a, b = stack[-2], stack[-1]
+        if type(a) is str and type(b) is str: del stack[-1]; stack[-1] = a + b
+        else: self._deoptimize(frame, OpCode.ADD); self._op_add(frame)
+    def _op_subtract_num(self, frame):
+        stack = self.stack; a, b = stack[-2], stack[-1]
+        if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES: del stack[-1]; stack[-1] = a - b
+        else: self._deoptimize(frame, OpCode.SUBTRACT); self._op_subtract(frame)
+    def _op_multiply_num(self, frame):
+        stack = self.stack; a, b = stack[-2], stack[-1]
+        if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES: del stack[-1]; stack[-1] = a * b
+        else: self._deoptimize(frame, OpCode.MULTIPLY); self._op_multiply(frame)
+    def _op_divide_num(self, frame):
+        stack = self.stack; a, b = stack[-2], stack[-1]
+        if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES and b: del stack[-1]; stack[-1] = a / b
+        else: self._deoptimize(frame, OpCode.DIVIDE); self._op_divide(frame)
+    def _op_equal_num(self, frame):
+        stack = self.stack; a, b = stack[-2], stack[-1]
+        if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES: del stack[-1]; stack[-1] = 1 if a == b else 0
+        else: self._deoptimize(frame, OpCode.EQUAL); self._op_equal(frame)
+    def _op_not_equal_num(self, frame):
+        stack = self.stack; a, b = stack[-2], stack[-1]
+        if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES: del stack[-1]; stack[-1] = 1 if a != b else 0
+        else: self._deoptimize(frame, OpCode.NOT_EQUAL); self._op_not_equal(frame)
+    def _op_greater_num(self, frame):
+        stack = self.stack; a, b = stack[-2], stack[-1]
+        if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES: del stack[-1]; stack[-1] = 1 if a > b else 0
+        else: self._deoptimize(frame, OpCode.GREATER); self._op_greater(frame)
+    def _op_less_num(self, frame):
+        stack = self.stack; a, b = stack[-2], stack[-1]
+        if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES: del stack[-1]; stack[-1] = 1 if a < b else 0
+        else: self._deoptimize(frame, OpCode.LESS); self._op_less(frame)
+    def _op_greater_equal_num(self, frame):
+        stack = self.stack; a, b = stack[-2], stack[-1]
+        if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES: del stack[-1]; stack[-1] = 1 if a >= b else 0
+        else: self._deoptimize(frame, OpCode.GREATER_EQUAL); self._op_greater_equal(frame)
+    def _op_less_equal_num(self, frame):
+        stack = self.stack; a, b = stack[-2], stack[-1]
+        if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES: del stack[-1]; stack[-1] = 1 if a <= b else 0
+        else: self._deoptimize(frame, OpCode.LESS_EQUAL); self._op_less_equal(frame)
+    # --- Superinstructions: inline fast path for plain numbers, anything else goes through _execute_binary_op for the generic semantics.
+    # Their operands are read inline; an EXTENDED_ARG prefix reaches them through frame.ext.
+    def _binary_fallback(self, frame, op, a, b):
+        stack = self.stack; stack.append(a); stack.append(b); self._execute_binary_op(op, frame); return stack.pop()
+    def _op_for_prep(self, frame):
+        ip = frame.ip; code = frame.code; ext = frame.ext
+        if ext: frame.ext = 0
+        frame.ip = end = ip + 3; stack = self.stack; index = frame.stack_base + code[ip + 2]
+        step = stack.pop(); value, limit = stack[index], stack[index + 1]
+        if type(value) in NUMBER_TYPES and type(limit) in NUMBER_TYPES and type(step) in NUMBER_TYPES:
+            up = step > 0; enter = value <= limit if up else value >= limit
+        else:
+            up = self._binary_fallback(frame, operator.gt, step, 0); enter = self._binary_fallback(frame, operator.le if up else operator.ge, value, limit)
+        stack[index + 1] = (limit, step, up)
+        if not enter: frame.ip = end + ((ext << 8) | (code[ip] << 8) | code[ip + 1])
+    def _op_for_step(self, frame):
+        ip = frame.ip; code = frame.code; ext = frame.ext
+        if ext: frame.ext = 0
+        frame.ip = end = ip + 3; stack = self.stack; index = frame.stack_base + code[ip + 2]
+        value = stack[index]; limit, step, up = stack[index + 1]
+        if type(value) in NUMBER_TYPES and type(step) in NUMBER_TYPES and type(limit) in NUMBER_TYPES:
+            stack[index] = value = value + step; more = value <= limit if up else value >= limit
+        else:
+            stack[index] = value = self._binary_fallback(frame, operator.add, value, step); more = self._binary_fallback(frame, operator.le if up else operator.ge, value, limit)
+        if more: frame.ip = end - ((ext << 8) | (code[ip] << 8) | code[ip + 1])
+    def _op_inc_local(self, frame):
+        ip = frame.ip; code = frame.code; frame.ip = ip + 2; ext = frame.ext
+        if ext: frame.ext = 0
+        stack = self.stack; index = frame.stack_base + (ext | code[ip]); value, amount = stack[index], frame.constants[code[ip + 1]]
+        if type(value) in NUMBER_TYPES: stack[index] = value + amount
+        else:
+            stack[index] = self._binary_fallback(frame, operator.add, value, amount)
+    def _op_dec_local(self, frame):
+        ip = frame.ip; code = frame.code; frame.ip = ip + 2; ext = frame.ext
+        if ext: frame.ext = 0
+        stack = self.stack; index = frame.stack_base + (ext | code[ip]); value, amount = stack[index], frame.constants[code[ip + 1]]
+        if type(value) in NUMBER_TYPES: stack[index] = value - amount
+        else:
+            stack[index] = self._binary_fallback(frame, operator.sub, value, amount)
+    def _op_inc_global(self, frame):
+        ip = frame.ip; code = frame.code; frame.ip = ip + 2; ext = frame.ext
+        if ext: frame.ext = 0
+        slot = ext | code[ip]; values = frame.globals; value, amount = values[slot], frame.constants[code[ip + 1]]
+        if type(value) in NUMBER_TYPES: values[slot] = value + amount
+        elif value is _UNDEFINED: self._global_not_found(frame, slot)
+        else:
+            values[slot] = self._binary_fallback(frame, operator.add, value, amount)
+    def _op_dec_global(self, frame):
+        ip = frame.ip; code = frame.code; frame.ip = ip + 2; ext = frame.ext
+        if ext: frame.ext = 0
+        slot = ext | code[ip]; values = frame.globals; value, amount = values[slot], frame.constants[code[ip + 1]]
+        if type(value) in NUMBER_TYPES: values[slot] = value - amount
+        elif value is _UNDEFINED: self._global_not_found(frame, slot)
+        else:
+            values[slot] = self._binary_fallback(frame, operator.sub, value, amount)
+    def _compare_jump_generic(self, frame, op):
+        ip = frame.ip; code = frame.code; frame.ip = ip + 2; ext = frame.ext
+        if ext: frame.ext = 0
+        stack = self.stack; b = stack.pop(); a = stack.pop(); result = self._binary_fallback(frame, op, a, b)
+        if not result: frame.ip = ip + 2 + ((ext << 8) | (code[ip] << 8) | code[ip + 1])
+    def _op_compare_jump_eq(self, frame):
+        stack = self.stack; a, b = stack[-2], stack[-1]
+        if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES and not frame.ext:
+            del stack[-2:]; ip = frame.ip; code = frame.code; frame.ip = ip + 2 if a == b else ip + 2 + ((code[ip] << 8) | code[ip + 1])
+        else: self._compare_jump_generic(frame, operator.eq)
+    def _op_compare_jump_ne(self, frame):
+        stack = self.stack; a, b = stack[-2], stack[-1]
+        if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES and not frame.ext:
+            del stack[-2:]; ip = frame.ip; code = frame.code; frame.ip = ip + 2 if a != b else ip + 2 + ((code[ip] << 8) | code[ip + 1])
+        else: self._compare_jump_generic(frame, operator.ne)
+    def _op_compare_jump_gt(self, frame):
+        stack = self.stack; a, b = stack[-2], stack[-1]
+        if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES and not frame.ext:
+            del stack[-2:]; ip = frame.ip; code = frame.code; frame.ip = ip + 2 if a > b else ip + 2 + ((code[ip] << 8) | code[ip + 1])
+        else: self._compare_jump_generic(frame, operator.gt)
+    def _op_compare_jump_lt(self, frame):
+        stack = self.stack; a, b = stack[-2], stack[-1]
+        if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES and not frame.ext:
+            del stack[-2:]; ip = frame.ip; code = frame.code; frame.ip = ip + 2 if a < b else ip + 2 + ((code[ip] << 8) | code[ip + 1])
+        else: self._compare_jump_generic(frame, operator.lt)
+    def _op_compare_jump_ge(self, frame):
+        stack = self.stack; a, b = stack[-2], stack[-1]
+        if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES and not frame.ext:
+            del stack[-2:]; ip = frame.ip; code = frame.code; frame.ip = ip + 2 if a >= b else ip + 2 + ((code[ip] << 8) | code[ip + 1])
+        else: self._compare_jump_generic(frame, operator.ge)
+    def _op_compare_jump_le(self, frame):
+        stack = self.stack; a, b = stack[-2], stack[-1]
+        if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES and not frame.ext:
+            del stack[-2:]; ip = frame.ip; code = frame.code; frame.ip = ip + 2 if a <= b else ip + 2 + ((code[ip] << 8) | code[ip + 1])
+        else: self._compare_jump_generic(frame, operator.le)
+    def _op_get_iter(self, frame):
+        container = self.stack[-1]
+        # Arrays iterate over their first axis (rows of a matrix), strings over characters, dicts over a snapshot of their keys
+        if isinstance(container, dict): self.stack[-1] = iter(tuple(container)); return
+        try: self.stack[-1] = iter(container)
+        except TypeError: self._raise(frame, 'rt_err_not_iterable', type_name=builtin_type(container))
+    def _op_for_iter(self, frame):
+        ip = frame.ip; frame.ip = ip + 2; ext = frame.ext
+        if ext: frame.ext = 0
+        stack = self.stack; item = next(stack[-2], _UNDEFINED)
+        if item is not _UNDEFINED: stack[-1] = item; code = frame.code; frame.ip = ip + 2 - ((ext << 8) | (code[ip] << 8) | code[ip + 1])
+    def _op_switch_table(self, frame):
+        table = self._read_constant(frame); subject = self.stack.pop()
+        try: offset = table.get(subject)
+        except TypeError: # Unhashable subjects never equal a literal label; arrays cannot be compared at all
+            if isinstance(subject, np.ndarray): self._raise(frame, 'rt_err_unsupported_op_matrix', op_name='eq')
+            offset = None
+        if offset is not None: frame.ip += offset
     def _op_negate(self, frame): self.stack.append(-self.stack.pop())
     def _op_not(self, frame): self.stack.append(0 if self.stack.pop() else 1)
     def _op_print(self, frame): print(self.stack.pop())
     def _op_input(self, frame): self.stack.append(input(self.stack.pop()))
     def _op_jump_if_false(self, frame):
-        offset = self._read_short(frame)
-        if not self.stack[-1]: frame.ip += offset
-    def _op_jump(self, frame): frame.ip += self._read_short(frame)
-    def _op_loop(self, frame): frame.ip -= self._read_short(frame)
+        ip = frame.ip; code = frame.code
+        frame.ip = ip + 2 + ((code[ip] << 8) | code[ip + 1]) if not self.stack[-1] else ip + 2
+    def _op_pop_jump_if_false(self, frame):
+        ip = frame.ip; code = frame.code
+        frame.ip = ip + 2 + ((code[ip] << 8) | code[ip + 1]) if not self.stack.pop() else ip + 2
+    def _op_jump(self, frame): ip = frame.ip; code = frame.code; frame.ip = ip + 2 + ((code[ip] << 8) | code[ip + 1])
+    def _op_loop(self, frame): ip = frame.ip; code = frame.code; frame.ip = ip + 2 - ((code[ip] << 8) | code[ip + 1])
+    # --- Calls: the checks and error messages (and their line lookups) are only reached when the fast path does not apply ---
+    def _call_error(self, frame, callee, arg_count):
+        if not isinstance(callee, FunctionObject): self._raise(frame, 'rt_err_cannot_call_type', type_name=type(callee))
+        if callee.is_async: self._raise(frame, 'rt_err_cannot_call_async', name=callee.name)
+        self._raise(frame, 'rt_err_func_arity_mismatch', name=callee.name, expected=callee.arity, received=arg_count)
+    def _push_frame(self, callee, stack_base, return_base):
+        pool = self.frame_pool
+        if pool: new_frame = pool.pop(); new_frame.reset(callee, stack_base, return_base, callee.globals)
+        else: new_frame = CallFrame(callee, 0, stack_base, callee.globals); new_frame.return_base = return_base
+        self.frames.append(new_frame)
     def _op_call(self, frame):
-        const_idx, arg_count = self._read_byte(frame), self._read_byte(frame); current_line = self._get_current_line(frame)
-        if const_idx == 0xFF:
-            callee = self.stack[-(arg_count + 1)]
-            if isinstance(callee, FunctionObject):
-                if callee.arity != arg_count: self._throw(InterpreterError(t('rt_err_func_arity_mismatch', name=callee.name, expected=callee.arity, received=arg_count), current_line))
-                if callee.is_async: self._throw(InterpreterError(t('rt_err_cannot_call_async', name=callee.name), current_line))
-                self.frames.append(CallFrame(callee, 0, len(self.stack) - arg_count -1))
-            else: self._throw(InterpreterError(t('rt_err_cannot_call_type', type_name=type(callee)), current_line))
-        else:
-            func_name = frame.function.chunk.constants[const_idx]
-            args = [self.stack.pop() for _ in range(arg_count)][::-1]
-            if func_name in self.jit_functions: result = self.jit_functions[func_name](*args)
-            elif func_name in BUILTIN_FUNCTIONS:
-                try: result = BUILTIN_FUNCTIONS[func_name](*args)
-                except MomentumExit as e: raise e
-                except Exception as e: self._throw(InterpreterError(str(e), current_line))
-            else: self._throw(InterpreterError(t('rt_err_unknown_builtin', name=func_name), current_line))
-            self.stack.append(result if result is not None else None)
+        arg_count = self._read_byte(frame); callee = self.stack[-(arg_count + 1)]
+        if type(callee) is FunctionObject and callee.call_arity == arg_count:
+            base = len(self.stack) - arg_count - 1; self._push_frame(callee, base, base)
+        else: self._call_error(frame, callee, arg_count)
+    def _op_call_global(self, frame):
+        # The callee is not pushed: the new frame's slot 0 overlaps the caller's top value, which the callee never reads and RETURN keeps
+        ip = frame.ip; code = frame.code; frame.ip = ip + 2; ext = frame.ext
+        if ext: frame.ext = 0
+        slot = ext | code[ip]; arg_count = code[ip + 1]; callee = frame.globals[slot]
+        if type(callee) is FunctionObject and callee.call_arity == arg_count:
+            base = len(self.stack) - arg_count; pool = self.frame_pool # _push_frame, inlined for the common case
+            if pool: new_frame = pool.pop(); new_frame.reset(callee, base - 1, base, callee.globals); self.frames.append(new_frame)
+            else: self._push_frame(callee, base - 1, base)
+        elif callee is _UNDEFINED: self._global_not_found(frame, slot)
+        else: self._call_error(frame, callee, arg_count)
+    def _op_tail_call(self, frame):
+        ip = frame.ip; code = frame.code; frame.ip = ip + 2; ext = frame.ext
+        if ext: frame.ext = 0
+        slot = ext | code[ip]; arg_count = code[ip + 1]; callee = frame.globals[slot]
+        if type(callee) is FunctionObject and callee.call_arity == arg_count:
+            # The arguments replace the current frame's locals; stack_base and return_base stay, so the result still lands where
+            # the original caller expects it and the stack does not grow with the recursion depth
+            stack = self.stack; base = frame.stack_base + 1
+            stack[base:] = stack[len(stack) - arg_count:]; frame.reset(callee, base - 1, frame.return_base, callee.globals)
+        elif callee is _UNDEFINED: self._global_not_found(frame, slot)
+        else: self._call_error(frame, callee, arg_count)
+    def _op_call_jit(self, frame):
+        ip = frame.ip; code = frame.code; name = frame.function.chunk.global_names[frame.ext | code[ip]]
+        function = self.jit_functions.get(name)
+        if function is not None:
+            arg_count = code[ip + 1]; stack = self.stack; args = stack[len(stack) - arg_count:]
+            try: result = function(*args)
+            except JIT_COMPILE_ERRORS as e:
+                # Numba cannot type it for these arguments: this function runs on the VM from now on
+                print(t('jit_fallback', name=name, e=jit_failure_reason(e)), file=sys.stderr); self.jit_functions.pop(name, None)
+            except Exception as e: frame.ip = ip + 2; frame.ext = 0; self._builtin_failed(frame, e)
+            else: frame.ip = ip + 2; frame.ext = 0; del stack[len(stack) - arg_count:]; stack.append(result); return
+        self._quicken(frame, OpCode.CALL_GLOBAL); self._op_call_global(frame)
+    def _op_tier_up(self, frame):
+        tier = frame.function.chunk.tier
+        if frame.ip == 1 and tier.native:
+            stack = self.stack; base = frame.stack_base + 1; args = stack[base:base + frame.function.arity]
+            key = tuple(map(type, args)); native = tier.native.get(key)
+            if native is not None:
+                # A failure (a builtin raising, an integer outside 64 bits) deoptimizes just this call: the function is pure,
+                # so the VM runs it again from the start and reports any error as usual. Recursion too deep for the C stack
+                # would fail again on every call below this one, so those go back to the VM for good
+                try: result = native(*args, 0)
+                except RecursionError: tier.abandon(key, "recursion deeper than TIER_MAX_DEPTH")
+                except Exception: pass
+                else: stack.append(result); self._op_return(frame); return
+        tier.hotness += 1
+        if tier.hotness >= TIER_UP_THRESHOLD: tier.tier_up(self.stack[frame.stack_base + 1:frame.stack_base + 1 + frame.function.arity])
+    def _builtin(self, frame, name):
+        function = self.jit_functions.get(name) or BUILTIN_FUNCTIONS.get(name)
+        if function is None: self._raise(frame, 'rt_err_unknown_builtin', name=name)
+        return function
+    def _builtin_failed(self, frame, error):
+        if isinstance(error, MomentumExit): raise error
+        self._raise(frame, None, value=error)
+    def _op_call_builtin(self, frame):
+        function = self._builtin(frame, self._read_constant(frame)); arg_count = self._read_byte(frame)
+        stack = self.stack; args = stack[len(stack) - arg_count:]; del stack[len(stack) - arg_count:]
+        try: stack.append(function(*args))
+        except Exception as e: self._builtin_failed(frame, e)
+    def _op_call_builtin_0(self, frame):
+        function = self._builtin(frame, self._read_constant(frame))
+        try: self.stack.append(function())
+        except Exception as e: self._builtin_failed(frame, e)
+    def _op_call_builtin_1(self, frame):
+        function = self._builtin(frame, self._read_constant(frame))
+        stack = self.stack
+        try: stack[-1] = function(stack[-1])
+        except Exception as e: self._builtin_failed(frame, e)
+    def _op_call_builtin_2(self, frame):
+        function = self._builtin(frame, self._read_constant(frame))
+        stack = self.stack
+        try: stack[-2] = function(stack[-2], stack[-1]); del stack[-1]
+        except Exception as e: self._builtin_failed(frame, e)
+    def _op_call_builtin_3(self, frame):
+        function = self._builtin(frame, self._read_constant(frame))
+        stack = self.stack
+        try: stack[-3] = function(stack[-3], stack[-2], stack[-1]); del stack[-2:]
+        except Exception as e: self._builtin_failed(frame, e)
+    # The value stack is one list shared by every frame and never rebound: frames own the window above their
+    # stack_base, and tearing a window down truncates in place (O(window size), no copy of the live stack).
+    def _pop_n(self, count):
+        stack = self.stack
+        if not count: return []
+        elements = stack[-count:]; del stack[-count:]; return elements
     def _op_return(self, frame):
-        result = self.stack.pop()
+        stack = self.stack; result = stack.pop()
         closed_frame = self.frames.pop()
-        self.stack = self.stack[:closed_frame.stack_base]
-        self.stack.append(result)
+        del stack[closed_frame.return_base:]
+        stack.append(result)
         if not self.frames:
             self.frames.append(None)
+        else: self.frame_pool.append(closed_frame)
     def _op_build_array(self, frame):
-        dims = self._read_byte(frame); sizes = tuple(int(s) for s in self.stack[-dims:]); self.stack = self.stack[:-dims]; self.stack.append(np.zeros(sizes))
+        dims = self._read_byte(frame); sizes = tuple(int(s) for s in self._pop_n(dims)); self.stack.append(np.zeros(sizes))
     
+    def _op_load_subscript_array(self, frame):
+        stack = self.stack; container, key = stack[-2], stack[-1]
+        if type(container) is np.ndarray and (type(key) is int or type(key) is tuple):
+            try: value = container[key]
+            except (IndexError, TypeError): return self._op_load_subscript(frame) # Let the generic path raise the Momentum error
+            del stack[-1]; stack[-1] = value
+        else: self._deoptimize(frame, OpCode.LOAD_SUBSCRIPT); self._op_load_subscript(frame)
+    def _op_load_subscript_dict(self, frame):
+        stack = self.stack; container, key = stack[-2], stack[-1]
+        if type(container) is dict and type(key) is str and key in container: del stack[-1]; stack[-1] = container[key]
+        elif type(container) is dict and type(key) is str: self._op_load_subscript(frame)
+        else: self._deoptimize(frame, OpCode.LOAD_SUBSCRIPT); self._op_load_subscript(frame)
     def _op_load_subscript(self, frame):
+        container, key = self.stack[-2], self.stack[-1]
+        if type(container) is np.ndarray and (type(key) is int or type(key) is tuple): self._quicken(frame, OpCode.LOAD_SUBSCRIPT_ARRAY)
+        elif type(container) is dict and type(key) is str: self._quicken(frame, OpCode.LOAD_SUBSCRIPT_DICT)
         key = self.stack.pop()
         container = self.stack.pop()
-        line = self._get_current_line(frame)
         try:
             # The key can now be a single value or a tuple for multi-dim access
             self.stack.append(container[key])
-        except (KeyError, IndexError): self._throw(InterpreterError(f"Key/Index error: '{key}' not found.", line))
-        except TypeError:
-            if isinstance(container, dict) and not isinstance(key, str):
-                self._throw(InterpreterError(t('rt_err_invalid_key_type', container_type='DICTIONARY', key_type=builtin_type(key)), line))
-            else:
-                self._throw(InterpreterError(t('rt_err_not_subscriptable', type_name=builtin_type(container)), line))
+        except (KeyError, IndexError, TypeError) as e: self._subscript_failed(frame, container, key, e)
+    def _subscript_failed(self, frame, container, key, error):
+        if not isinstance(error, TypeError): self._raise(frame, 'rt_err_key_not_found', index=key)
+        if isinstance(container, dict) and not isinstance(key, str):
+            self._raise(frame, 'rt_err_invalid_key_type', container_type='DICTIONARY', key_type=builtin_type(key))
+        self._raise(frame, 'rt_err_not_subscriptable', type_name=builtin_type(container))
 
     def _op_store_subscript(self, frame):
         value = self.stack.pop()
         key = self.stack.pop()
         container = self.stack.pop()
-        line = self._get_current_line(frame)
         try:
             container[key] = value
             self.stack.append(value) # Assignment expressions should leave the value on the stack
-        except (KeyError, IndexError): self._throw(InterpreterError(f"Key/Index error: '{key}' not found.", line))
-        except TypeError:
-            if isinstance(container, dict) and not isinstance(key, str):
-                self._throw(InterpreterError(t('rt_err_invalid_key_type', container_type='DICTIONARY', key_type=builtin_type(key)), line))
-            else:
-                self._throw(InterpreterError(t('rt_err_not_subscriptable', type_name=builtin_type(container)), line))
+        except (KeyError, IndexError, TypeError) as e: self._subscript_failed(frame, container, key, e)
 
     def _op_read_data(self, frame):
-        if self.data_ptr >= len(self.data_pool): self._throw(InterpreterError(t('error_out_of_data'), self._get_current_line(frame)))
+        if self.data_ptr >= len(self.data_pool): self._raise(frame, 'error_out_of_data')
         self.stack.append(self.data_pool[self.data_ptr]); self.data_ptr += 1
     def _op_restore_data(self, frame): self.data_ptr = 0
     async def _op_await_async(self, frame):
         awaitable = self.stack.pop(); self.stack.append(await awaitable if asyncio.iscoroutine(awaitable) else awaitable)
     def _op_await(self, frame): return self._op_await_async(frame)
     def _op_create_task(self, frame): asyncio.create_task(self.stack.pop())
-    async def _op_import_module_async(self, frame):
-        module_name = self._read_constant(frame); module_path = str((self.base_path / module_name).resolve())
-        module_function = self.compiled_modules[module_path]
-        module_vm = VM(self.jit_functions, [], self.compiled_modules, self.base_path)
-        await module_vm.run(module_function); self.globals.update(module_vm.globals)
+    async def _op_import_module_async(self, frame): await self._import_module(self._read_constant(frame))
+    async def _import_module(self, module_name):
+        module_path = (self.base_path / module_name).resolve(); key = str(module_path)
+        module = LOADED_MODULES.get(key)
+        if module is None:
+            # First IMPORT of this file in the process: run its top level once. The instance is registered before it runs so an
+            # import cycle binds to the partly initialized module instead of running it again.
+            module_function = self.compiled_modules.get(key) or self._compile_import(module_name) # Evicted or reloaded
+            module = LOADED_MODULES[key] = Namespace(module_function.chunk.global_names)
+            register_jit_functions(module_function.chunk, module_path, self.jit_functions)
+            module_vm = type(self)(self.jit_functions, module_function.chunk.data_pool, self.compiled_modules, module_path.parent)
+            try: await module_vm.run(module_function, module)
+            except BaseException: del LOADED_MODULES[key]; raise
+        self.namespace.bind(module)
     def _op_import_module(self, frame): return self._op_import_module_async(frame)
+    def _compile_import(self, module_name): return compile_module(module_name, self.base_path, {})
     def _op_build_dict(self, frame):
         count = self._read_byte(frame); new_dict = {}
         for _ in range(count): value = self.stack.pop(); key = self.stack.pop(); new_dict[key] = value
@@ -1299,42 +3317,38 @@ class VM:
         count = self._read_byte(frame)
         parts = [str(self.stack.pop()) for _ in range(count)]
         self.stack.append("".join(reversed(parts)))
-    def _op_setup_try(self, frame):
-        offset = self._read_short(frame); handler_ip = frame.ip + offset
-        self.try_stack.append(TryBlock(handler_ip, len(self.stack)))
-    def _op_pop_try(self, frame): self.try_stack.pop()
-    def _op_throw(self, frame): self._throw(self.stack.pop())
+    def _op_throw(self, frame): self._raise(frame, None, value=self.stack.pop())
     def _op_dup(self, frame): self.stack.append(self.stack[-1])
-    def _throw(self, error_obj):
-        if not self.try_stack: raise error_obj
-        try_block = self.try_stack.pop(); self.stack = self.stack[:try_block.stack_size]
-        self.frames[-1].ip = try_block.handler_ip
-        if isinstance(error_obj, InterpreterError): self.stack.append(error_obj.raw_message)
-        else: self.stack.append(str(error_obj))
+    # --- Errors: handlers raise, and the dispatch loop routes the exception through the exception tables (zero cost until then) ---
+    def _raise(self, frame, message_key, **kwargs): raise VMError(frame.function.chunk, frame.ip - 1, message_key, **kwargs)
+    def _unwind(self, error):
+        """Resumes at the innermost TRY handler covering the current instruction of the newest frame that has one, dropping the
+        frames above it. Without a handler `error` propagates with every frame still in place for the stack trace."""
+        frames = self.frames
+        for level in range(len(frames) - 1, -1, -1):
+            frame = frames[level]; ip = frame.ip - 1 # Callers sit just past their CALL
+            for handler in frame.function.chunk.exception_table:
+                if handler.start <= ip < handler.end: break
+            else: continue
+            while len(frames) > level + 1: self.frame_pool.append(frames.pop())
+            del self.stack[frame.stack_base + handler.depth:]; frame.ip, frame.ext = handler.target, 0
+            self.stack.append(error.raw_message if handler.keeps_error else None); return
+        raise error
     def _op_build_array_literal(self, frame):
         count = self._read_byte(frame)
-        elements = self.stack[-count:]
-        self.stack = self.stack[:-count]
-        self.stack.append(np.array(elements, dtype=object))
+        self.stack.append(np.array(self._pop_n(count), dtype=object))
     def _op_build_tuple(self, frame):
         count = self._read_byte(frame)
-        elements = tuple(self.stack[-count:])
-        self.stack = self.stack[:-count]
-        self.stack.append(elements)
+        self.stack.append(tuple(self._pop_n(count)))
     def _op_debug_print(self, frame):
         value = self.stack.pop()
-        expr_str = self._read_constant(frame)
-        type_str = builtin_type(value)
-        if colorama_enabled:
-            print(f"{Fore.CYAN}[DEBUG]{Style.RESET_ALL} {expr_str} ({Fore.YELLOW}{type_str}{Style.RESET_ALL}): {Fore.GREEN}{repr(value)}{Style.RESET_ALL}")
-        else:
-            print(f"[DEBUG] {expr_str} ({type_str}): {repr(value)}")
+        debug_print(self._read_constant(frame), value)
     def _op_get_length(self, frame):
         container = self.stack.pop()
         try:
             self.stack.append(len(container))
         except TypeError:
-            self._throw(InterpreterError(f"Object of type '{builtin_type(container)}' has no len()", self._get_current_line(frame)))
+            self._raise(frame, 'rt_err_no_len', type_name=builtin_type(container))
     def _get_current_line(self, frame): return frame.function.chunk.get_line(max(0, frame.ip - 1))
     def _generate_stack_trace(self):
         trace = []
@@ -1343,26 +3357,313 @@ class VM:
             context = f"function {frame.function.name}" if frame.function.name != "<script>" else "<script>"
             trace.append({"file": frame.function.chunk.name, "line": self._get_current_line(frame), "context": context})
         return trace
-    async def run(self, main_function):
-        main_frame = CallFrame(main_function, 0, 0)
-        self.frames.append(main_frame)
+    def _run_until_suspend(self):
+        """Executes synchronous opcodes until the program finishes (returns None) or an async opcode hands back an awaitable."""
+        frames, table = self.frames, self.dispatch_table
+        while True:
+            frame = frames[-1]
+            try: # Costs nothing until something raises; then the exception tables decide where execution resumes
+                while frame is not None:
+                    ip = frame.ip; op = frame.code[ip]; frame.ip = ip + 1
+                    handler = table[op]
+                    if handler is None: return self.async_dispatch_table[op](frame)
+                    handler(frame)
+                    frame = frames[-1]
+                return None
+            except InterpreterError as error: self._unwind(error)
+            except PYTHON_RUNTIME_ERRORS as error: self._unwind(self._python_error(frame, error))
+    def _python_error(self, frame, error): return VMError(frame.function.chunk, frame.ip - 1, 'rt_err_python_exception', type_name=type(error).__name__, error=error)
+    def _main_frame(self, main_function, values): return CallFrame(main_function, 0, 0, values)
+    async def run(self, main_function, namespace=None):
+        if namespace is None: namespace = Namespace(main_function.chunk.global_names)
+        else: namespace.sync()
+        self.namespace = namespace; self.frames.append(self._main_frame(main_function, namespace.values))
         try:
-            while self.frames and self.frames[-1] is not None:
-                frame = self.frames[-1]
-                handler = self.dispatch_table[frame.function.chunk.code[frame.ip]]; frame.ip += 1
-                result = handler(frame)
-                if asyncio.iscoroutine(result): await result
+            while True:
+                awaitable = self._run_until_suspend()
+                if awaitable is None: break
+                try: await awaitable
+                except InterpreterError as error: self._unwind(error)
+                except PYTHON_RUNTIME_ERRORS as error: self._unwind(self._python_error(self.frames[-1], error))
         except InterpreterError as e:
             if not e.stack_trace: e.stack_trace = self._generate_stack_trace()
             raise e
-        except (IndexError, TypeError, ValueError, ZeroDivisionError, KeyError) as e:
-            current_frame = self.frames[-1] if self.frames else None
-            current_line = self._get_current_line(current_frame) if current_frame else '?'
-            raise InterpreterError(f"{type(e).__name__}: {e}", current_line, self._generate_stack_trace()) from e
 
         return self.stack[0] if self.stack else None
 
-JIT_FUNCTIONS, COMPILED_MODULES_CACHE = {}, {}
+class RegisterFrame:
+    __slots__ = ('function', 'ip', 'regs', 'code', 'globals', 'result')
+    def __init__(self, function, regs, result, globals):
+        # `result` is the caller's register that RETURN writes to (None for a module's top level)
+        self.function, self.ip, self.regs, self.result, self.globals, self.code = function, 0, regs, result, globals, function.chunk.code
+class RegisterVM(VM):
+    """Runs RegisterCompiler code for --engine=reg. Frames own a register file instead of a window of the shared value stack; errors,
+    TRY handlers, IMPORT, JIT FUNCTIONs and every message work as on the stack VM, whose helpers are reused (`stack` is only scratch
+    space for _binary_fallback, and holds the script result at the end)."""
+    def __init__(self, jit_functions, data_pool, compiled_modules, base_path):
+        self.stack, self.namespace, self.frames = [], Namespace(), []
+        self.jit_functions, self.data_pool, self.data_ptr = jit_functions, data_pool, 0
+        self.compiled_modules, self.base_path = compiled_modules, base_path
+        self.dispatch_table = self._create_dispatch_table()
+        self.async_dispatch_table = {RegOp.AWAIT.value: self._reg_await, RegOp.IMPORT_MODULE.value: self._reg_import_module}
+        for opcode in self.async_dispatch_table: self.dispatch_table[opcode] = None
+    def _create_dispatch_table(self):
+        table = [None] * (len(RegOp) + 1)
+        for opcode in RegOp: table[opcode.value] = getattr(self, f"_reg_{opcode.name.lower()}")
+        return table
+    def _main_frame(self, main_function, values): return RegisterFrame(main_function, list(main_function.chunk.registers), None, values)
+    def _compile_import(self, module_name): return compile_register_module(module_name, self.base_path, {})
+    def _reg_move(self, frame, ins): regs = frame.regs; regs[ins[1]] = regs[ins[2]]
+    def _reg_load_global(self, frame, ins):
+        value = frame.globals[ins[2]]
+        if value is _UNDEFINED: self._global_not_found(frame, ins[2])
+        frame.regs[ins[1]] = value
+    def _reg_store_global(self, frame, ins): frame.globals[ins[1]] = frame.regs[ins[2]]
+    # --- Arithmetic and comparisons: inline for plain numbers (and string `+`), _binary_fallback gives everything else the stack VM's semantics ---
+    def _reg_add(self, frame, ins):
+        regs = frame.regs; a = regs[ins[2]]; b = regs[ins[3]]
+        if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES or type(a) is str and type(b) is str: regs[ins[1]] = a + b
+        else: regs[ins[1]] = self._binary_fallback(frame, operator.add, a, b)
+    def _reg_subtract(self, frame, ins):
+        regs = frame.regs; a = regs[ins[2]]; b = regs[ins[3]]
+        regs[ins[1]] = a - b if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES else self._binary_fallback(frame, operator.sub, a, b)
+    def _reg_multiply(self, frame, ins):
+        regs = frame.regs; a = regs[ins[2]]; b = regs[ins[3]]
+        regs[ins[1]] = a * b if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES else self._binary_fallback(frame, operator.mul, a, b)
+    def _reg_divide(self, frame, ins):
+        regs = frame.regs; a = regs[ins[2]]; b = regs[ins[3]]
+        regs[ins[1]] = a / b if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES else self._binary_fallback(frame, operator.truediv, a, b)
+    def _reg_equal(self, frame, ins):
+        regs = frame.regs; a = regs[ins[2]]; b = regs[ins[3]]
+        regs[ins[1]] = (1 if a == b else 0) if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES else self._binary_fallback(frame, operator.eq, a, b)
+    def _reg_not_equal(self, frame, ins):
+        regs = frame.regs; a = regs[ins[2]]; b = regs[ins[3]]
+        regs[ins[1]] = (1 if a != b else 0) if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES else self._binary_fallback(frame, operator.ne, a, b)
+    def _reg_greater(self, frame, ins):
+        regs = frame.regs; a = regs[ins[2]]; b = regs[ins[3]]
+        regs[ins[1]] = (1 if a > b else 0) if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES else self._binary_fallback(frame, operator.gt, a, b)
+    def _reg_less(self, frame, ins):
+        regs = frame.regs; a = regs[ins[2]]; b = regs[ins[3]]
+        regs[ins[1]] = (1 if a < b else 0) if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES else self._binary_fallback(frame, operator.lt, a, b)
+    def _reg_greater_equal(self, frame, ins):
+        regs = frame.regs; a = regs[ins[2]]; b = regs[ins[3]]
+        regs[ins[1]] = (1 if a >= b else 0) if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES else self._binary_fallback(frame, operator.ge, a, b)
+    def _reg_less_equal(self, frame, ins):
+        regs = frame.regs; a = regs[ins[2]]; b = regs[ins[3]]
+        regs[ins[1]] = (1 if a <= b else 0) if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES else self._binary_fallback(frame, operator.le, a, b)
+    def _reg_negate(self, frame, ins): regs = frame.regs; regs[ins[1]] = -regs[ins[2]]
+    def _reg_not(self, frame, ins): regs = frame.regs; regs[ins[1]] = 0 if regs[ins[2]] else 1
+    def _reg_inc_global(self, frame, ins):
+        slot = ins[1]; values = frame.globals; value, amount = values[slot], frame.regs[ins[2]]
+        if type(value) in NUMBER_TYPES: values[slot] = value + amount
+        elif value is _UNDEFINED: self._global_not_found(frame, slot)
+        else: values[slot] = self._binary_fallback(frame, operator.add, value, amount)
+    def _reg_dec_global(self, frame, ins):
+        slot = ins[1]; values = frame.globals; value, amount = values[slot], frame.regs[ins[2]]
+        if type(value) in NUMBER_TYPES: values[slot] = value - amount
+        elif value is _UNDEFINED: self._global_not_found(frame, slot)
+        else: values[slot] = self._binary_fallback(frame, operator.sub, value, amount)
+    # --- Branches ---
+    def _reg_jump(self, frame, ins): frame.ip = ins[1]
+    def _reg_jump_if(self, frame, ins):
+        if frame.regs[ins[1]]: frame.ip = ins[2]
+    def _reg_jump_unless(self, frame, ins):
+        if not frame.regs[ins[1]]: frame.ip = ins[2]
+    def _reg_jump_if_eq(self, frame, ins):
+        regs = frame.regs; a = regs[ins[1]]; b = regs[ins[2]]
+        if (a == b) if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES else self._binary_fallback(frame, operator.eq, a, b): frame.ip = ins[3]
+    def _reg_jump_if_ne(self, frame, ins):
+        regs = frame.regs; a = regs[ins[1]]; b = regs[ins[2]]
+        if (a != b) if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES else self._binary_fallback(frame, operator.ne, a, b): frame.ip = ins[3]
+    def _reg_jump_if_gt(self, frame, ins):
+        regs = frame.regs; a = regs[ins[1]]; b = regs[ins[2]]
+        if (a > b) if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES else self._binary_fallback(frame, operator.gt, a, b): frame.ip = ins[3]
+    def _reg_jump_if_lt(self, frame, ins):
+        regs = frame.regs; a = regs[ins[1]]; b = regs[ins[2]]
+        if (a < b) if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES else self._binary_fallback(frame, operator.lt, a, b): frame.ip = ins[3]
+    def _reg_jump_if_ge(self, frame, ins):
+        regs = frame.regs; a = regs[ins[1]]; b = regs[ins[2]]
+        if (a >= b) if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES else self._binary_fallback(frame, operator.ge, a, b): frame.ip = ins[3]
+    def _reg_jump_if_le(self, frame, ins):
+        regs = frame.regs; a = regs[ins[1]]; b = regs[ins[2]]
+        if (a <= b) if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES else self._binary_fallback(frame, operator.le, a, b): frame.ip = ins[3]
+    def _reg_jump_unless_eq(self, frame, ins):
+        regs = frame.regs; a = regs[ins[1]]; b = regs[ins[2]]
+        if not ((a == b) if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES else self._binary_fallback(frame, operator.eq, a, b)): frame.ip = ins[3]
+    def _reg_jump_unless_ne(self, frame, ins):
+        regs = frame.regs; a = regs[ins[1]]; b = regs[ins[2]]
+        if not ((a != b) if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES else self._binary_fallback(frame, operator.ne, a, b)): frame.ip = ins[3]
+    def _reg_jump_unless_gt(self, frame, ins):
+        regs = frame.regs; a = regs[ins[1]]; b = regs[ins[2]]
+        if not ((a > b) if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES else self._binary_fallback(frame, operator.gt, a, b)): frame.ip = ins[3]
+    def _reg_jump_unless_lt(self, frame, ins):
+        regs = frame.regs; a = regs[ins[1]]; b = regs[ins[2]]
+        if not ((a < b) if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES else self._binary_fallback(frame, operator.lt, a, b)): frame.ip = ins[3]
+    def _reg_jump_unless_ge(self, frame, ins):
+        regs = frame.regs; a = regs[ins[1]]; b = regs[ins[2]]
+        if not ((a >= b) if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES else self._binary_fallback(frame, operator.ge, a, b)): frame.ip = ins[3]
+    def _reg_jump_unless_le(self, frame, ins):
+        regs = frame.regs; a = regs[ins[1]]; b = regs[ins[2]]
+        if not ((a <= b) if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES else self._binary_fallback(frame, operator.le, a, b)): frame.ip = ins[3]
+    # --- Loops ---
+    def _reg_for_prep(self, frame, ins):
+        regs = frame.regs; counter = ins[1]; value, limit, step = regs[counter], regs[ins[2]], regs[ins[3]]
+        if type(value) in NUMBER_TYPES and type(limit) in NUMBER_TYPES and type(step) in NUMBER_TYPES:
+            up = step > 0; enter = value <= limit if up else value >= limit
+        else:
+            up = self._binary_fallback(frame, operator.gt, step, 0); enter = self._binary_fallback(frame, operator.le if up else operator.ge, value, limit)
+        regs[counter + 1] = (limit, step, up)
+        if not enter: frame.ip = ins[4]
+    def _reg_for_step(self, frame, ins):
+        regs = frame.regs; counter = ins[1]; value = regs[counter]; limit, step, up = regs[counter + 1]
+        if type(value) in NUMBER_TYPES and type(step) in NUMBER_TYPES and type(limit) in NUMBER_TYPES:
+            regs[counter] = value = value + step; more = value <= limit if up else value >= limit
+        else:
+            regs[counter] = value = self._binary_fallback(frame, operator.add, value, step); more = self._binary_fallback(frame, operator.le if up else operator.ge, value, limit)
+        if more: frame.ip = ins[2]
+    def _reg_get_iter(self, frame, ins):
+        container = frame.regs[ins[2]]
+        if isinstance(container, dict): frame.regs[ins[1]] = iter(tuple(container)); return
+        try: frame.regs[ins[1]] = iter(container)
+        except TypeError: self._raise(frame, 'rt_err_not_iterable', type_name=builtin_type(container))
+    def _reg_for_iter(self, frame, ins):
+        regs = frame.regs; item = next(regs[ins[2]], _UNDEFINED)
+        if item is not _UNDEFINED: regs[ins[1]] = item; frame.ip = ins[3]
+    def _reg_switch_table(self, frame, ins):
+        subject = frame.regs[ins[1]]
+        try: target = ins[2].get(subject)
+        except TypeError:
+            if isinstance(subject, np.ndarray): self._raise(frame, 'rt_err_unsupported_op_matrix', op_name='eq')
+            target = None
+        if target is not None: frame.ip = target
+    # --- Calls: the callee's register file is its arguments followed by a copy of its chunk's `registers` ---
+    def _reg_call(self, frame, ins):
+        callee = frame.regs[ins[2]]; args = ins[3]
+        if type(callee) is FunctionObject and callee.call_arity == len(args):
+            regs = frame.regs; self.frames.append(RegisterFrame(callee, [regs[r] for r in args] + callee.chunk.registers, ins[1], callee.globals))
+        else: self._call_error(frame, callee, len(args))
+    def _reg_call_global(self, frame, ins):
+        callee = frame.globals[ins[2]]; args = ins[3]
+        if type(callee) is FunctionObject and callee.call_arity == len(args):
+            regs = frame.regs; self.frames.append(RegisterFrame(callee, [regs[r] for r in args] + callee.chunk.registers, ins[1], callee.globals))
+        elif callee is _UNDEFINED: self._global_not_found(frame, ins[2])
+        else: self._call_error(frame, callee, len(args))
+    def _reg_tail_call(self, frame, ins):
+        callee = frame.globals[ins[1]]; args = ins[2]
+        if type(callee) is FunctionObject and callee.call_arity == len(args):
+            # The callee takes over this frame, so the result still goes to the original caller's register
+            regs = frame.regs; frame.regs = [regs[r] for r in args] + callee.chunk.registers
+            frame.function, frame.code, frame.globals, frame.ip = callee, callee.chunk.code, callee.globals, 0
+        elif callee is _UNDEFINED: self._global_not_found(frame, ins[1])
+        else: self._call_error(frame, callee, len(args))
+    def _reg_call_jit(self, frame, ins):
+        name = frame.function.chunk.global_names[ins[2]]; function = self.jit_functions.get(name)
+        if function is not None:
+            regs = frame.regs
+            try: regs[ins[1]] = function(*[regs[r] for r in ins[3]]); return
+            except JIT_COMPILE_ERRORS as e: print(t('jit_fallback', name=name, e=jit_failure_reason(e)), file=sys.stderr); self.jit_functions.pop(name, None)
+            except Exception as e: self._builtin_failed(frame, e)
+        frame.code[frame.ip - 1] = (RegOp.CALL_GLOBAL.value, *ins[1:]); self._reg_call_global(frame, ins)
+    def _reg_call_builtin(self, frame, ins):
+        function = self._builtin(frame, ins[2]); regs = frame.regs
+        try: regs[ins[1]] = function(*[regs[r] for r in ins[3]])
+        except Exception as e: self._builtin_failed(frame, e)
+    def _reg_return(self, frame, ins):
+        value = frame.regs[ins[1]]; frames = self.frames; frames.pop()
+        if frames: frames[-1].regs[frame.result] = value
+        else: frames.append(None); self.stack[:] = [value]
+    def _reg_define_func(self, frame, ins):
+        prototype = ins[2]; function = FunctionObject(prototype.name, prototype.arity, prototype.chunk, prototype.is_async)
+        function.globals = frame.globals; frame.globals[ins[1]] = function
+    # --- Values ---
+    def _reg_dim(self, frame, ins): regs = frame.regs; frame.globals[ins[1]] = np.zeros(tuple(int(regs[r]) for r in ins[2]))
+    def _reg_build_array_literal(self, frame, ins): regs = frame.regs; regs[ins[1]] = np.array([regs[r] for r in ins[2]], dtype=object)
+    def _reg_build_dict(self, frame, ins): regs = frame.regs; regs[ins[1]] = {regs[key]: regs[value] for key, value in ins[2]}
+    def _reg_build_string(self, frame, ins): regs = frame.regs; regs[ins[1]] = "".join([str(regs[r]) for r in ins[2]])
+    def _reg_build_tuple(self, frame, ins): regs = frame.regs; regs[ins[1]] = tuple([regs[r] for r in ins[2]])
+    def _reg_load_subscript(self, frame, ins):
+        regs = frame.regs; container = regs[ins[2]]; key = regs[ins[3]]
+        try: regs[ins[1]] = container[key]
+        except (KeyError, IndexError, TypeError) as e: self._subscript_failed(frame, container, key, e)
+    def _reg_store_subscript(self, frame, ins):
+        regs = frame.regs; container = regs[ins[1]]; key = regs[ins[2]]
+        try: container[key] = regs[ins[3]]
+        except (KeyError, IndexError, TypeError) as e: self._subscript_failed(frame, container, key, e)
+    def _reg_print(self, frame, ins): print(frame.regs[ins[1]])
+    def _reg_input(self, frame, ins): regs = frame.regs; regs[ins[1]] = input(regs[ins[2]])
+    def _reg_read_data(self, frame, ins):
+        if self.data_ptr >= len(self.data_pool): self._raise(frame, 'error_out_of_data')
+        frame.regs[ins[1]] = self.data_pool[self.data_ptr]; self.data_ptr += 1
+    def _reg_restore_data(self, frame, ins): self.data_ptr = 0
+    async def _reg_await_async(self, frame, ins):
+        awaitable = frame.regs[ins[2]]; frame.regs[ins[1]] = await awaitable if asyncio.iscoroutine(awaitable) else awaitable
+    def _reg_await(self, frame, ins): return self._reg_await_async(frame, ins)
+    def _reg_create_task(self, frame, ins): asyncio.create_task(frame.regs[ins[1]])
+    def _reg_import_module(self, frame, ins): return self._import_module(ins[1])
+    def _reg_throw(self, frame, ins): self._raise(frame, None, value=frame.regs[ins[1]])
+    def _reg_debug_print(self, frame, ins): debug_print(ins[2], frame.regs[ins[1]])
+    def _unwind(self, error):
+        """VM._unwind for register frames: the handler's CATCH register gets the message (see RegisterChunk)."""
+        frames = self.frames
+        for level in range(len(frames) - 1, -1, -1):
+            frame = frames[level]; ip = frame.ip - 1
+            for handler in frame.function.chunk.exception_table:
+                if handler.start <= ip < handler.end: break
+            else: continue
+            del frames[level + 1:]; frame.ip = handler.target
+            if handler.depth is not None: frame.regs[handler.depth] = error.raw_message if handler.keeps_error else None
+            return
+        raise error
+    def _run_until_suspend(self):
+        frames, table = self.frames, self.dispatch_table
+        while True:
+            frame = frames[-1]
+            try:
+                while frame is not None:
+                    ins = frame.code[frame.ip]; frame.ip += 1
+                    handler = table[ins[0]]
+                    if handler is None: return self.async_dispatch_table[ins[0]](frame, ins)
+                    handler(frame, ins)
+                    frame = frames[-1]
+                return None
+            except InterpreterError as error: self._unwind(error)
+            except PYTHON_RUNTIME_ERRORS as error: self._unwind(self._python_error(frame, error))
+
+def debug_print(expr_str, value):
+    # DEBUG on every engine
+    type_str = builtin_type(value)
+    if colorama_enabled:
+        print(f"{Fore.CYAN}[DEBUG]{Style.RESET_ALL} {expr_str} ({Fore.YELLOW}{type_str}{Style.RESET_ALL}): {Fore.GREEN}{repr(value)}{Style.RESET_ALL}")
+    else:
+        print(f"[DEBUG] {expr_str} ({type_str}): {repr(value)}")
+
+class ModuleCache(OrderedDict):
+    """Compiled modules by resolved path, dropping the least recently used once more than `limit` are held."""
+    def __init__(self, limit): super().__init__(); self.limit = limit
+    def get(self, key, default=None):
+        if key not in self: return default
+        self.move_to_end(key); return super().__getitem__(key)
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value); self.move_to_end(key)
+        while len(self) > self.limit: self.popitem(last=False)
+MODULE_CACHE_LIMIT = 512 # An evicted module is simply compiled (or loaded from its .mnc) again on its next IMPORT
+JIT_FUNCTIONS, COMPILED_MODULES_CACHE = {}, ModuleCache(MODULE_CACHE_LIMIT)
+LOADED_MODULES = {} # Resolved module path -> the Namespace of its single executed instance in this process
+# Resolved path -> what the file looked like when it was read, so invalidate_changed_modules can tell which ones were edited since
+ModuleSource = namedtuple('ModuleSource', 'mtime digest imports')
+MODULE_SOURCES = {}
+WATCH_INTERVAL = 0.5 # Seconds between source checks in --watch mode
+MODULES_COMPILING = set()
+COMPILE_WORKERS = os.cpu_count() or 1 # Process pool size for compile_import_graph, set by --compile-workers
+PARALLEL_COMPILE_MIN_MODULES = 4 # Fewer stale modules than this compile in-process: a pool costs more to start than they take
+MOMENTUM_VERSION = "1.1"
+# Bump whenever the compiler output or the .mnc layout changes so stale caches are never loaded
+BYTECODE_CACHE_VERSION = 23
+BYTECODE_CACHE_MAGIC = b"MNC\x00"
+BYTECODE_CACHE_DIR = "__mncache__"
+# Optimizer switches (ASTOptimizer and the bytecode peephole pass), also set by --no-optimize / --debug-optimizer (see parse_command_line)
+OPTIMIZE_BYTECODE = not os.environ.get('MOMENTUM_NO_OPTIMIZE')
+DEBUG_OPTIMIZER = bool(os.environ.get('MOMENTUM_DEBUG_OPTIMIZER'))
 def extract_data(ast_root):
     data_pool = []
     def traverse(node):
@@ -1375,46 +3676,571 @@ def extract_data(ast_root):
                 if isinstance(child, list): [traverse(item) for item in child]
                 elif isinstance(child, AST): traverse(child)
     traverse(ast_root); return data_pool
-def compile_source(source_code, module_name, base_path, source_lines_map):
-    source_lines_map[module_name] = source_code.splitlines()
-    lexer = Lexer(source_code); tokens = lexer.tokenize_all(); parser = Parser(tokens); ast = parser.parse()
-    for stmt in ast.statements:
-        if isinstance(stmt, Import): compile_module(stmt.filename_token.value, base_path, source_lines_map)
-    compiler = Compiler(); compiled_function = compiler.compile(ast)
-    compiled_function.chunk.name = module_name; return (compiled_function, ast)
-def compile_module(file_path_str, base_path, source_lines_map):
-    full_path = (base_path / file_path_str).resolve(); full_path_str = str(full_path)
-    if full_path_str in COMPILED_MODULES_CACHE: return COMPILED_MODULES_CACHE[full_path_str]
+def pure_jit_functions(func_nodes):
+    """Names of the JIT FUNCTIONs that write to no element of their parameters and only call builtins or each other."""
+    scanner = MomentumToPythonTranspiler(); accesses = {node.name.lower(): scanner._scan(node.block) for node in func_nodes}
+    params = {node.name.lower(): {p.value.lower() for p in node.params} for node in func_nodes}
+    pure = {name for name, found in accesses.items() if not params[name] & set(found.stores)}
+    while True:
+        callers = {name for name in pure if accesses[name].calls - scanner.pure_calls - pure}
+        if not callers: return pure
+        pure -= callers
+def transpile_jit_functions(ast_root, module_name="<module>"):
+    """Returns ([(func_name, python_source)], [(func_name, error_message)]): a JIT FUNCTION that cannot be transpiled only
+    costs itself the JIT, it keeps running on the VM. With DEBUG_OPTIMIZER set, prints which FOR loops became parallel."""
+    func_nodes = [stmt for stmt in ast_root.statements if isinstance(stmt, FuncDef) and stmt.is_jit]
+    transpiler, sources, errors = MomentumToPythonTranspiler(pure_jit_functions(func_nodes)), [], []
+    for stmt in func_nodes:
+        func_name = stmt.name.lower()
+        try: py_code = transpiler.transpile(stmt)
+        except Exception as e: errors.append((func_name, str(e))); continue
+        params_str = ", ".join(p.value.lower() for p in stmt.params)
+        sources.append((func_name, f"def {func_name}_impl({params_str}):\n{py_code or '    pass'}"))
+        if not DEBUG_OPTIMIZER: continue
+        for line, var, reason, reductions in transpiler.loop_report:
+            if reason: print(t('debug_jit_serial', module=module_name, function=func_name, line=line, var=var, reason=t(reason[0], **reason[1])), file=sys.stderr)
+            else: print(t('debug_jit_parallel', module=module_name, function=func_name, line=line, var=var, reductions=", ".join(reductions) or "-"), file=sys.stderr)
+    return sources, errors
+class JitModule:
+    """The JIT FUNCTIONs of one module, handed to Numba together on the first call of any of them so they can call each other.
+    Numba compiles one specialization per argument type signature as it meets them; the transpiled source is written to
+    __mncache__ under a name derived from its hash, so `cache=True` can keep those machine code specializations across runs."""
+    def __init__(self, sources, cache_dir, registry): self.sources, self.cache_dir, self.registry, self.functions = sources, cache_dir, registry, None
+    def load(self):
+        if self.functions is None:
+            import numba
+            global JIT_COMPILE_ERRORS; JIT_COMPILE_ERRORS = (numba.core.errors.NumbaError, SyntaxError)
+            source = "import math\nimport numba\nimport numpy as np\n\n" + "\n\n".join(src for _, src in self.sources) + "\n"
+            namespace, cached = self._source_namespace(source), True
+            if namespace is None: namespace, cached = {}, False; exec(compile(source, "<jit>", 'exec'), namespace)
+            for name, source in self.sources: # The parallel runtime only pays off for functions with a prange loop
+                namespace[name] = numba.jit(nopython=True, parallel='numba.prange(' in source, cache=cached)(namespace[f"{name}_impl"])
+            self.functions = {name: namespace[name] for name, _ in self.sources}
+            self.registry.update(self.functions) # Later calls go straight to the Numba dispatchers
+        return self.functions
+    def _source_namespace(self, source):
+        # Numba only caches functions defined in a real file; the hash in the name ties its cache entries to this exact source
+        if self.cache_dir is None or os.environ.get('MOMENTUM_DONT_WRITE_BYTECODE'): return None
+        digest = hashlib.sha256(source.encode('utf-8')).hexdigest()[:16]; path = Path(self.cache_dir) / f"jit_{digest}.py"
+        try:
+            if not path.exists():
+                path.parent.mkdir(exist_ok=True); tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+                with open(tmp_path, 'w', encoding='utf-8') as f: f.write(source)
+                os.replace(tmp_path, path)
+        except OSError: return None
+        spec = importlib.util.spec_from_file_location(f"momentum_jit_{digest}", path); module = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = module; spec.loader.exec_module(module); return module.__dict__ # Cached code refers back to it by name
+# Numba's compile-time errors once it is loaded: a JIT FUNCTION raising one of these from its first call with some argument types
+# falls back to its VM version for good (see VM._op_call_jit)
+JIT_COMPILE_ERRORS = ()
+def jit_failure_reason(error):
+    # The first line of a Numba error only names the failed compiler stage, the reason follows it
+    reason = str(error).strip().splitlines() or [type(error).__name__]
+    return reason[1] if len(reason) > 1 and reason[0].startswith('Failed in') else reason[0]
+class JitFunction:
+    """Stands in for a JIT FUNCTION in the VM's jit_functions until its first call compiles it."""
+    __slots__ = ('name', 'module')
+    def __init__(self, name, module): self.name, self.module = name, module
+    def __call__(self, *args): return self.module.load()[self.name](*args)
+def register_jit_functions(chunk, source_path, registry):
+    """Makes the JIT FUNCTIONs of `chunk` callable through `registry`; nothing is imported or compiled until one is called."""
+    if not NUMBA_ENABLED: return
+    for name, error in chunk.jit_errors: print(t('jit_fallback', name=name, e=error), file=sys.stderr)
+    if not chunk.jit_sources: return
+    module = JitModule(chunk.jit_sources, Path(source_path).parent / BYTECODE_CACHE_DIR if source_path else None, registry)
+    for name, _ in chunk.jit_sources: registry[name] = JitFunction(name, module)
+# --- Tiered execution: hot plain FUNCTIONs are compiled to machine code in the background while the VM keeps running them ---
+TIER_ENABLED = NUMBA_ENABLED and not os.environ.get('MOMENTUM_NO_TIER') # Also cleared by --no-tier
+TIER_UP_THRESHOLD = 1000 # Calls plus loop passes on the VM before a function is compiled for the argument types it was last called with
+TIER_ARG_TYPES = (int, float)
+TIER_MAX_DEPTH = 10000 # Nested recursive calls a tiered function makes in machine code before the VM runs the call instead
+def transpile_tier_functions(ast_root, module_name="<module>"):
+    """Returns {id(FuncDef): python_source} for the top-level FUNCTIONs TierTranspiler accepts. With DEBUG_OPTIMIZER set, prints
+    why each of the others stays on the VM."""
+    if not TIER_ENABLED: return {}
+    func_nodes = [stmt for stmt in ast_root.statements if isinstance(stmt, FuncDef) and not stmt.is_jit and not stmt.is_async]
+    # A name defined twice is called through whichever definition ran last, which a recursive call compiled into the other cannot follow
+    defined = Counter(stmt.name.lower() for stmt in ast_root.statements if isinstance(stmt, FuncDef))
+    transpiler, sources = TierTranspiler(), {}
+    for stmt in func_nodes:
+        func_name = stmt.name.lower()
+        try:
+            if defined[func_name] > 1: raise InterpreterError("defined more than once", stmt)
+            transpiler.check(stmt); py_code = transpiler.transpile(stmt)
+        except InterpreterError as e:
+            if DEBUG_OPTIMIZER: print(t('debug_tier_skipped', module=module_name, function=func_name, line=e.line, reason=e.raw_message), file=sys.stderr)
+            continue
+        # Momentum names are lower case, so the extra `_DEPTH` parameter cannot clash with one of the function's
+        sources[id(stmt)] = f"def {func_name}_impl({', '.join([*(p.value.lower() for p in stmt.params), '_DEPTH'])}):\n{py_code}"
+    return sources
+def _widens_integers(compile_result):
+    # Numba gives a variable (or the result) that holds an int on one path and a float on another the type float throughout,
+    # where the VM keeps the int: such a specialization would print 3.0 where the VM prints 3
+    from numba.core import ir, types
+    annotation = compile_result.type_annotation; typemap = annotation.typemap
+    for block in annotation.blocks.values():
+        for stmt in block.find_insts(ir.Assign):
+            value = stmt.value
+            if isinstance(value, ir.Expr) and value.op == 'cast': value = value.value
+            if (isinstance(value, ir.Var) and isinstance(types.unliteral(typemap[value.name]), types.Integer)
+                    and isinstance(typemap[stmt.target.name], types.Float)): return True
+    return False
+class TierState:
+    """Tiering state of one FUNCTION's chunk, advanced by TIER_UP at the function entry and at the top of each loop body.
+    `native` maps a tuple of argument types to the Numba dispatcher compiled for exactly those types; it is replaced, never
+    mutated, by the compile thread, so the VM reads it without locking. Argument types without an entry run on the VM, and
+    if they get hot they are compiled as well. Types that cannot be compiled exactly are remembered in `failed`."""
+    __slots__ = ('name', 'source', 'hotness', 'native', 'failed', 'dispatcher', 'compiling')
+    def __init__(self, name, source): self.name, self.source, self.hotness, self.native, self.failed, self.dispatcher, self.compiling = name, source, 0, {}, set(), None, False
+    def tier_up(self, args):
+        self.hotness = 0; key = tuple(map(type, args))
+        if self.compiling or key in self.failed or key in self.native: return
+        if not all(arg_type in TIER_ARG_TYPES for arg_type in key): self.failed.add(key); return
+        self.compiling = True; threading.Thread(target=self._compile, args=(key, args), daemon=True).start()
+    def _compile(self, key, args):
+        try:
+            import numba
+            if self.dispatcher is None:
+                namespace = {}; exec(compile(TIER_PRELUDE + self.source, f"<tier {self.name}>", 'exec'), namespace)
+                # Recursive calls resolve to the dispatcher itself and stay in machine code
+                self.dispatcher = namespace[self.name] = numba.jit(nopython=True)(namespace[f"{self.name}_impl"])
+            signature = (*(numba.typeof(arg) for arg in args), numba.int64); dispatcher = self.dispatcher # The arguments, then _DEPTH
+            # Compilation stays off between explicit compiles: a float must not be cast into an int specialization on a call
+            dispatcher.disable_compile(False)
+            try: dispatcher.compile(signature)
+            finally: dispatcher.disable_compile()
+            if _widens_integers(dispatcher.overloads[signature]): raise TypeError("mixes integer and float results")
+            self.native = {**self.native, key: dispatcher}
+            if DEBUG_OPTIMIZER: print(t('debug_tier_up', function=self.name, types=", ".join(str(s) for s in signature[:-1])), file=sys.stderr)
+        except Exception as e:
+            self.failed.add(key)
+            if not DEBUG_OPTIMIZER: return
+            reason = str(e).strip().splitlines() or [type(e).__name__]; reason = reason[1] if len(reason) > 1 and reason[0].startswith('Failed in') else reason[0]
+            print(t('debug_tier_failed', function=self.name, types=", ".join(arg_type.__name__ for arg_type in key), e=reason), file=sys.stderr)
+        finally: self.compiling = False
+    def abandon(self, key, reason):
+        # Calls with these argument types stay on the VM from now on
+        self.failed.add(key); self.native = {k: v for k, v in self.native.items() if k != key}
+        if DEBUG_OPTIMIZER: print(t('debug_tier_failed', function=self.name, types=", ".join(arg_type.__name__ for arg_type in key), e=reason), file=sys.stderr)
+
+# --- On-disk bytecode cache (.mnc) ---
+def _serialize_constant(value):
+    if isinstance(value, FunctionObject): return ('f', _serialize_function(value))
+    if isinstance(value, tuple): return ('t', tuple(_serialize_constant(v) for v in value))
+    if isinstance(value, np.ndarray):
+        if value.dtype == object: return ('ao', value.shape, [_serialize_constant(v) for v in value.ravel().tolist()])
+        return ('a', value.dtype.str, value.shape, value.tobytes())
+    return ('v', value)
+def _deserialize_constant(data):
+    tag = data[0]
+    if tag == 'v': return data[1]
+    if tag == 'f': return _deserialize_function(data[1])
+    if tag == 't': return tuple(_deserialize_constant(v) for v in data[1])
+    if tag == 'ao':
+        arr = np.empty(len(data[2]), dtype=object); arr[:] = [_deserialize_constant(v) for v in data[2]]
+        return arr.reshape(data[1])
+    return np.frombuffer(data[3], dtype=np.dtype(data[1])).reshape(data[2]).copy()
+def _serialize_function(function):
+    chunk = function.chunk
+    return (function.name, function.arity, function.is_async, chunk.name, bytes(chunk.code),
+            [_serialize_constant(c) for c in chunk.constants], [tuple(entry) for entry in chunk.lines_rle], tuple(chunk.global_names),
+            [(*handler.positions(), handler.depth, handler.keeps_error) for handler in chunk.exception_table], chunk.tier.source if chunk.tier else None)
+def _deserialize_function(data):
+    name, arity, is_async, chunk_name, code, constants, lines_rle, global_names, exception_table, tier_source = data
+    chunk = Chunk(chunk_name); chunk.code = bytearray(code); chunk.global_names = list(global_names)
+    if tier_source: chunk.tier = TierState(name, tier_source)
+    chunk.exception_table = [ExceptionHandler(*row) for row in exception_table]
+    chunk.constants = [_deserialize_constant(c) for c in constants]; chunk.lines_rle = [list(entry) for entry in lines_rle]
+    return FunctionObject(name, arity, chunk, is_async)
+def _bytecode_cache_key(source_code):
+    hasher = hashlib.sha256(f"{MOMENTUM_VERSION}:{BYTECODE_CACHE_VERSION}:{int(OPTIMIZE_BYTECODE)}:{int(TIER_ENABLED)}:".encode()); hasher.update(source_code.encode('utf-8'))
+    return hasher.digest()
+def bytecode_cache_path(source_path):
+    source_path = Path(source_path); return source_path.parent / BYTECODE_CACHE_DIR / f"{source_path.name}c"
+def load_bytecode_cache(source_path, source_code):
+    try:
+        with open(bytecode_cache_path(source_path), 'rb') as f: blob = f.read()
+    except OSError: return None
+    header_size = len(BYTECODE_CACHE_MAGIC) + 32
+    if blob[:len(BYTECODE_CACHE_MAGIC)] != BYTECODE_CACHE_MAGIC or blob[len(BYTECODE_CACHE_MAGIC):header_size] != _bytecode_cache_key(source_code): return None
+    try: return _module_from_payload(marshal.loads(blob[header_size:]))
+    except (EOFError, ValueError, TypeError): return None
+def _module_payload(function):
+    # A compiled module as plain data: what the .mnc cache stores and what compile workers send back
+    chunk = function.chunk; return (_serialize_function(function), chunk.data_pool, chunk.jit_sources, chunk.jit_errors, chunk.imports)
+def _module_from_payload(payload):
+    function_data, data_pool, jit_sources, jit_errors, imports = payload
+    function = _deserialize_function(function_data); chunk = function.chunk
+    chunk.data_pool, chunk.jit_sources, chunk.jit_errors, chunk.imports = list(data_pool), [tuple(s) for s in jit_sources], [tuple(e) for e in jit_errors], list(imports)
+    return function
+def write_bytecode_cache(source_path, source_code, function):
+    if os.environ.get('MOMENTUM_DONT_WRITE_BYTECODE'): return
+    cache_path = bytecode_cache_path(source_path)
+    try:
+        blob = BYTECODE_CACHE_MAGIC + _bytecode_cache_key(source_code) + marshal.dumps(_module_payload(function))
+        cache_path.parent.mkdir(exist_ok=True)
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f: f.write(blob)
+        os.replace(tmp_path, cache_path)
+    except (OSError, ValueError): pass # The cache is an optimization only; read-only trees just recompile every run
+
+ParsedModule = namedtuple('ParsedModule', 'ast imports data_pool jit_sources jit_errors tier_sources')
+def parse_module(source_code, module_name, compile_imports, propagate_globals=True, with_tier=False):
+    """The front end every engine compiles from: parses the module, passes its IMPORTs to `compile_imports`, collects what is taken
+    from the program as written (DATA, JIT FUNCTION bodies and, `with_tier`, tier sources) and runs the AST optimizer."""
+    ast = Parser(Lexer(source_code).tokenize_all()).parse()
+    imports = [stmt.filename_token.value for stmt in ast.statements if isinstance(stmt, Import)]
+    if compile_imports: compile_imports(imports)
+    # Collected before the optimizer can drop dead branches
+    data_pool = extract_data(ast); jit_sources, jit_errors = transpile_jit_functions(ast, module_name)
+    tier_sources = transpile_tier_functions(ast, module_name) if with_tier else None
+    if OPTIMIZE_BYTECODE:
+        ast_optimizer = ASTOptimizer(propagate_globals=propagate_globals); ast = ast_optimizer.optimize(ast)
+        if DEBUG_OPTIMIZER: print(t('debug_ast_optimizer', module=module_name, **ast_optimizer.stats), file=sys.stderr)
+    return ParsedModule(ast, imports, data_pool, jit_sources, jit_errors, tier_sources)
+def compile_cached_module(cache, compile_file, file_path_str, base_path, source_lines_map):
+    """IMPORT's compile step for every engine: the module in `cache` (a ModuleCache), or its file read and compiled with
+    `compile_file(code, module_name, directory, source_lines_map, path)`."""
+    full_path = (base_path / file_path_str).resolve(); key = str(full_path)
+    # A module already being compiled further up is an import cycle: it lands in the cache before anything can run it
+    compiled = cache.get(key)
+    if compiled is not None or key in MODULES_COMPILING: return compiled
     try:
         with open(full_path, 'r', encoding='utf-8-sig') as f: code = f.read()
     except FileNotFoundError: raise InterpreterError(t('error_import_failed', path=full_path), -1)
-    compiled_function, _ = compile_source(code, Path(file_path_str).name, full_path.parent, source_lines_map)
-    COMPILED_MODULES_CACHE[full_path_str] = compiled_function; return compiled_function
+    track_module_source(key, code); MODULES_COMPILING.add(key)
+    try: compiled = compile_file(code, Path(file_path_str).name, full_path.parent, source_lines_map, full_path)
+    finally: MODULES_COMPILING.discard(key)
+    cache[key] = compiled; return compiled
+def compile_source(source_code, module_name, base_path, source_lines_map, source_path=None, global_names=None, with_imports=True):
+    """Compiles a module. When `source_path` is given the .mnc cache next to it is used and refreshed; `ast` is None on a cache hit.
+    `global_names` lets the REPL keep compiling against the slot table of its live Namespace. Imported modules are compiled too
+    unless `with_imports` is False (compile workers, whose parent loads the whole import graph)."""
+    source_lines_map[module_name] = source_code.splitlines()
+    cached_function = load_bytecode_cache(source_path, source_code) if source_path and not DEBUG_OPTIMIZER else None
+    if cached_function:
+        if with_imports: compile_import_graph(cached_function.chunk.imports, base_path, source_lines_map)
+        return (cached_function, None)
+    compile_imports = (lambda imports: compile_import_graph(imports, base_path, source_lines_map)) if with_imports else None
+    # Global constants are not propagated for the REPL, whose later lines may assign them again
+    module = parse_module(source_code, module_name, compile_imports, propagate_globals=global_names is None, with_tier=True); ast = module.ast
+    compiler = Compiler(global_names=global_names, tier_sources=module.tier_sources); compiled_function = compiler.compile(ast)
+    chunk = compiled_function.chunk; chunk.name = module_name; chunk.imports = module.imports
+    if OPTIMIZE_BYTECODE: optimize_function(compiled_function, module_name)
+    chunk.data_pool, chunk.jit_sources, chunk.jit_errors = module.data_pool, module.jit_sources, module.jit_errors
+    if source_path: write_bytecode_cache(source_path, source_code, compiled_function)
+    return (compiled_function, ast)
+def parse_command_line(argv):
+    """Splits `--flag` / `--flag=value` options from positional arguments and applies the interpreter-wide ones."""
+    global OPTIMIZE_BYTECODE, DEBUG_OPTIMIZER, COMPILE_WORKERS, TIER_ENABLED, ENGINE
+    options, args = {}, []
+    for arg in argv:
+        if arg.startswith('--'): name, _, value = arg[2:].partition('='); options[name] = value or True
+        else: args.append(arg)
+    if 'no-optimize' in options: OPTIMIZE_BYTECODE = False
+    if 'debug-optimizer' in options: DEBUG_OPTIMIZER = True
+    if 'no-tier' in options: TIER_ENABLED = False
+    if 'compile-workers' in options:
+        workers = '' if options['compile-workers'] is True else options['compile-workers'].strip()
+        if not re.fullmatch(r'-?\d+', workers): print(t('error_compile_workers', value=workers), file=sys.stderr); sys.exit(2)
+        COMPILE_WORKERS = max(1, int(workers))
+    if 'engine' in options:
+        if options['engine'] not in ENGINES: print(t('error_unknown_engine', engine=options['engine'], engines=", ".join(ENGINES)), file=sys.stderr); sys.exit(2)
+        ENGINE = options['engine']
+    return options, args
+def compile_module(file_path_str, base_path, source_lines_map):
+    return compile_cached_module(COMPILED_MODULES_CACHE, lambda *source: compile_source(*source)[0], file_path_str, base_path, source_lines_map)
+# --- Import graph loading: a textual scan finds every module up front, then the ones without a valid .mnc compile in parallel ---
+IMPORT_STATEMENT_PATTERN = re.compile(r'(?:^|;)[ \t]*IMPORT[ \t]+(["\'])(.+?)\1', re.IGNORECASE | re.MULTILINE)
+def scan_imports(source_code):
+    # May over-match (an IMPORT inside a string); files that do not exist are skipped, the compiler reports the real ones
+    return [match.group(2) for match in IMPORT_STATEMENT_PATTERN.finditer(source_code)]
+def _compile_module_worker(job):
+    key, module_name, source_code, optimize, debug, tier = job
+    global OPTIMIZE_BYTECODE, DEBUG_OPTIMIZER, TIER_ENABLED
+    OPTIMIZE_BYTECODE, DEBUG_OPTIMIZER, TIER_ENABLED = optimize, debug, tier
+    try: function, _ = compile_source(source_code, module_name, Path(key).parent, {}, key, with_imports=False)
+    except MomentumError: return None # The parent compiles it again to report the error against its own source_lines_map
+    return _module_payload(function)
+def compile_import_graph(import_names, base_path, source_lines_map):
+    """Compiles every module reachable from `import_names` (relative to `base_path`) into COMPILED_MODULES_CACHE."""
+    pending, found = [(name, base_path) for name in import_names], {}
+    while pending:
+        name, parent = pending.pop(); path = (parent / name).resolve(); key = str(path)
+        if key in found or key in COMPILED_MODULES_CACHE or key in MODULES_COMPILING: continue
+        try:
+            with open(path, 'r', encoding='utf-8-sig') as f: found[key] = f.read()
+        except (OSError, UnicodeDecodeError): continue
+        track_module_source(key, found[key]); pending.extend((imported, path.parent) for imported in scan_imports(found[key]))
+    stale = []
+    for key, source_code in found.items():
+        function = load_bytecode_cache(key, source_code) if not DEBUG_OPTIMIZER else None
+        if function: COMPILED_MODULES_CACHE[key] = function; source_lines_map[Path(key).name] = source_code.splitlines()
+        else: stale.append(key)
+    workers = min(COMPILE_WORKERS, len(stale))
+    if workers > 1 and len(stale) >= PARALLEL_COMPILE_MIN_MODULES:
+        jobs = [(key, Path(key).name, found[key], OPTIMIZE_BYTECODE, DEBUG_OPTIMIZER, TIER_ENABLED) for key in stale]
+        with ProcessPoolExecutor(workers) as pool:
+            for key, payload in zip(stale, pool.map(_compile_module_worker, jobs)):
+                if payload is not None: COMPILED_MODULES_CACHE[key] = _module_from_payload(payload); source_lines_map[Path(key).name] = found[key].splitlines()
+    # Serial path: small graphs, modules that failed in a worker (to raise their error here) and any IMPORT the scan did not see
+    for key in found:
+        for imported in compile_module(Path(key).name, Path(key).parent, source_lines_map).chunk.imports: compile_module(imported, Path(key).parent, source_lines_map)
+    for name in import_names: compile_module(name, base_path, source_lines_map)
+# --- Hot reload: source records are checked against the disk and whatever an edit made stale is dropped ---
+def track_module_source(key, source_code):
+    try: mtime = os.stat(key).st_mtime_ns
+    except OSError: return
+    imports = tuple(str((Path(key).parent / name).resolve()) for name in scan_imports(source_code))
+    MODULE_SOURCES[key] = ModuleSource(mtime, hashlib.sha256(source_code.encode('utf-8')).digest(), imports)
+def invalidate_changed_modules():
+    """Drops every module whose file changed since it was read, and the loaded instances of everything importing it.
+
+    Only the edited files are recompiled (on their next IMPORT); modules that import them keep their bytecode, since names
+    bind at run time, and are just executed again so they see the new definitions. Returns the changed paths."""
+    changed = []
+    for key, record in list(MODULE_SOURCES.items()):
+        try: mtime = os.stat(key).st_mtime_ns
+        except OSError: changed.append(key); continue
+        if mtime == record.mtime: continue
+        try:
+            with open(key, 'r', encoding='utf-8-sig') as f: digest = hashlib.sha256(f.read().encode('utf-8')).digest()
+        except (OSError, UnicodeDecodeError): digest = None
+        if digest == record.digest: MODULE_SOURCES[key] = record._replace(mtime=mtime) # Touched but not edited
+        else: changed.append(key)
+    stale, pending = set(), list(changed)
+    while pending:
+        key = pending.pop()
+        if key in stale: continue
+        stale.add(key); pending.extend(importer for importer, record in MODULE_SOURCES.items() if key in record.imports)
+    for key in changed: COMPILED_MODULES_CACHE.pop(key, None); PY_COMPILED_MODULES.pop(key, None); REG_COMPILED_MODULES.pop(key, None); MODULE_SOURCES.pop(key, None)
+    for key in stale: LOADED_MODULES.pop(key, None)
+    return changed
+# --- --engine=py runtime: helpers the generated code calls, the module instances it runs in and the errors it reports ---
+ENGINES = ('vm', 'py', 'reg')
+ENGINE = 'vm' # Set by --engine
+PY_RECURSION_LIMIT = 100000 # Python frames are the only call stack on --engine=py: raised for deep (non-tail) Momentum recursion
+PY_STACK_BYTES = 128 << 20 # C stack the main thread may grow to, which recursion through coroutines (FUNCTIONs that await) uses
+PyCompiledModule = namedtuple('PyCompiledModule', 'name code names data_pool jit_sources jit_errors imports')
+PY_COMPILED_MODULES = ModuleCache(MODULE_CACHE_LIMIT) # Resolved path -> PyCompiledModule; dropped by invalidate_changed_modules like COMPILED_MODULES_CACHE
+class PyEngineError(InterpreterError):
+    """Raised by THROW and the runtime helpers on --engine=py. The message is final; the line comes from the traceback."""
+    def __init__(self, message): super().__init__(message, None)
+def py_add(a, b):
+    # `+` with the VM's semantics (see VM._execute_binary_op), for operands the transpiler cannot prove are not strings
+    if type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES: return a + b
+    try:
+        if isinstance(a, np.ndarray) or isinstance(b, np.ndarray): return a + b
+        if isinstance(a, str) or isinstance(b, str): return str(a) + str(b)
+        if isinstance(a, dict) or isinstance(b, dict): raise TypeError()
+        return a + b
+    except TypeError: raise PyEngineError(t('rt_err_type_error_op', op='add', type_a=builtin_type(a).upper(), type_b=builtin_type(b).upper())) from None
+def py_for_range(value, limit, step):
+    # The values FOR_PREP/FOR_STEP give the counter: a range when they are all integers, which is what nearly every loop has
+    if type(value) is int and type(step) is int and step and (type(limit) is int or (type(limit) is float and math.isfinite(limit))):
+        return range(value, math.floor(limit) + 1, step) if step > 0 else range(value, math.ceil(limit) - 1, step)
+    return py_for_values(value, limit, step)
+def py_for_values(value, limit, step):
+    if step > 0:
+        while value <= limit: yield value; value = py_add(value, step)
+    else:
+        while value >= limit: yield value; value = py_add(value, step)
+def py_iter(container):
+    if isinstance(container, dict): return tuple(container)
+    try: return iter(container)
+    except TypeError: raise PyEngineError(t('rt_err_not_iterable', type_name=builtin_type(container))) from None
+def py_switch_unhashable(subject):
+    if isinstance(subject, np.ndarray): raise PyEngineError(t('rt_err_unsupported_op_matrix', op_name='eq'))
+    return 0
+def py_dim(*sizes): return np.zeros(tuple(int(size) for size in sizes))
+async def py_await(value): return await value if asyncio.iscoroutine(value) else value
+def py_async_function(name):
+    def call(*args): raise PyEngineError(t('rt_err_cannot_call_async', name=name))
+    return call
+def py_reversed_dict(*pairs):
+    # `pairs` were evaluated last to first, like BUILD_DICT's operands; the dict itself is built first to last
+    result = {}
+    for key, value in reversed(pairs): result[key] = value
+    return result
+class PyJitFunction:
+    """A JIT FUNCTION on --engine=py: calls its Numba version through JIT_FUNCTIONS, or the transpiled Python one once Numba
+    cannot compile it (like CALL_JIT)."""
+    __slots__ = ('name', 'fallback')
+    def __init__(self, name, fallback): self.name, self.fallback = name, fallback
+    def __call__(self, *args):
+        function = JIT_FUNCTIONS.get(self.name)
+        if function is not None:
+            try: return function(*args)
+            except JIT_COMPILE_ERRORS as e: print(t('jit_fallback', name=self.name, e=jit_failure_reason(e)), file=sys.stderr); JIT_FUNCTIONS.pop(self.name, None)
+        return self.fallback(*args)
+PY_RUNTIME = {'_add': py_add, '_for_range': py_for_range, '_iter': py_iter, '_switch_unhashable': py_switch_unhashable, '_dim': py_dim,
+              '_await': py_await, '_async_function': py_async_function, '_reversed_dict': py_reversed_dict, '_jit': PyJitFunction,
+              '_coroutine': types.CoroutineType, '_create_task': asyncio.create_task, '_debug': debug_print, '_Error': PyEngineError, '_np': np}
+# Errors raised inside these are the operation failing, as they would in an opcode, rather than a builtin failing
+PY_RUNTIME_CODES = frozenset(f.__code__ for f in (py_add, py_for_range, py_for_values, py_iter, py_dim, py_reversed_dict))
+PY_CALL_OPCODES = frozenset(dis.opmap[name] for name in ('CALL', 'PRECALL', 'CALL_FUNCTION_EX') if name in dis.opmap)
+# Python's wording of the TypeErrors that the VM reports as rt_err_type_error_op, rt_err_func_arity_mismatch and rt_err_cannot_call_type
+PY_OPERAND_ERROR = re.compile(r"(?:unsupported operand type\(s\) for (\S+): |'(\S+)' not supported between instances of )'([\w.]+)' and '([\w.]+)'")
+PY_OPERATOR_NAMES = {'+': 'add', '-': 'sub', '*': 'mul', '/': 'truediv', '<': 'lt', '<=': 'le', '>': 'gt', '>=': 'ge'}
+PY_TYPE_NAMES = {'int': 'INTEGER', 'float': 'FLOAT', 'str': 'STRING', 'dict': 'DICTIONARY', 'tuple': 'TUPLE', 'NoneType': 'NONE',
+                 'numpy.ndarray': 'ARRAY', 'function': 'FUNCTION'}
+PY_INDEX_ERROR = re.compile(r"index (-?\d+) is out of bounds")
+PY_ARITY_ERROR = re.compile(r"m_(\w+)\(\) (?:takes (\d+) positional arguments? but (\d+) (?:was|were) given|missing (\d+) required positional arguments?)")
+PY_NOT_CALLABLE_ERROR = re.compile(r"'([\w.]+)' object is not callable")
+def _generated_frame(tb): return isinstance(tb.tb_frame.f_globals.get('_rt'), PyModule)
+def py_error_message(error):
+    """The message the VM would give `error` (the CATCH variable, or the reported error): raised in a builtin, it is the builtin's
+    own message (see VM._builtin_failed); raised by an operation of the generated code, the opcode's runtime error message."""
+    if isinstance(error, PyEngineError): return error.raw_message
+    tb = error.__traceback__
+    while tb is not None and tb.tb_next is not None: tb = tb.tb_next
+    generated, message = tb is not None and _generated_frame(tb), str(error)
+    if not generated and not (tb is not None and tb.tb_frame.f_code in PY_RUNTIME_CODES): return message
+    # Only `m_` names are Momentum variables; any other missing name is the generated code's own and is reported as it is
+    if generated and isinstance(error, NameError) and error.name and error.name.startswith('m_'): return t('rt_err_var_not_found', name=error.name[2:])
+    if generated and tb.tb_frame.f_code.co_code[tb.tb_lasti] in PY_CALL_OPCODES:
+        if isinstance(error, TypeError) and (match := PY_ARITY_ERROR.match(message)):
+            name, expected, received, missing = match.groups(); function = tb.tb_frame.f_globals.get(f"m_{name}")
+            if missing and isinstance(function, types.FunctionType): expected = function.__code__.co_argcount; received = expected - int(missing)
+            if expected is not None: return t('rt_err_func_arity_mismatch', name=name, expected=expected, received=received)
+        if isinstance(error, TypeError) and (match := PY_NOT_CALLABLE_ERROR.fullmatch(message)):
+            # Python gives just the name of a class defined in Python code (a Namespace, say); the VM formats the class itself
+            value_type = globals().get(match.group(1))
+            return t('rt_err_cannot_call_type', type_name=value_type if isinstance(value_type, type) else f"<class '{match.group(1)}'>")
+        return message
+    if isinstance(error, TypeError) and (match := PY_OPERAND_ERROR.match(message)):
+        symbol, type_a, type_b = match.group(1) or match.group(2), *match.group(3, 4)
+        if symbol in PY_OPERATOR_NAMES and type_a in PY_TYPE_NAMES and type_b in PY_TYPE_NAMES:
+            return t('rt_err_type_error_op', op=PY_OPERATOR_NAMES[symbol], type_a=PY_TYPE_NAMES[type_a], type_b=PY_TYPE_NAMES[type_b])
+    if isinstance(error, KeyError): return t('rt_err_key_not_found', index=error.args[0] if error.args else '')
+    if isinstance(error, IndexError) and (match := PY_INDEX_ERROR.match(message)): return t('rt_err_key_not_found', index=match.group(1))
+    return t('rt_err_python_exception', type_name=type(error).__name__, error=error)
+PY_RUNTIME['_error_message'] = py_error_message
+def py_runtime_error(error):
+    """The InterpreterError to report for `error` escaping generated code: its line and stack trace (innermost first) come from the
+    generated frames of the traceback. Errors no Momentum code was running for are returned as they are."""
+    stack_trace, tb = [], error.__traceback__
+    while tb is not None:
+        if _generated_frame(tb):
+            name = tb.tb_frame.f_code.co_name
+            stack_trace.append({"file": tb.tb_frame.f_globals['_rt'].name, "line": tb.tb_lineno, "context": f"function {name[2:]}" if name.startswith('m_') else "<script>"})
+        tb = tb.tb_next
+    if not stack_trace: return error
+    stack_trace.reverse(); return InterpreterError(py_error_message(error), stack_trace[0]['line'], stack_trace)
+def compile_python_source(source_code, module_name, base_path, source_lines_map, source_path=None):
+    """Transpiles a module for --engine=py (see ModuleTranspiler) into a PyCompiledModule. Its imports are compiled up front, as
+    compile_source does, so a syntax error anywhere in the program is reported before anything runs."""
+    source_lines_map[module_name] = source_code.splitlines()
+    module = parse_module(source_code, module_name, lambda imports: [compile_python_module(name, base_path, source_lines_map) for name in imports])
+    transpiler = ModuleTranspiler(); python_source, line_map = transpiler.transpile(module.ast)
+    # Every node takes the .mn line of the generated line it starts on, so tracebacks and co_lines point into the Momentum source
+    tree = python_ast.parse(python_source)
+    for node in python_ast.walk(tree):
+        if 'lineno' in node._attributes:
+            node.lineno = line_map[node.lineno - 1]; node.end_lineno = max(node.lineno, line_map[node.end_lineno - 1])
+            node.col_offset = node.end_col_offset = 0
+    code = compile(tree, str(source_path or module_name), 'exec')
+    return PyCompiledModule(module_name, code, sorted(transpiler.global_names), module.data_pool, module.jit_sources, module.jit_errors, module.imports)
+def compile_python_module(file_path_str, base_path, source_lines_map):
+    return compile_cached_module(PY_COMPILED_MODULES, compile_python_source, file_path_str, base_path, source_lines_map)
+def _allow_deep_recursion():
+    try:
+        import resource # Not on Windows, where the stack size is fixed when the executable is built
+        soft, hard = resource.getrlimit(resource.RLIMIT_STACK)
+        if soft != resource.RLIM_INFINITY and soft < PY_STACK_BYTES:
+            resource.setrlimit(resource.RLIMIT_STACK, (PY_STACK_BYTES if hard == resource.RLIM_INFINITY else min(hard, PY_STACK_BYTES), hard))
+    except (ImportError, ValueError, OSError): pass
+    sys.setrecursionlimit(PY_RECURSION_LIMIT)
+class PyModule:
+    """One executed instance of a module on --engine=py. `globals` is the namespace its code runs in (the runtime helpers, the builtins
+    as `_b_<name>` and the module's own globals); as a LOADED_MODULES entry it answers the lookups of IMPORT like a Namespace."""
+    def __init__(self, compiled, base_path):
+        self.compiled, self.name, self.base_path, self.data_ptr, self.imports = compiled, compiled.name, base_path, 0, []
+        self.globals = {**PY_RUNTIME, '_rt': self, **{py_builtin_name(name): function for name, function in BUILTIN_FUNCTIONS.items()}}
+    async def run(self):
+        if sys.getrecursionlimit() < PY_RECURSION_LIMIT: _allow_deep_recursion()
+        exec(self.compiled.code, self.globals); return await self.globals['_script']()
+    def read(self):
+        data_pool = self.compiled.data_pool
+        if self.data_ptr >= len(data_pool): raise PyEngineError(t('error_out_of_data'))
+        self.data_ptr += 1; return data_pool[self.data_ptr - 1]
+    def restore(self): self.data_ptr = 0
+    async def import_module(self, module_name):
+        path = (self.base_path / module_name).resolve(); key = str(path); module = LOADED_MODULES.get(key)
+        if module is None:
+            # Registered before it runs, so an import cycle binds the partly initialized module instead of running it again
+            compiled = compile_python_module(module_name, self.base_path, {})
+            module = LOADED_MODULES[key] = PyModule(compiled, path.parent); register_jit_functions(compiled, path, JIT_FUNCTIONS)
+            try: await module.run()
+            except BaseException: del LOADED_MODULES[key]; raise
+        self.bind(module)
+    def lookup(self, name):
+        pending, seen = [self], set()
+        while pending:
+            module = pending.pop()
+            if id(module) in seen: continue
+            seen.add(id(module)); value = module.globals.get(py_global_name(name), _UNDEFINED)
+            if value is not _UNDEFINED: return value
+            pending.extend(module.imports)
+        return _UNDEFINED
+    def bind(self, module):
+        if all(imported is not module for imported in self.imports): self.imports.append(module)
+        for name in self.compiled.names:
+            value = module.lookup(name)
+            if value is not _UNDEFINED: self.globals[py_global_name(name)] = value
+    def get(self, name, default=None):
+        value = self.globals.get(py_global_name(name), _UNDEFINED); return default if value is _UNDEFINED else value
+    def items(self): return [(name, self.globals[py_global_name(name)]) for name in self.compiled.names if py_global_name(name) in self.globals]
+async def run_python_engine(entry_file_path):
+    """run_momentum for --engine=py: the program is transpiled to Python and runs without the VM."""
+    base_path = Path(entry_file_path).parent; source_lines_map = {}; main_file_name = Path(entry_file_path).name
+    try:
+        main_code = read_entry_source(entry_file_path)
+        track_module_source(str(Path(entry_file_path).resolve()), main_code)
+        compiled = compile_python_source(main_code, main_file_name, base_path, source_lines_map, Path(entry_file_path).resolve())
+    except Exception as e: # Syntax errors, and failures of the compiler itself, which would otherwise end the run unreported
+        format_momentum_error(e, source_lines_map.get(main_file_name))
+        raise
+    register_jit_functions(compiled, entry_file_path, JIT_FUNCTIONS)
+    try: await PyModule(compiled, base_path).run()
+    except Exception as e:
+        error = py_runtime_error(e)
+        error_file = error.stack_trace[0]['file'] if isinstance(error, InterpreterError) and error.stack_trace else main_file_name
+        format_momentum_error(error, source_lines_map.get(error_file, []))
+        if error is e: raise
+        raise error from e
+# --- --engine=reg: the same program compiled for RegisterVM; no tiering and no .mnc cache ---
+REG_COMPILED_MODULES = ModuleCache(MODULE_CACHE_LIMIT) # Resolved path -> the module's register-compiled <script> function
+def compile_register_source(source_code, module_name, base_path, source_lines_map, source_path=None):
+    """compile_source for --engine=reg: the module and everything it imports go through RegisterCompiler."""
+    source_lines_map[module_name] = source_code.splitlines()
+    module = parse_module(source_code, module_name, lambda imports: [compile_register_module(name, base_path, source_lines_map) for name in imports])
+    compiled_function = RegisterCompiler().compile(module.ast); chunk = compiled_function.chunk
+    chunk.name, chunk.imports, chunk.data_pool, chunk.jit_sources, chunk.jit_errors = module_name, module.imports, module.data_pool, module.jit_sources, module.jit_errors
+    return compiled_function
+def compile_register_module(file_path_str, base_path, source_lines_map):
+    return compile_cached_module(REG_COMPILED_MODULES, compile_register_source, file_path_str, base_path, source_lines_map)
+def read_entry_source(entry_file_path):
+    # The entry file exists when the program starts, but --watch runs it again after it may have been deleted
+    try:
+        with open(entry_file_path, 'r', encoding='utf-8-sig') as f: return f.read()
+    except FileNotFoundError: raise InterpreterError(t('error_file_not_found', filename=entry_file_path), -1) from None
 async def run_momentum(entry_file_path):
+    if ENGINE == 'py': return await run_python_engine(entry_file_path)
     base_path = Path(entry_file_path).parent; source_lines_map = {}
     main_file_name = Path(entry_file_path).name
     try:
-        with open(entry_file_path, 'r', encoding='utf-8-sig') as f: main_code = f.read()
-        main_function, ast_for_data = compile_source(main_code, main_file_name, base_path, source_lines_map)
-    except MomentumError as e:
+        main_code = read_entry_source(entry_file_path)
+        track_module_source(str(Path(entry_file_path).resolve()), main_code)
+        if ENGINE == 'reg': main_function = compile_register_source(main_code, main_file_name, base_path, source_lines_map)
+        else: main_function, _ = compile_source(main_code, main_file_name, base_path, source_lines_map, Path(entry_file_path).resolve())
+    except Exception as e: # Syntax errors, and failures of the compiler itself, which would otherwise end the run unreported
         format_momentum_error(e, source_lines_map.get(main_file_name))
         raise
 
-    data_pool = extract_data(ast_for_data)
-    if NUMBA_ENABLED:
-        try:
-            transpiler = MomentumToPythonTranspiler(); jit_namespace = {'numba': numba, 'math': math}
-            for stmt in ast_for_data.statements:
-                if isinstance(stmt, FuncDef) and stmt.is_jit:
-                    func_name = stmt.name.lower(); py_code = transpiler.transpile(stmt)
-                    params_str = ", ".join(p.value.lower() for p in stmt.params)
-                    full_src = f"def {func_name}_impl({params_str}):\n{py_code or '    pass'}"
-                    exec(full_src, jit_namespace); py_func = jit_namespace[f"{func_name}_impl"]
-                    jitted_func = numba.jit(nopython=True, parallel=True)(py_func)
-                    JIT_FUNCTIONS[func_name] = jitted_func; jit_namespace[func_name] = jitted_func
-        except Exception as e: print(t('error_jit_failed', e=e), file=sys.stderr); JIT_FUNCTIONS.clear()
-    
-    vm = VM(JIT_FUNCTIONS, data_pool, COMPILED_MODULES_CACHE, base_path)
+    data_pool = main_function.chunk.data_pool; register_jit_functions(main_function.chunk, entry_file_path, JIT_FUNCTIONS)
+    if ENGINE == 'reg': vm = RegisterVM(JIT_FUNCTIONS, data_pool, REG_COMPILED_MODULES, base_path)
+    else: vm = VM(JIT_FUNCTIONS, data_pool, COMPILED_MODULES_CACHE, base_path)
     try:
         await vm.run(main_function)
     except InterpreterError as e:
@@ -1426,11 +4252,24 @@ async def run_momentum(entry_file_path):
         format_momentum_error(e, [])
         raise
 
+async def run_watch(entry_file_path):
+    """Runs `entry_file_path`, then runs it again each time it or a module it imports is edited, until Ctrl+C."""
+    entry = str(Path(entry_file_path).resolve())
+    while True:
+        print(t('running_header', filename=entry_file_path))
+        try: await run_momentum(entry_file_path); print(t('run_success'))
+        except MomentumExit: pass
+        except Exception: pass # run_momentum has already reported it
+        print(t('watch_waiting'))
+        # A deleted entry file has no source record any more: it is run again as soon as it is back
+        while not (changed := invalidate_changed_modules() or ([entry] if entry not in MODULE_SOURCES and os.path.exists(entry) else [])):
+            await asyncio.sleep(WATCH_INTERVAL)
+        print(t('watch_reloading', files=', '.join(Path(key).name for key in changed)))
 async def run_repl():
     print(t('repl_welcome'))
-    vm = VM(JIT_FUNCTIONS, [], {}, Path.cwd())
+    vm = VM(JIT_FUNCTIONS, [], COMPILED_MODULES_CACHE, Path.cwd())
     source_lines_map = {}
-    shared_globals = {} 
+    namespace = Namespace()
 
     while True:
         try:
@@ -1442,20 +4281,19 @@ async def run_repl():
 
             vm.frames.clear()
             vm.stack.clear()
-            vm.try_stack.clear()
-            vm.globals = shared_globals
+            invalidate_changed_modules() # The next IMPORT of an edited module picks up the new version
 
-            func, ast = compile_source(line, "<stdin>", Path.cwd(), source_lines_map)
+            func, ast = compile_source(line, "<stdin>", Path.cwd(), source_lines_map, global_names=namespace.names)
+            register_jit_functions(func.chunk, None, vm.jit_functions)
             
             is_expression_statement = False
             if ast and len(ast.statements) == 1:
                 stmt = ast.statements[0]
                 # Check against a broader set of statement types
-                if not isinstance(stmt, (Print, Assign, If, While, For, ForEach, FuncDef, Return, Dim, Read, Restore, Import, Break, Continue, Try, Switch, Debug, Declare)):
+                if not isinstance(stmt, (Print, Assign, If, While, For, ForEach, FuncDef, Return, Dim, Read, Restore, Import, Break, Continue, Try, Throw, Switch, Debug, Declare)):
                     is_expression_statement = True
 
-            result = await vm.run(func)
-            shared_globals = vm.globals
+            result = await vm.run(func, namespace)
 
             if is_expression_statement and result is not None:
                 if colorama_enabled:
@@ -1478,7 +4316,7 @@ def builtin_type(value):
     if isinstance(value, str): return "STRING";
     if isinstance(value, np.ndarray): return "ARRAY";
     if isinstance(value, dict): return "DICTIONARY";
-    if isinstance(value, FunctionObject): return "FUNCTION";
+    if isinstance(value, (FunctionObject, types.FunctionType, PyJitFunction)): return "FUNCTION";
     if isinstance(value, tuple): return "TUPLE";
     if value is None: return "NONE" # Handle None type
     return str(type(value))
@@ -1566,6 +4404,96 @@ def builtin_mat_eig(matrix):
 def builtin_mat_mul(A, B): return np.dot(_ensure_array(A, "mat_mul A"), _ensure_array(B, "mat_mul B"))
 def builtin_rows(matrix): return matrix.shape[0] if isinstance(matrix, np.ndarray) and matrix.ndim > 0 else 0
 def builtin_cols(matrix): return matrix.shape[1] if isinstance(matrix, np.ndarray) and matrix.ndim > 1 else 0
+# --- Kernels of FOR loops vectorized by LoopVectorizer: run by `$vector_loop`, which returns 0 (and changes nothing) whenever
+# a kernel raises, so that the loop runs on the VM instead ---
+VECTOR_EXACT_LIMIT = 2 ** 53 # Python ints below this convert to float64 exactly, and products of two of them fit in an int64
+VECTOR_INT64_LIMIT = 2.0 ** 62 # An int64 result whose float64 estimate is below this did not wrap around
+VECTOR_OPERATORS = {'+': operator.add, '-': operator.sub, '*': operator.mul}
+VECTOR_DTYPES = (np.dtype(np.float64), np.dtype(np.int64))
+class VectorFallback(Exception): pass
+def vector_slice(start, limit, step):
+    # The indexes the FOR visits, or None when there are none
+    if type(start) is not int or type(limit) not in NUMBER_TYPES or not math.isfinite(limit): raise VectorFallback()
+    last = math.floor(limit)
+    if last < start: return None
+    return slice(start, last - (last - start) % step + 1, step)
+def vector_arrays(arrays, written, indexes):
+    for array in arrays:
+        if type(array) is not np.ndarray or array.ndim != 1 or array.dtype not in VECTOR_DTYPES or indexes.start < 0 or indexes.stop > len(array): raise VectorFallback()
+    for k in written:
+        # Element by element, a store could be seen by a later read of another array sharing its memory
+        array = arrays[k]
+        if array.dtype != np.float64 or not array.flags.writeable: raise VectorFallback()
+        if any(j != k and np.may_share_memory(array, other) for j, other in enumerate(arrays)): raise VectorFallback()
+def vector_numbers(*values):
+    for value in values:
+        if type(value) not in NUMBER_TYPES or type(value) is int and not abs(value) < VECTOR_EXACT_LIMIT: raise VectorFallback()
+def vector_exact(value, floats=False):
+    # A value the VM holds as Python numbers: integers (and with `floats`, anything) must stay where float64 represents them exactly
+    if isinstance(value, np.ndarray):
+        if (floats or value.dtype.kind == 'i') and value.size and not np.nanmax(np.abs(value)) < VECTOR_EXACT_LIMIT: raise VectorFallback()
+    elif (floats or type(value) is int) and not abs(value) < VECTOR_EXACT_LIMIT: raise VectorFallback()
+    return value
+def vector_magnitude(value):
+    # Largest absolute value of an integer operand, or None for floats
+    if isinstance(value, np.ndarray): return int(np.abs(value).max()) if value.dtype.kind == 'i' and value.size else None
+    return abs(value) if type(value) is int else None
+def vector_product(a, b):
+    a_size, b_size = vector_magnitude(a), vector_magnitude(b)
+    # int64 wraps where the VM's Python ints grow: both integer operands are bounded first
+    if a_size is not None and b_size is not None and not a_size * b_size < VECTOR_EXACT_LIMIT: raise VectorFallback()
+    return vector_exact(a * b)
+def vector_integer(a, op, b):
+    # int64 arrays wrap around without the warning the VM's NumPy scalars give: recomputed in float64, a result out of range declines
+    result = VECTOR_OPERATORS[op](a, b)
+    if result.dtype.kind == 'i' and result.size:
+        estimate = VECTOR_OPERATORS[op](np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64))
+        if not np.abs(estimate).max() < VECTOR_INT64_LIMIT: raise VectorFallback()
+    return result
+def vector_negate(value, function):
+    # -x and abs(x) only wrap around for the smallest int64
+    if value.dtype.kind == 'i' and value.size and value.min() == np.iinfo(np.int64).min: raise VectorFallback()
+    return function(value)
+def vector_divide(a, b):
+    # Python numbers raise ZeroDivisionError where NumPy gives inf
+    if np.any(np.asarray(b) == 0): raise VectorFallback()
+    return a / b
+def vector_sqrt(value):
+    if np.any(np.asarray(value) < 0): raise VectorFallback() # math.sqrt raises
+    return np.sqrt(value)
+def vector_select(values, mask, count):
+    values = np.broadcast_to(values, (count,))
+    return values if mask is None else values[np.broadcast_to(mask, (count,))]
+def vector_sum(total, values):
+    if type(total) not in NUMBER_TYPES: raise VectorFallback()
+    if not len(values): return total
+    # Accumulated left to right rather than by np.sum's pairwise sum, so the result is rounded exactly like the loop's
+    terms = np.concatenate(([total], values)); sums = np.add.accumulate(terms)
+    if sums.dtype.kind == 'i' and not np.abs(np.add.accumulate(terms.astype(np.float64))).max() < VECTOR_INT64_LIMIT: raise VectorFallback()
+    return sums[-1]
+def vector_max(result, values):
+    if type(result) not in NUMBER_TYPES or values.dtype.kind == 'f' and np.isnan(values).any(): raise VectorFallback()
+    if len(values) and (largest := values.max()) > result: return largest
+    return result
+def vector_min(result, values):
+    if type(result) not in NUMBER_TYPES or values.dtype.kind == 'f' and np.isnan(values).any(): raise VectorFallback()
+    if len(values) and (smallest := values.min()) < result: return smallest
+    return result
+VECTOR_RUNTIME = {'_np': np, '_slice': vector_slice, '_arrays': vector_arrays, '_numbers': vector_numbers, '_exact': vector_exact,
+                  '_integer': vector_integer, '_negate': vector_negate, '_product': vector_product, '_divide': vector_divide, '_sqrt': vector_sqrt, '_select': vector_select, '_sum': vector_sum,
+                  '_max': vector_max, '_min': vector_min}
+VECTOR_KERNELS, VECTOR_RESULTS = {}, []
+def builtin_vector_loop(source, start, limit, *values):
+    kernel = VECTOR_KERNELS.get(source)
+    if kernel is None:
+        namespace = dict(VECTOR_RUNTIME); exec(source, namespace); kernel = VECTOR_KERNELS[source] = namespace['kernel']
+    try:
+        # Where the VM's NumPy scalars would warn (overflow, an invalid result, division by zero) the kernel declines, and the loop
+        # gives the warnings itself. That includes masked-out elements the loop never computes, which only costs the speedup
+        with np.errstate(all='raise', under='ignore'): results = kernel(start, limit, *values)
+    except Exception: return 0 # Stores only happen at the end, so nothing has changed yet
+    VECTOR_RESULTS[:] = results; return 1
+def builtin_vector_result(index): return VECTOR_RESULTS[index]
 class Let(AST): pass 
 
 BUILTIN_FUNCTIONS = {
@@ -1585,16 +4513,25 @@ BUILTIN_FUNCTIONS = {
     'json_parse': builtin_json_parse, 'json_stringify': builtin_json_stringify, 'exit': builtin_exit, 'assert': builtin_assert,
     'gfx_init': gfx_init, 'gfx_set_color': gfx_set_color, 'gfx_draw_line': gfx_draw_line, 
     'gfx_draw_rect': gfx_draw_rect, 'gfx_draw_circle': gfx_draw_circle, 'gfx_update': gfx_update, 'gfx_wait': gfx_wait,
+    # Only called by code ASTOptimizer generates: '$' cannot appear in a Momentum identifier
+    '$vector_loop': builtin_vector_loop, '$vector_result': builtin_vector_result,
 }
 ASYNC_BUILTIN_FUNCTIONS = {'sleep': builtin_sleep}
 BUILTIN_FUNCTIONS.update(ASYNC_BUILTIN_FUNCTIONS)
+# Builtins without side effects whose result depends only on their arguments: folded by ASTOptimizer when every argument is a literal
+PURE_BUILTINS = frozenset(('str', 'int', 'float', 'len', 'abs', 'round', 'type', 'is_int', 'is_float', 'is_string', 'is_array', 'is_dict',
+                           'upper', 'lower', 'trim', 'replace', 'sqrt', 'sin', 'cos'))
 
 if __name__ == "__main__":
-    exit_code = 0
-    if len(sys.argv) > 1:
-        filename = sys.argv[1]
+    exit_code = 0; options, args = parse_command_line(sys.argv[1:])
+    if args:
+        filename = args[0]
         if not os.path.exists(filename):
             print(t('error_file_not_found', filename=filename), file=sys.stderr); sys.exit(1)
+        if 'watch' in options:
+            try: asyncio.run(run_watch(filename))
+            except KeyboardInterrupt: pass
+            sys.exit(0)
         print(t('running_header', filename=filename))
         try:
             asyncio.run(run_momentum(filename))
@@ -1,6 +1,7 @@
 import sys
 import os
 import asyncio
+import multiprocessing
 
 try:
     import colorama
@@ -10,7 +11,7 @@ except ImportError:
     colorama_enabled = False
 
 # Import ฟังก์ชันและตัวแปรที่จำเป็นจาก intp.py
-from intp import run_momentum, run_repl, MomentumError, MomentumExit, GFX_GLOBALS, gfx_wait
+from intp import run_momentum, run_watch, run_repl, parse_command_line, MomentumError, MomentumExit, GFX_GLOBALS, gfx_wait
 
 # โลโก้ ASCII Art ของ Momentum
 MOMENTUM_LOGO = r"""
@@ -31,10 +32,12 @@ def main():
         init(autoreset=True)
 
     exit_code = 0
+    # แยกตัวเลือก (--no-optimize, --debug-optimizer, --compile-workers, --no-tier, --watch, --engine) ออกจากชื่อไฟล์
+    options, args = parse_command_line(sys.argv[1:])
     try:
-        if len(sys.argv) > 1:
+        if args:
             # --- โหมดรันไฟล์ ---
-            filename = sys.argv[1]
+            filename = args[0]
             if not os.path.exists(filename):
                 print(Fore.MAGENTA + Style.BRIGHT + f"❌ Error: File '{filename}' not found")
                 exit_code = 1
@@ -44,7 +47,12 @@ def main():
                 print(header)
                 print(Fore.MAGENTA + "-" * (len(os.path.basename(filename)) + 18))
                 
-                asyncio.run(run_momentum(filename))
+                if 'watch' in options:
+                    # โหมดเฝ้าดูไฟล์: รันซ้ำทุกครั้งที่มีการแก้ไข จนกว่าจะกด Ctrl+C
+                    try: asyncio.run(run_watch(filename))
+                    except KeyboardInterrupt: pass
+                else:
+                    asyncio.run(run_momentum(filename))
 
                 print(Fore.MAGENTA + "-" * (len(os.path.basename(filename)) + 18))
                 print(Fore.GREEN + Style.BRIGHT + "✅ Program completed successfully")
@@ -78,4 +86,6 @@ def main():
         sys.exit(exit_code)
 
 if __name__ == "__main__":
+    # จำเป็นสำหรับไฟล์ .exe ที่สร้างด้วย PyInstaller เพราะการคอมไพล์โมดูลแบบขนานจะเปิดโปรเซสลูกจากไฟล์นี้
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file